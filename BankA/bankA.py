@@ -233,6 +233,10 @@ joblib.dump(META, SAVE_DIR / f"preprocess_{BANK}.pkl")
 with open(SAVE_DIR / f"history_{BANK}.json", "w") as f:
     json.dump(history, f, indent=2)
 
+# 3b) Simpan jumlah data training → dikirim upload_model.py sebagai num_examples (bobot FedAvg)
+with open(SAVE_DIR / "num_examples.txt", "w") as nf:
+    nf.write(f"{len(df)}\n")
+
 # 4) Simpan history accuracy lengkap ke file (tab-separated)
 history_path = SAVE_DIR / "accuracy_history.txt"
 if not history_path.exists():
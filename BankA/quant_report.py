@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# ============================================================
+# 📏 LAPORAN DAMPAK KUANTISASI (fp16 / int8) TERHADAP AKURASI
+#
+# Bandingkan bobot float32 asli dengan versi fp16 / int8 yang dikirim
+# upload_model.py (setelah di-dequantize seperti di server) pada test
+# case yang sama dengan test.py.
+#
+# Prediksi memakai forward pass NumPy server (federated_server/evaluation.py,
+# sama dengan evaluasi model global), jadi tidak butuh TensorFlow.
+#
+#   python quant_report.py                       # NPZ terbaru di MODEL_DIR
+#   python quant_report.py --npz path/bobot.npz
+# ============================================================
+import argparse
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+# forward pass MLP bank (NumPy) dipakai bersama dengan server; append (bukan insert)
+# agar test.py milik bank tidak tertutup federated_server/test.py
+sys.path.append(str(Path(__file__).resolve().parent.parent / "federated_server"))
+from evaluation import global_predictor  # noqa: E402
+from flat_params import FlatLayout  # noqa: E402
+
+from upload_model import quantize_npz, dequantize_npz  # noqa: E402
+from test import (  # noqa: E402
+    preprocess_transaction, auto_threshold,
+    bank_a_cases, bank_b_cases, bank_c_cases, bank_d_cases, bank_e_cases, bank_f_cases,
+)
+
+MODEL_DIR = Path("Models/saved_bank_A_DATA_tff")
+PREPROC_PATH = Path("models_global/fitur_global_test.pkl")
+
+VARIANTS = [
+    ("float32", None, False),
+    ("fp16", "fp16", False),
+    ("int8 per-tensor", "int8", False),
+    ("int8 per-channel", "int8", True),
+]
+
+def evaluate(predict, X, y, bank_slices):
+    """Satu forward pass untuk semua case; threshold otomatis per bank seperti test.py."""
+    probs = predict(X)
+    correct = 0
+    for sl in bank_slices:
+        th = auto_threshold(y[sl], probs[sl])
+        correct += int(((probs[sl] >= th).astype(int) == y[sl]).sum())
+    return correct, probs
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--npz", type=str, default=None)
+    args = parser.parse_args()
+
+    npz_path = Path(args.npz) if args.npz else max(MODEL_DIR.glob("*.npz"), key=lambda p: p.stat().st_mtime)
+    preproc = joblib.load(PREPROC_PATH)
+
+    all_cases = [bank_a_cases, bank_b_cases, bank_c_cases, bank_d_cases, bank_e_cases, bank_f_cases]
+    X = np.vstack([preprocess_transaction(d, preproc) for cases in all_cases for d, _ in cases])
+    y = np.array([label for cases in all_cases for _, label in cases])
+    bank_slices, start = [], 0
+    for cases in all_cases:
+        bank_slices.append(slice(start, start + len(cases)))
+        start += len(cases)
+
+    workdir = Path(tempfile.mkdtemp())
+    try:
+        src = Path(shutil.copy(npz_path, workdir / "weights.npz"))
+        base_weights = dequantize_npz(src)
+        flat_layout = FlatLayout([w.shape for w in base_weights])
+
+        print(f"\n{'='*86}")
+        print(f"📏 Dampak kuantisasi: {npz_path} ({len(y)} test case)")
+        print(f"{'='*86}")
+        print(f"{'varian':<18}{'bytes':>10}{'rasio':>8}{'max |Δw|':>12}{'max |Δp|':>12}{'akurasi':>14}")
+
+        base_probs = None
+        for label, precision, per_channel in VARIANTS:
+            path = quantize_npz(src, precision, per_channel) if precision else src
+            weights = dequantize_npz(path)
+            predict = global_predictor(flat_layout.pack(weights), flat_layout, f"quant_report:{label}")
+            correct, probs = evaluate(predict, X, y, bank_slices)
+            if base_probs is None:
+                base_probs = probs
+            dw = max(float(np.abs(a - b).max()) for a, b in zip(base_weights, weights))
+            dp = float(np.abs(probs - base_probs).max())
+            size = path.stat().st_size
+            print(f"{label:<18}{size:>10}{src.stat().st_size / size:>7.2f}x{dw:>12.2e}{dp:>12.2e}"
+                  f"{correct / len(y) * 100:>9.2f}% ({correct}/{len(y)})")
+        print("-" * 86)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
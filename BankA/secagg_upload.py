@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Secure-aggregation upload: the server only ever sees this bank's weights
+# masked with pairwise PRG masks that cancel in the sum over all banks.
+# Protocol primitives live in federated_server/secagg.py (shared with the server);
+# this script only drives the four phases of one round over HTTP.
+#
+#   python secagg_upload.py <round_id>
+#
+# The coordinator opens the round first: POST /secagg/<round_id> {"expected": N}.
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "federated_server"))
+from secagg import SecAggClient  # noqa: E402
+
+from upload_model import (  # noqa: E402
+    CLIENT_NAME, MODEL_PATH, NPZ_PATH, SERVER_URL, TIMEOUT,
+    find_model_folder, log_line, read_num_examples,
+)
+
+POLL_SECONDS = 5
+PHASE_TIMEOUT = 30 * 60  # give up if a phase does not close within this time
+
+# -------------------------
+# HTTP
+# -------------------------
+def call(method: str, path: str, **kwargs):
+    res = requests.request(method, f"{SERVER_URL}{path}", timeout=TIMEOUT, **kwargs)
+    if res.status_code >= 400:
+        try:
+            message = res.json().get("message", res.text)
+        except ValueError:
+            message = res.text
+        raise RuntimeError(f"{method} {path} -> {res.status_code}: {message}")
+    return res.json()
+
+def wait_for_phase(round_id: str, phases: tuple) -> dict:
+    deadline = time.time() + PHASE_TIMEOUT
+    while True:
+        status = call("GET", f"/secagg/{round_id}")
+        if status["phase"] in phases:
+            return status
+        if status["phase"] == "failed":
+            raise RuntimeError(f"round {round_id} failed: {status.get('error')}")
+        if time.time() > deadline:
+            raise RuntimeError(f"round {round_id} still in phase {status['phase']}, waited for {phases}")
+        time.sleep(POLL_SECONDS)
+
+# -------------------------
+# WEIGHTS → flat vector in the server's layout order
+# -------------------------
+def flatten_for_layout(npz_path: Path, layout: dict) -> np.ndarray:
+    # same matching rule as the server: by tensor name if all names exist, else by position
+    with np.load(npz_path, allow_pickle=False) as npz:
+        names = [t["name"] for t in layout["tensors"]]
+        if not all(n in npz.files for n in names):
+            if len(npz.files) != len(names):
+                raise ValueError(f"{npz_path} has {len(npz.files)} tensors, layout expects {len(names)}")
+            names = list(npz.files)
+        parts = []
+        for name, expected in zip(names, layout["tensors"]):
+            arr = npz[name]
+            if list(arr.shape) != list(expected["shape"]):
+                raise ValueError(f"tensor {name} shape {arr.shape} != layout {expected['shape']}")
+            parts.append(arr.astype(np.float64).ravel())
+    return np.concatenate(parts)
+
+# -------------------------
+# ROUND
+# -------------------------
+def run_round(round_id: str, flat: np.ndarray, num_examples: int) -> dict:
+    me = SecAggClient(CLIENT_NAME, round_id)
+
+    # 1) advertise public keys
+    call("POST", f"/secagg/{round_id}/keys", json=me.advertise())
+    status = wait_for_phase(round_id, ("shares", "masked", "unmask", "done"))
+    if status["phase"] != "shares" or CLIENT_NAME not in status["keys"]:
+        raise RuntimeError(f"missed the share phase of round {round_id} (phase {status['phase']})")
+
+    # 2) Shamir shares of the self-mask seed and mask key, encrypted per peer
+    call("POST", f"/secagg/{round_id}/shares", json=me.share_keys(status["keys"], status["threshold"]))
+    status = wait_for_phase(round_id, ("masked", "unmask", "done"))
+    if status["phase"] != "masked" or CLIENT_NAME not in status["u2"]:
+        raise RuntimeError(f"missed the masked-input phase of round {round_id} (phase {status['phase']})")
+
+    # 3) masked input y = n*w + PRG(b) +- pairwise masks, as raw uint64 .npy
+    me.receive_shares(call("GET", f"/secagg/{round_id}/shares/{CLIENT_NAME}")["shares"])
+    y = me.masked_input(flat, num_examples, status["u2"])
+    tmp = Path(f"secagg_{round_id}_{CLIENT_NAME.lower()}.npy")
+    np.save(tmp, y)
+    try:
+        with open(tmp, "rb") as f:
+            call("POST", f"/secagg/{round_id}/masked", data=f, headers={
+                "Content-Type": "application/octet-stream",
+                "X-Client": CLIENT_NAME,
+                "X-Num-Examples": str(num_examples),
+            })
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    # 4) reveal b shares for survivors and mask-key shares for dropped banks
+    status = wait_for_phase(round_id, ("unmask", "done"))
+    if status["phase"] == "unmask":
+        status = call("POST", f"/secagg/{round_id}/unmask", json=me.unmask(status["survivors"], status["dropped"]))
+    return status
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python secagg_upload.py <round_id>")
+        raise SystemExit(2)
+    round_id = sys.argv[1]
+
+    found_folder = find_model_folder(MODEL_PATH, CLIENT_NAME)
+    npz_path = NPZ_PATH
+    if found_folder and (found_folder / NPZ_PATH.name).exists():
+        npz_path = found_folder / NPZ_PATH.name
+    if not npz_path.exists():
+        print(f"NPZ not found: {npz_path} (run upload_model.py once to extract it)")
+        raise SystemExit(1)
+    num_examples = read_num_examples(found_folder)
+    if not num_examples:
+        print("secure aggregation needs num_examples.txt next to the model (the server only sees the weighted sum)")
+        raise SystemExit(1)
+
+    try:
+        layout = call("GET", "/layout")
+        flat = flatten_for_layout(npz_path, layout)
+        status = run_round(round_id, flat, num_examples)
+    except Exception as e:
+        print(f"Secure aggregation failed: {e}")
+        log_line(f"SECAGG FAIL round={round_id} {e}")
+        raise SystemExit(1)
+
+    log_line(f"SECAGG OK round={round_id} phase={status['phase']}")
+    print(f"Round {round_id}: phase {status['phase']}"
+          + (f", global version {status['result']['version']}" if status.get("result") else ""))
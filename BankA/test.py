@@ -2,7 +2,6 @@ import os
 import numpy as np
 import joblib
 import pandas as pd
-from keras.layers import TFSMLayer
 from colorama import Fore, Style, init
 from sklearn.metrics import precision_recall_curve, roc_curve
 
@@ -63,6 +62,7 @@ def test_global_model(model_path, preproc_path, cases, label):
     print(f"{'='*70}")
 
     try:
+        from keras.layers import TFSMLayer  # Keras hanya dimuat saat test model (quant_report tidak butuh)
         model = TFSMLayer(model_path, call_endpoint="serving_default")
         preproc = joblib.load(preproc_path)
         print(Fore.GREEN + " Model & fitur global berhasil dimuat!" + Style.RESET_ALL)
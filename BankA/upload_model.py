@@ -2,11 +2,12 @@
 import os
 import time
 import base64
+import hashlib
 import json
+import re
 from pathlib import Path
 import numpy as np
 import requests
-import tensorflow as tf
 
 # -------------------------
 # CONFIG
@@ -19,7 +20,17 @@ NPZ_PATH     = MODEL_PATH / f"{CLIENT_NAME.lower()}_weights.npz"
 TIMEOUT      = 180
 RETRY_LIMIT  = 3
 LARGE_FILE_WARN_MB = 20  # warn if file > this size before base64-ing
-HISTORY_TAIL_LINES = 200
+HISTORY_TAIL_LINES = 200  # only used when the server has no /metrics-cursor (older server)
+MAX_METRICS_HEADER_BYTES = 6 * 1024  # most proxies reject header lines > 8 KB
+RESUMABLE_THRESHOLD_MB = 8  # files above this go through resumable upload sessions
+CHUNK_SIZE   = 4 * 1024 * 1024  # default; server may suggest another via chunk_size
+INGEST_POLL_SECONDS = 60  # how long to follow a 202 ingestion before trusting the server spool
+FALLBACK_STATUS = (404, 405, 415)  # server doesn't know this upload format → try the next one
+# Opt-in quantized transport: None (float32), "fp16" or "int8".
+# The server dequantizes back to float32 before aggregation.
+QUANTIZE     = None
+QUANT_PER_CHANNEL = True   # int8: one scale/zero-point per output channel (last axis)
+QUANT_MIN_ELEMENTS = 256   # smaller tensors (biases, BatchNorm stats) stay float32
 
 # -------------------------
 # UTIL
@@ -34,6 +45,13 @@ def print_size(path: Path):
 def safe_name(name: str) -> str:
     return name.replace("/", "_").replace(":", "_")
 
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
 def log_line(message: str):
     ts = time.strftime("%Y-%m-%d %H:%M:%S")
     with open("upload_log.txt", "a") as f:
@@ -77,6 +95,7 @@ def find_model_folder(preferred: Path, client_name: str):
 # LOAD MODEL (Keras or SavedModel variables)
 # -------------------------
 def load_weights_from_model(model_path: Path):
+    import tensorflow as tf  # only needed here; quantize/upload helpers stay importable without TF
     # Try to load as Keras SavedModel first
     try:
         print(f"Trying tf.keras.models.load_model('{model_path}')")
@@ -98,18 +117,93 @@ def load_weights_from_model(model_path: Path):
     var_map = ckpt.get_variable_to_shape_map()
     weights = {}
     for name in var_map:
+        # optimizer slots / counters are not model weights; the server rejects
+        # uploads that don't match its declared tensor layout
+        if any(tag in name for tag in CHECKPOINT_SKIP_TAGS):
+            continue
         weights[safe_name(name)] = ckpt.get_tensor(name)
     return weights
 
+CHECKPOINT_SKIP_TAGS = ("optimizer", "OPTIMIZER_SLOT", "save_counter", "_CHECKPOINTABLE_OBJECT_GRAPH")
+
 def save_weights_npz_dict(weights_dict: dict, save_path: Path):
     save_path.parent.mkdir(parents=True, exist_ok=True)
     np.savez_compressed(save_path, **weights_dict)
     print(f"Saved weights to {save_path} ({print_size(save_path)})")
 
+# -------------------------
+# QUANTIZE (fp16 / int8 transport format)
+# -------------------------
+QUANT_FORMAT_KEY = "__format__"
+QUANT_FORMAT_NAME = "cin-quant-v1"
+
+def quantize_int8(x: np.ndarray, per_channel: bool):
+    # asymmetric int8: x ~= (q - zero_point) * scale, range widened to include 0
+    x = x.astype(np.float32)
+    if per_channel and x.ndim >= 2:
+        axes = tuple(range(x.ndim - 1))
+        lo, hi = x.min(axis=axes), x.max(axis=axes)
+    else:
+        lo, hi = np.array(x.min()), np.array(x.max())
+    lo, hi = np.minimum(lo, 0.0), np.maximum(hi, 0.0)
+    scale = ((hi - lo) / 255.0).astype(np.float32)
+    scale = np.where(scale == 0, np.float32(1.0), scale).astype(np.float32)
+    zero_point = np.clip(np.round(-128.0 - lo / scale), -128, 127).astype(np.int8)
+    q = np.clip(np.round(x / scale) + zero_point, -128, 127).astype(np.int8)
+    return q, scale, zero_point
+
+def quantize_npz(npz_path: Path, precision: str, per_channel: bool = QUANT_PER_CHANNEL) -> Path:
+    if precision not in ("fp16", "int8"):
+        raise ValueError(f"unknown precision: {precision}")
+    out_path = npz_path.with_name(f"{npz_path.stem}_{precision}.npz")
+
+    arrays, tensors = {}, []
+    with np.load(npz_path) as npz:
+        for name in npz.files:
+            x = npz[name]
+            entry = {"name": name, "shape": list(x.shape), "dtype": x.dtype.name}
+            if not np.issubdtype(x.dtype, np.floating) or x.size < QUANT_MIN_ELEMENTS:
+                arrays[name] = x
+                entry["precision"] = x.dtype.name
+            elif precision == "fp16":
+                arrays[name] = x.astype(np.float16)
+                entry["precision"] = "fp16"
+            else:
+                q, scale, zero_point = quantize_int8(x, per_channel)
+                arrays[f"{name}.q"] = q
+                arrays[f"{name}.scale"] = scale
+                arrays[f"{name}.zero_point"] = zero_point
+                entry["precision"] = "int8"
+                entry["axis"] = -1 if scale.ndim else None
+            tensors.append(entry)
+
+    meta = {"format": QUANT_FORMAT_NAME, "precision": precision, "per_channel": per_channel, "tensors": tensors}
+    arrays[QUANT_FORMAT_KEY] = np.array(json.dumps(meta))
+    np.savez_compressed(out_path, **arrays)
+    print(f"Quantized ({precision}) weights saved to {out_path} ({print_size(out_path)}, was {print_size(npz_path)})")
+    return out_path
+
+def dequantize_npz(npz_path: Path) -> list:
+    # inverse of quantize_npz (used by quant_report.py to measure accuracy impact)
+    with np.load(npz_path) as npz:
+        if QUANT_FORMAT_KEY not in npz.files:
+            return [npz[k] for k in npz.files]
+        meta = json.loads(str(npz[QUANT_FORMAT_KEY][()]))
+        weights = []
+        for t in meta["tensors"]:
+            name = t["name"]
+            if t["precision"] == "int8":
+                q, scale, zp = npz[f"{name}.q"], npz[f"{name}.scale"], npz[f"{name}.zero_point"]
+                w = (q.astype(np.float32) - zp.astype(np.float32)) * scale
+            else:
+                w = npz[name].astype(t["dtype"])
+            weights.append(w.reshape(t["shape"]))
+        return weights
+
 # -------------------------
 # READ LOCAL METRICS (best_accuracy + history)
 # -------------------------
-def collect_local_metrics(model_folder: Path):
+def collect_local_metrics(model_folder: Path, cursor: dict = None):
     metrics = {"best_accuracy": None, "history": []}
     if model_folder is None:
         return metrics
@@ -132,7 +226,8 @@ def collect_local_metrics(model_folder: Path):
             except Exception:
                 pass
 
-    # Try reading history (tail)
+    # Try reading history: only entries newer than the server cursor,
+    # or the last HISTORY_TAIL_LINES when the cursor is unavailable
     for hname in candidates_hist:
         ph = model_folder / hname
         if ph.exists():
@@ -140,20 +235,100 @@ def collect_local_metrics(model_folder: Path):
                 with open(ph, "r") as f:
                     lines = [ln.strip() for ln in f.read().strip().splitlines() if ln.strip()]
                     if lines:
-                        metrics["history"] = lines[-HISTORY_TAIL_LINES:]
+                        if cursor is None:
+                            metrics["history"] = lines[-HISTORY_TAIL_LINES:]
+                        else:
+                            metrics["history"] = [ln for ln in lines if is_newer_than_cursor(ln, cursor)]
                         break
             except Exception:
                 pass
 
     return metrics
 
+# -------------------------
+# TRAINING SET SIZE (num_examples -> FedAvg weight on the server)
+# -------------------------
+def read_num_examples(model_folder: Path):
+    # written by bankX.py next to the SavedModel (len(df)); None if missing/invalid
+    if model_folder is None:
+        return None
+    p = model_folder / "num_examples.txt"
+    if not p.exists():
+        return None
+    try:
+        n = int(p.read_text().strip())
+        return n if n > 0 else None
+    except ValueError:
+        print(f"Ignoring invalid {p}")
+        return None
+
+# -------------------------
+# BASE GLOBAL VERSION (staleness for the server's async FedBuff mode)
+# -------------------------
+def read_base_version(model_folder: Path):
+    # global version this model was trained from: the X-Global-Version header of
+    # /download-global, saved as global_version.txt; None if unknown
+    if model_folder is None:
+        return None
+    p = model_folder / "global_version.txt"
+    if not p.exists():
+        return None
+    try:
+        v = int(p.read_text().strip())
+        return v if v >= 0 else None
+    except ValueError:
+        print(f"Ignoring invalid {p}")
+        return None
+
+# -------------------------
+# HISTORY CURSOR (incremental sync)
+# -------------------------
+TS_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+
+def parse_history_entry(line: str):
+    # (round, timestamp) of an accuracy_history.txt line, e.g.
+    # "bank_A_DATA\t3\t0.897650\t0.32\t0.31\t2026-01-05T04:48:11Z"; header line -> None
+    fields = [f.strip() for f in line.split("\t")]
+    if "round" in fields and "acc" in fields:
+        return None
+    round_num = next((int(f) for f in fields if f.isdigit()), None)
+    ts = next((f for f in fields if TS_RE.match(f)), None)
+    return round_num, ts
+
+def is_newer_than_cursor(line: str, cursor: dict) -> bool:
+    entry = parse_history_entry(line)
+    if entry is None:
+        return False
+    round_num, ts = entry
+    if ts is not None and cursor.get("ts"):
+        return ts > cursor["ts"]  # ISO-8601 strings sort chronologically
+    if round_num is not None and cursor.get("round") is not None:
+        return round_num > cursor["round"]
+    # nothing to compare against (first upload) -> send; the server dedupes anyway
+    return True
+
+def fetch_history_cursor():
+    # last (round, ts) the server already has for this client; None -> older server
+    try:
+        res = requests.get(f"{SERVER_URL}/metrics-cursor/{CLIENT_NAME}", timeout=TIMEOUT)
+        if res.status_code == 200:
+            cursor = res.json()
+            print(f"History cursor from server: round={cursor.get('round')} ts={cursor.get('ts')}")
+            return cursor
+    except requests.RequestException as e:
+        print(f"Could not fetch history cursor: {e}")
+    return None
+
+def collect_new_metrics(model_folder: Path):
+    return collect_local_metrics(model_folder, fetch_history_cursor())
+
 # -------------------------
 # BUILD PAYLOAD (with metrics)
 # -------------------------
 def build_payload_with_metrics(npz_path: Path, client_name: str):
     # locate model folder to read metrics
     model_folder = find_model_folder(MODEL_PATH, client_name)
-    local_metrics = collect_local_metrics(model_folder)
+    local_metrics = collect_new_metrics(model_folder)
 
     with open(npz_path, "rb") as f:
         b = f.read()
@@ -167,8 +342,201 @@ def build_payload_with_metrics(npz_path: Path, client_name: str):
             "history": local_metrics.get("history", [])
         }
     }
+    num_examples = read_num_examples(model_folder)
+    if num_examples is not None:
+        payload["num_examples"] = num_examples
+    base_version = read_base_version(model_folder)
+    if base_version is not None:
+        payload["base_version"] = base_version
     return payload
 
+# -------------------------
+# INGESTION STATUS (server answers 202 and processes the upload in background)
+# -------------------------
+def wait_for_ingestion(res):
+    # 200 = processed synchronously (older server or ?wait=1); 202 = queued.
+    # Poll the status URL so validation errors (e.g. layout mismatch) still surface here.
+    if res.status_code == 200:
+        return True, res.json()
+    body = res.json()
+    status_url = f"{SERVER_URL}{body.get('status_url', '/ingestions/' + body['ingestion_id'])}"
+    deadline = time.time() + INGEST_POLL_SECONDS
+    delay = 0.5
+    while time.time() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 5)
+        try:
+            status = requests.get(status_url, timeout=TIMEOUT)
+        except requests.RequestException as e:
+            print(f"[INGEST] status poll failed: {e}")
+            continue
+        if status.status_code != 200:
+            continue
+        info = status.json()
+        print(f"[INGEST] {info.get('ingestion_id')}: {info.get('state')} ({info.get('phase')})")
+        if info.get("state") == "done":
+            return True, info
+        if info.get("state") == "error":
+            return False, info
+    # still queued: the file is already spooled server-side, nothing to resend
+    print(f"[INGEST] {body['ingestion_id']} still processing after {INGEST_POLL_SECONDS}s; check {status_url}")
+    return True, body
+
+# -------------------------
+# UPLOAD (binary stream, default)
+# -------------------------
+def build_metrics_header(metrics: dict) -> str:
+    # metrics travel in a header for binary uploads; drop the oldest history
+    # lines until the JSON fits comfortably under proxy header limits
+    metrics = {"best_accuracy": metrics.get("best_accuracy"), "history": list(metrics.get("history", []))}
+    encoded = json.dumps(metrics)
+    while len(encoded) > MAX_METRICS_HEADER_BYTES and metrics["history"]:
+        metrics["history"] = metrics["history"][len(metrics["history"]) // 2 + 1:]
+        encoded = json.dumps(metrics)
+    return encoded
+
+def upload_stream(npz_path: Path):
+    url = f"{SERVER_URL}/upload-model"
+
+    model_folder = find_model_folder(MODEL_PATH, CLIENT_NAME)
+    local_metrics = collect_new_metrics(model_folder)
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "X-Client": CLIENT_NAME,
+        "X-Metrics": build_metrics_header(local_metrics),
+    }
+    num_examples = read_num_examples(model_folder)
+    if num_examples is not None:
+        headers["X-Num-Examples"] = str(num_examples)
+    base_version = read_base_version(model_folder)
+    if base_version is not None:
+        headers["X-Base-Version"] = str(base_version)
+
+    for attempt in range(1, RETRY_LIMIT + 1):
+        try:
+            print(f"[STREAM] Attempt {attempt} -> {url}")
+            with open(npz_path, "rb") as fh:
+                start = time.time()
+                # passing the file object makes requests stream it from disk
+                res = requests.post(url, data=fh, headers=headers, timeout=TIMEOUT)
+                dur = time.time() - start
+            print(f"[STREAM] Response {res.status_code} in {dur:.2f}s. Body: {res.text}")
+            if res.status_code in (200, 202):
+                ok, info = wait_for_ingestion(res)
+                log_line(f"{'OK' if ok else 'INGEST ERROR'} STREAM {res.status_code} {json.dumps(info)}")
+                return ok, res
+            if res.status_code in FALLBACK_STATUS:
+                # older server without binary upload support
+                log_line(f"STREAM REJECTED {res.status_code} {res.text}")
+                return False, res
+            log_line(f"STREAM ERROR {res.status_code} {res.text}")
+            if res.status_code < 500:
+                # 400/413/422...: the server rejected this file, resending won't change that
+                return False, res
+        except requests.RequestException as e:
+            print(f"[STREAM] RequestException: {e}")
+            log_line(f"STREAM EXC {e}")
+        time.sleep(2 ** attempt)
+    return False, None
+
+# -------------------------
+# UPLOAD (resumable session, for large files)
+# -------------------------
+def upload_resumable(npz_path: Path):
+    base = f"{SERVER_URL}/upload-session"
+    size = npz_path.stat().st_size
+    digest = sha256_file(npz_path)
+
+    model_folder = find_model_folder(MODEL_PATH, CLIENT_NAME)
+    local_metrics = collect_new_metrics(model_folder)
+    init_body = {"client": CLIENT_NAME, "size": size, "sha256": digest, "metrics": local_metrics}
+    num_examples = read_num_examples(model_folder)
+    if num_examples is not None:
+        init_body["num_examples"] = num_examples
+    base_version = read_base_version(model_folder)
+    if base_version is not None:
+        init_body["base_version"] = base_version
+
+    # init (server returns the existing session + offset if this exact file was half-sent before)
+    session = None
+    for attempt in range(1, RETRY_LIMIT + 1):
+        try:
+            res = requests.post(base, json=init_body, timeout=TIMEOUT)
+            if res.status_code in (200, 201):
+                session = res.json()
+                break
+            print(f"[RESUMABLE] Init failed {res.status_code}: {res.text}")
+            log_line(f"RESUMABLE INIT ERROR {res.status_code} {res.text}")
+            if res.status_code < 500:
+                return False, res
+        except requests.RequestException as e:
+            print(f"[RESUMABLE] Init RequestException: {e}")
+            log_line(f"RESUMABLE INIT EXC {e}")
+        time.sleep(2 ** attempt)
+    if session is None:
+        return False, None
+
+    session_url = f"{base}/{session['session_id']}"
+    offset = int(session.get("offset", 0))
+    chunk_size = int(session.get("chunk_size") or CHUNK_SIZE)
+    if session.get("resumed"):
+        print(f"[RESUMABLE] Resuming session {session['session_id']} at {offset}/{size} bytes")
+
+    # send chunks; failures only cost the chunk in flight, never the whole file
+    failures = 0
+    with open(npz_path, "rb") as fh:
+        while offset < size:
+            fh.seek(offset)
+            chunk = fh.read(chunk_size)
+            try:
+                res = requests.put(
+                    session_url, params={"offset": offset}, data=chunk,
+                    headers={"Content-Type": "application/octet-stream"}, timeout=TIMEOUT,
+                )
+                if res.status_code == 200:
+                    offset = int(res.json()["offset"])
+                    failures = 0
+                    print(f"[RESUMABLE] {offset}/{size} bytes acknowledged")
+                    continue
+                if res.status_code == 409:
+                    # server has a different offset (e.g. previous chunk landed after a timeout)
+                    offset = int(res.json()["offset"])
+                    continue
+                print(f"[RESUMABLE] Chunk error {res.status_code}: {res.text}")
+                log_line(f"RESUMABLE CHUNK ERROR {res.status_code} {res.text}")
+            except requests.RequestException as e:
+                print(f"[RESUMABLE] Chunk RequestException: {e}")
+                log_line(f"RESUMABLE CHUNK EXC {e}")
+
+            failures += 1
+            if failures > RETRY_LIMIT:
+                return False, None
+            time.sleep(2 ** failures)
+            # re-sync with the last offset the server actually acknowledged
+            try:
+                res = requests.get(session_url, timeout=TIMEOUT)
+                if res.status_code == 200:
+                    offset = int(res.json()["offset"])
+            except requests.RequestException:
+                pass
+
+    for attempt in range(1, RETRY_LIMIT + 1):
+        try:
+            res = requests.post(f"{session_url}/commit", json={"sha256": digest}, timeout=TIMEOUT)
+            print(f"[RESUMABLE] Commit {res.status_code}. Body: {res.text}")
+            if res.status_code in (200, 202):
+                ok, info = wait_for_ingestion(res)
+                log_line(f"{'OK' if ok else 'INGEST ERROR'} RESUMABLE {res.status_code} {json.dumps(info)}")
+                return ok, res
+            log_line(f"RESUMABLE COMMIT ERROR {res.status_code} {res.text}")
+            if res.status_code < 500:
+                return False, res
+        except requests.RequestException as e:
+            print(f"[RESUMABLE] Commit RequestException: {e}")
+            log_line(f"RESUMABLE COMMIT EXC {e}")
+        time.sleep(2 ** attempt)
+    return False, None
+
 # -------------------------
 # UPLOAD (JSON base64)
 # -------------------------
@@ -189,13 +557,16 @@ def upload_json_base64(npz_path: Path):
             res = requests.post(url, data=json.dumps(payload), headers=headers, timeout=TIMEOUT)
             dur = time.time() - start
             print(f"[JSON] Response {res.status_code} in {dur:.2f}s. Body: {res.text}")
-            if res.status_code == 200:
-                log_line(f"OK JSON {res.status_code} {res.text}")
-                return True, res
-            if res.status_code == 415 or (res.status_code >= 400 and "Unsupported Media Type" in res.text):
+            if res.status_code in (200, 202):
+                ok, info = wait_for_ingestion(res)
+                log_line(f"{'OK' if ok else 'INGEST ERROR'} JSON {res.status_code} {json.dumps(info)}")
+                return ok, res
+            if res.status_code in FALLBACK_STATUS:
                 log_line(f"JSON REJECTED {res.status_code} {res.text}")
                 return False, res
             log_line(f"JSON ERROR {res.status_code} {res.text}")
+            if res.status_code < 500:
+                return False, res
         except requests.RequestException as e:
             print(f"[JSON] RequestException: {e}")
             log_line(f"JSON EXC {e}")
@@ -210,10 +581,16 @@ def upload_multipart(npz_path: Path):
 
     # collect local metrics as JSON string
     model_folder = find_model_folder(MODEL_PATH, CLIENT_NAME)
-    local_metrics = collect_local_metrics(model_folder)
+    local_metrics = collect_new_metrics(model_folder)
     metrics_field = json.dumps(local_metrics)
 
     data = {"client": CLIENT_NAME, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "metrics": metrics_field}
+    num_examples = read_num_examples(model_folder)
+    if num_examples is not None:
+        data["num_examples"] = str(num_examples)
+    base_version = read_base_version(model_folder)
+    if base_version is not None:
+        data["base_version"] = str(base_version)
     for attempt in range(1, RETRY_LIMIT + 1):
         try:
             print(f"[MULTIPART] Attempt {attempt} -> {url}")
@@ -227,6 +604,8 @@ def upload_multipart(npz_path: Path):
                 log_line(f"OK MULTIPART {res.status_code} {res.text}")
                 return True, res
             log_line(f"MULTIPART ERROR {res.status_code} {res.text}")
+            if res.status_code < 500:
+                return False, res
         except requests.RequestException as e:
             print(f"[MULTIPART] RequestException: {e}")
             log_line(f"MULTIPART EXC {e}")
@@ -236,13 +615,37 @@ def upload_multipart(npz_path: Path):
 # -------------------------
 # UPLOAD WITH FALLBACK
 # -------------------------
+def should_fall_back(res) -> bool:
+    # None = transport failure on every attempt; 404/405/415 = format not supported;
+    # 5xx = server error. Any other 4xx, or a 200/202 whose ingestion ended in
+    # state "error", is a verdict on the file itself: another format won't help.
+    return res is None or res.status_code in FALLBACK_STATUS or res.status_code >= 500
+
 def upload_with_fallback(npz_path: Path):
+    size_mb = npz_path.stat().st_size / 1024 / 1024
+    if size_mb > RESUMABLE_THRESHOLD_MB:
+        success, res = upload_resumable(npz_path)
+        if success:
+            return True
+        if not should_fall_back(res):
+            print(f"Server rejected this file (HTTP {res.status_code}, see upload log); not trying other formats.")
+            return False
+        print("Resumable upload didn't succeed; trying single-request binary upload...")
+
+    success, res = upload_stream(npz_path)
+    if success:
+        return True
+    if not should_fall_back(res):
+        print(f"Server rejected this file (HTTP {res.status_code}, see upload log); not trying other formats.")
+        return False
+    print("Binary upload didn't succeed; trying JSON base64 fallback...")
+
     success, res = upload_json_base64(npz_path)
     if success:
         return True
-    if res is not None and (res.status_code == 415 or ("Unsupported Media Type" in res.text) or res.status_code >= 500):
-        print("Server rejected JSON or returned server error; trying multipart fallback...")
-        return upload_multipart(npz_path)[0]
+    if not should_fall_back(res):
+        print(f"Server rejected this file (HTTP {res.status_code}, see upload log); not trying other formats.")
+        return False
     print("JSON didn't succeed; trying multipart fallback...")
     return upload_multipart(npz_path)[0]
 
@@ -279,7 +682,11 @@ if __name__ == "__main__":
     else:
         print(f"Found NPZ: {NPZ_PATH} ({print_size(NPZ_PATH)})")
 
-    ok = upload_with_fallback(NPZ_PATH)
+    upload_path = NPZ_PATH
+    if QUANTIZE:
+        upload_path = quantize_npz(NPZ_PATH, QUANTIZE)
+
+    ok = upload_with_fallback(upload_path)
     if ok:
         print("Upload succeeded.")
     else:
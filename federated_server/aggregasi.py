@@ -1,14 +1,42 @@
+import time
 import requests
 
-SERVER_URL = "hhttps://federatedserver.up.railway.app/"
+SERVER_URL = "https://federatedserver.up.railway.app"
+POLL_SECONDS = 3
+TIMEOUT_SECONDS = 60 * 60  # batas menunggu job agregasi
 
 print("📡 Mengirim permintaan agregasi FedAvg ke server...")
-response = requests.post(f"{SERVER_URL}/aggregate")
+response = requests.post(f"{SERVER_URL}/aggregate", json={})
+body = response.json()
+
+if response.status_code != 202:
+    # parameter ditolak (400), hasil cache karena input tidak berubah (200)
+    # atau server lama yang masih sinkron (200)
+    print("\n Respons server:")
+    print(body)
+    raise SystemExit(0 if response.ok else 1)
+
+job_id = body["job_id"]
+status_url = f"{SERVER_URL}{body.get('status_url', '/jobs/' + job_id)}"
+print(f"🧾 Job agregasi {job_id} masuk antrian, memantau {status_url}")
+
+deadline = time.time() + TIMEOUT_SECONDS
+last_phase = None
+while True:
+    job = requests.get(status_url, timeout=30).json()
+    if job.get("phase") != last_phase:
+        print(f"  ⏳ {job.get('phase')} ({(job.get('progress') or 0) * 100:.0f}%)")
+        last_phase = job.get("phase")
+    if job.get("state") in ("done", "error"):
+        break
+    if time.time() > deadline:
+        print(f"⚠️ Job {job_id} belum selesai setelah {TIMEOUT_SECONDS} detik; cek lagi di {status_url}")
+        raise SystemExit(1)
+    time.sleep(POLL_SECONDS)
 
 print("\n Respons server:")
-print(response.json())
-
-
-
-
-
+if job["state"] == "done":
+    print(job["result"])
+else:
+    print({k: v for k, v in job.items() if k not in ("created", "updated")})
+    raise SystemExit(1)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🛡️ AGGREGATORS — aturan agregasi robust (pluggable)
+#
+#   AGGREGATORS[name](contribs, weights, flat_layout, **params) → (vektor float32, info)
+#
+#   contribs : list vektor flat float32 per client (biasanya contrib/*.npy yang di-mmap)
+#   weights  : np.ndarray bobot client (num_examples / 1.0), urutan sama dengan contribs
+#
+#   mean          → Σ w_i·x_i / Σ w_i (sama dengan running sum, untuk pembanding)
+#   median        → median per koordinat (np.partition di sumbu client)
+#   trimmed_mean  → buang `trim` fraksi terkecil & terbesar per koordinat, rata-ratakan sisanya
+#   krum          → bobot satu client dengan skor jarak terkecil ke n-f-2 tetangganya
+#   multi_krum    → rata-rata berbobot m client dengan skor krum terkecil
+#
+# median & trimmed_mean sengaja tidak memakai bobot: satu client = satu suara,
+# sehingga client yang melaporkan num_examples besar tidak bisa mendominasi.
+#
+# Semua aturan bekerja per blok kolom [n_client, blok] sehingga memori puncak
+# = satu blok tumpukan + output, berapa pun ukuran model. Jarak antar client
+# (krum) dihitung dari matriks Gram X·Xᵀ: satu GEMM per blok, dijumlah.
+# ==========================================================
+import numpy as np
+
+STACK_BLOCK_ELEMENTS = 4 * 1024 * 1024  # elemen per tumpukan blok (16 MB float32)
+MIN_BLOCK_COLUMNS = 1024
+
+
+def column_blocks(size: int, n_clients: int):
+    """Rentang (start, stop) kolom sehingga tumpukan [n_clients, stop-start] ≤ STACK_BLOCK_ELEMENTS."""
+    width = max(MIN_BLOCK_COLUMNS, STACK_BLOCK_ELEMENTS // max(1, n_clients))
+    for start in range(0, size, width):
+        yield start, min(start + width, size)
+
+
+def stack_block(contribs: list, start: int, stop: int, out: np.ndarray = None) -> np.ndarray:
+    """Tumpuk contribs[:, start:stop] ke buffer [n_clients, stop-start] (dipakai ulang antar blok)."""
+    if out is None or out.shape[1] != stop - start:
+        out = np.empty((len(contribs), stop - start), dtype=np.float32)
+    for i, contrib in enumerate(contribs):
+        out[i] = contrib[start:stop]
+    return out
+
+
+# ==========================================================
+# MEAN / MEDIAN / TRIMMED MEAN (per koordinat)
+# ==========================================================
+def weighted_mean(contribs, weights, flat_layout, **params):
+    weights = np.asarray(weights, dtype=np.float64)
+    out = flat_layout.empty()
+    block = None
+    for start, stop in column_blocks(flat_layout.size, len(contribs)):
+        block = stack_block(contribs, start, stop, block)
+        out[start:stop] = weights @ block / weights.sum()
+    return out, {}
+
+
+def coordinate_median(contribs, weights, flat_layout, **params):
+    n = len(contribs)
+    mid = n // 2
+    out = flat_layout.empty()
+    block = None
+    for start, stop in column_blocks(flat_layout.size, n):
+        block = stack_block(contribs, start, stop, block)
+        # satu kth saja: O(n) per koordinat (bukan sort penuh); nilai di bawah mid tidak urut
+        block.partition(mid, axis=0)
+        if n % 2:
+            out[start:stop] = block[mid]
+        else:
+            # n genap → rata-rata dua nilai tengah; yang bawah = maksimum separuh bawah
+            out[start:stop] = (block[mid] + block[:mid].max(axis=0)) / 2
+    return out, {}
+
+
+def trim_count(n: int, trim: float) -> int:
+    """Jumlah nilai yang dibuang di tiap sisi per koordinat."""
+    if not 0.0 <= trim < 0.5:
+        raise ValueError("trim harus di antara 0 dan 0.5")
+    return int(np.floor(trim * n))
+
+
+def trimmed_mean(contribs, weights, flat_layout, trim: float = 0.1, **params):
+    n = len(contribs)
+    trim = float(trim)
+    k = trim_count(n, trim)
+    out = flat_layout.empty()
+    block = None
+    for start, stop in column_blocks(flat_layout.size, n):
+        block = stack_block(contribs, start, stop, block)
+        kept = block
+        if k:
+            # dua partition satu-kth (lebih cepat dari satu partition dengan kth=[k, n-k-1]):
+            # k terkecil ke depan, lalu k terbesar dari sisanya ke belakang
+            block.partition(k, axis=0)
+            kept = block[k:]
+            kept.partition(n - 2 * k - 1, axis=0)
+            kept = kept[:n - 2 * k]
+        out[start:stop] = kept.mean(axis=0, dtype=np.float64)
+    return out, {"trim": trim, "trimmed_per_side": k}
+
+
+# ==========================================================
+# KRUM / MULTI-KRUM (jarak antar client via matriks Gram)
+# ==========================================================
+def gram_matrix(contribs, flat_layout) -> np.ndarray:
+    """G = X·Xᵀ (float64), dijumlah per blok kolom: satu GEMM per blok."""
+    n = len(contribs)
+    gram = np.zeros((n, n), dtype=np.float64)
+    block = None
+    for start, stop in column_blocks(flat_layout.size, n):
+        block = stack_block(contribs, start, stop, block)
+        gram += (block @ block.T).astype(np.float64)
+    return gram
+
+
+def distances_from_gram(gram: np.ndarray) -> np.ndarray:
+    """‖x_i − x_j‖² = G_ii + G_jj − 2·G_ij untuk semua pasangan."""
+    norms = np.diag(gram)
+    dist = norms[:, None] + norms[None, :] - 2.0 * gram
+    np.maximum(dist, 0.0, out=dist)  # sisa pembulatan bisa sedikit negatif
+    np.fill_diagonal(dist, 0.0)
+    return dist
+
+
+def pairwise_sq_distances(contribs, flat_layout) -> np.ndarray:
+    return distances_from_gram(gram_matrix(contribs, flat_layout))
+
+
+def krum_scores(dist: np.ndarray, f: int) -> np.ndarray:
+    """Skor krum tiap client: jumlah n−f−2 jarak terkecil ke client lain."""
+    n = dist.shape[0]
+    neighbours = n - f - 2
+    # diagonal (jarak ke diri sendiri = 0) dibuang dengan +inf
+    others = dist + np.diag(np.full(n, np.inf))
+    nearest = np.partition(others, neighbours - 1, axis=1)[:, :neighbours]
+    return nearest.sum(axis=1)
+
+
+def _byzantine_count(n: int, f) -> int:
+    # krum butuh n ≥ 2f + 3; default = toleransi maksimum
+    f = (n - 3) // 2 if f is None else int(f)
+    if f < 0 or n < 2 * f + 3:
+        raise ValueError(f"krum butuh jumlah client ≥ 2f+3 (client={n}, f={f})")
+    return f
+
+
+def krum_select(dist: np.ndarray, f: int = None, m: int = None) -> tuple:
+    """(index client terpilih, info) dari matriks jarak; dipakai juga oleh parallel_agg."""
+    n = dist.shape[0]
+    f = _byzantine_count(n, f)
+    m = n - f if m is None else int(m)
+    if not 1 <= m <= n:
+        raise ValueError(f"m harus di antara 1 dan {n}")
+    scores = krum_scores(dist, f)
+    selected = np.argsort(scores, kind="stable")[:m]
+    return selected, {"f": f, "m": m, "selected": selected.tolist(), "scores": scores.tolist()}
+
+
+def multi_krum(contribs, weights, flat_layout, f: int = None, m: int = None, **params):
+    selected, info = krum_select(pairwise_sq_distances(contribs, flat_layout), f, m)
+    out, _ = weighted_mean([contribs[i] for i in selected], np.asarray(weights)[selected], flat_layout)
+    return out, info
+
+
+def krum(contribs, weights, flat_layout, f: int = None, **params):
+    return multi_krum(contribs, weights, flat_layout, f=f, m=1)
+
+
+AGGREGATORS = {
+    "mean": weighted_mean,
+    "median": coordinate_median,
+    "trimmed_mean": trimmed_mean,
+    "krum": krum,
+    "multi_krum": multi_krum,
+}
@@ -4,21 +4,40 @@ from pathlib import Path
 from datetime import datetime
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
-import tensorflow as tf
 import numpy as np
 import base64
+import hashlib
 import io
 import json
 import shutil
 import zipfile
 import tempfile
+import time
+import uuid
 from werkzeug.utils import secure_filename
 
+from model_store import ModelStore, file_lock, sha256_file, write_json_atomic
+from weights_format import describe_weights_format, load_npz_flat
+from flat_params import FlatLayout
+from layout import LayoutMismatch, LayoutRegistry, layout_digest, match_layout
+from jobs import JobError, JobQueue, SingleFlight
+from metrics_store import MetricsStore
+from running_fedavg import RunningFedAvg
+from aggregators import AGGREGATORS
+from parallel_agg import PARALLEL_AGG
+from evaluation import BatchEvaluator, global_predictor, load_validation_set
+from contribution import SHAPLEY_MAX_PERMUTATIONS, score_contributions
+from global_versions import GlobalVersions
+from fedbuff import FedBuffer
+from server_opt import SERVER_OPTIMIZER, SERVER_OPTIMIZERS, ServerOptimizer, resolve_params
+from secagg import SecAggError, SecAggRounds
+from result_cache import ResultCache
+from hierarchy import (REGION_NAME, SERVER_ROLE, SERVER_ROLES, UPSTREAM_URL, RegionalPartials,
+                       decode_partial, encode_partial, forward_partial, partial_meta)
+
 import os, shutil, tempfile, zipfile
 from pathlib import Path
 import numpy as np
-import joblib
-import tensorflow as tf
 import pandas as pd
 from datetime import datetime
 from flask import send_file, jsonify
@@ -33,11 +52,17 @@ app = Flask(__name__)
 # Ambil allowed frontend dari env (set di Railway)
 FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:3000")
 
+# header yang boleh dikirim browser/client (termasuk metadata upload binary)
+CORS_ALLOW_HEADERS = [
+    "Content-Type", "Authorization", "X-Requested-With",
+    "X-Client", "X-Metrics", "X-Accuracy", "X-Round", "X-Num-Examples", "X-Base-Version", "X-Offset",
+]
+
 CORS(
     app,
     resources={r"/*": {"origins": [FRONTEND_URL, "http://localhost:3000"]}},
     supports_credentials=True,
-    allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+    allow_headers=CORS_ALLOW_HEADERS,
     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
 )
 
@@ -51,7 +76,7 @@ def apply_cors(response):
     else:
         response.headers["Access-Control-Allow-Origin"] = FRONTEND_URL
     response.headers["Access-Control-Allow-Credentials"] = "true"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Requested-With"
+    response.headers["Access-Control-Allow-Headers"] = ", ".join(CORS_ALLOW_HEADERS)
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
     return response
 
@@ -64,6 +89,53 @@ MODELS_DIR.mkdir(parents=True, exist_ok=True)
 LOGS_DIR = MODELS_DIR / "logs"
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
+# riwayat & best accuracy client (SQLite WAL, menggantikan file teks di LOGS_DIR)
+METRICS_STORE = MetricsStore(MODELS_DIR / "metrics.db")
+METRICS_STORE.import_legacy_logs(LOGS_DIR)
+
+# blob bobot client (content-addressed) + index versi per client
+MODEL_STORE = ModelStore(MODELS_DIR / "store")
+
+# skema tensor kanonik (urutan nama, shape, dtype) untuk validasi upload
+LAYOUT_REGISTRY = LayoutRegistry(MODELS_DIR / "layout.json")
+
+# jumlah bobot berjalan (FedAvg inkremental), di-update setiap ingestion
+RUNNING_FEDAVG = RunningFedAvg(MODELS_DIR / "fedavg")
+
+# agregasi dua tingkat: root menyimpan partial sum kiriman server regional
+if SERVER_ROLE not in SERVER_ROLES:
+    raise ValueError(f"SERVER_ROLE tidak dikenal: {SERVER_ROLE} (pilihan: {', '.join(SERVER_ROLES)})")
+if SERVER_ROLE == "regional" and not (REGION_NAME and UPSTREAM_URL):
+    raise ValueError("SERVER_ROLE=regional butuh REGION_NAME dan UPSTREAM_URL")
+if REGION_NAME and secure_filename(REGION_NAME) != REGION_NAME:
+    raise ValueError(f"REGION_NAME tidak valid: {REGION_NAME}")
+REGIONAL_PARTIALS = RegionalPartials(MODELS_DIR / "partials")
+
+# registry versi model global (sync /aggregate & FedBuff); basis delta update async
+GLOBAL_VERSIONS = GlobalVersions(MODELS_DIR / "global_versions")
+
+def export_global_model(flat: np.ndarray, flat_layout: FlatLayout, method: str = "fedbuff") -> Path:
+    """Tulis vektor global sebagai NPZ per layer (arr_0, arr_1, ...) di MODELS_DIR."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")  # FedBuff bisa publish > 1x per detik
+    save_path = MODELS_DIR / f"global_model_{method}_{timestamp}.npz"
+    np.savez_compressed(save_path, *flat_layout.views(flat))
+    return save_path
+
+# state FedAvgM/FedAdam/FedYogi (m, v) di folder sendiri (bukan NPZ di models/ yang tampil di /logs),
+# dipakai ulang antar round
+SERVER_OPT = ServerOptimizer(MODELS_DIR / "server_opt" / "state.npz")
+if (MODELS_DIR / "server_optimizer.npz").exists() and not SERVER_OPT.path.exists():
+    SERVER_OPT.path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(MODELS_DIR / "server_optimizer.npz", SERVER_OPT.path)  # lokasi lama
+(MODELS_DIR / "server_optimizer.lock").unlink(missing_ok=True)
+resolve_params(SERVER_OPTIMIZER, {})  # SERVER_OPTIMIZER env tidak valid → gagal saat start
+
+# FedBuff: update dilipat ke buffer saat ingestion, global baru setiap FEDBUFF_K update (0 = nonaktif)
+FEDBUFF = FedBuffer(MODELS_DIR / "fedbuff", GLOBAL_VERSIONS, export_global_model)
+
+# secure aggregation: server hanya menerima bobot ter-mask, global = jumlah yang dibuka
+SECAGG = SecAggRounds(MODELS_DIR / "secagg")
+
 # ==========================================================
 # UTIL: path safety
 # ==========================================================
@@ -83,14 +155,26 @@ def safe_model_path(filename: str):
     except Exception:
         return None
 
+def valid_client_name(client: str) -> bool:
+    """
+    Nama client dipakai langsung sebagai nama file (store/index/<client>.json,
+    fedavg/contrib/<client>.npy, secagg .../<client>.*) → harus nama file aman.
+    """
+    return secure_filename(client) == client
+
 def remove_logs_for_client(client: str) -> dict:
     """
-    Hapus best_accuracy & history untuk client dari LOGS_DIR dan juga
-    dari folder client di MODELS_DIR jika ada.
+    Hapus best_accuracy & history untuk client dari METRICS_STORE, file log
+    lama di LOGS_DIR, dan juga dari folder client di MODELS_DIR jika ada.
     Mengembalikan dict berisi info berkas yg dihapus.
     """
     deleted = {"best": False, "history": False, "folder_best": False, "folder_history": False}
     try:
+        try:
+            deleted["metrics_rows"] = METRICS_STORE.delete_client(client)
+        except Exception as e:
+            print(f"⚠️ Gagal menghapus metrics {client} dari database: {e}")
+
         best_path = LOGS_DIR / f"{client}_best_accuracy.txt"
         history_path = LOGS_DIR / f"{client}_accuracy_history.txt"
 
@@ -130,20 +214,446 @@ def remove_logs_for_client(client: str) -> dict:
         print(f"⚠️ Error saat remove_logs_for_client({client}): {e}")
     return deleted
 
+# ==========================================================
+# UTIL: upload binary (streaming ke disk)
+# ==========================================================
+UPLOAD_TMP_DIR = MODELS_DIR / "tmp"
+UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024  # 1 MB per read → memori server tetap datar
+
+def stream_request_to_tempfile() -> tuple:
+    """
+    Tulis body request (application/octet-stream / chunked) langsung ke file
+    sementara di UPLOAD_TMP_DIR, potongan demi potongan, sambil menghitung
+    SHA-256-nya. Body tidak pernah dimuat utuh ke memori.
+    Return (path, sha256).
+    """
+    hasher = hashlib.sha256()
+    fd, tmp_name = tempfile.mkstemp(suffix=".npz.part", dir=UPLOAD_TMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = request.stream.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+    except Exception:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return Path(tmp_name), hasher.hexdigest()
+
+def link_client_view(client: str, object_path: Path) -> Path:
+    """
+    Buat/ganti models/<client>_weights.npz sebagai hard link ke object store
+    (O(1), tanpa menyalin byte) agar /logs, /download dan /delete tetap bekerja.
+    """
+    view_path = MODELS_DIR / f"{client}_weights.npz"
+    if view_path.exists() and os.path.samefile(view_path, object_path):
+        return view_path
+    tmp_link = UPLOAD_TMP_DIR / f"{client}_{uuid.uuid4().hex}.link"
+    try:
+        os.link(object_path, tmp_link)
+    except OSError:
+        shutil.copyfile(object_path, tmp_link)
+    os.replace(tmp_link, view_path)
+    return view_path
+
+def store_client_upload(client: str, tmp_path: Path, data: dict, digest: str = None) -> dict:
+    """
+    Validasi NPZ di tmp_path dari header saja (central directory + header .npy,
+    tanpa decompress) dan cocokkan dengan layout model (LayoutMismatch jika
+    tidak cocok), lalu simpan byte yang diterima apa adanya ke MODEL_STORE
+    (dedupe per SHA-256 file) dan catat versi + urutan tensor di index client.
+    Return info untuk response.
+    """
+    fmt = describe_weights_format(tmp_path)  # fp32 / fp16 / int8 (dequantize saat agregasi)
+    layout = LAYOUT_REGISTRY.ensure(fmt["tensors"])
+    tensor_order = match_layout(layout, fmt["tensors"])
+    if digest is None:
+        digest = sha256_file(tmp_path)
+    size = tmp_path.stat().st_size
+
+    round_num = data.get("round")
+    extra = {"precision": fmt["precision"], "layout": layout["sha256"], "tensor_order": tensor_order}
+    num_examples = parse_num_examples(data.get("num_examples"))
+    if num_examples is not None:
+        extra["num_examples"] = num_examples  # bobot client di FedAvg
+    base_version = parse_base_version(data.get("base_version"))
+    if base_version is not None:
+        extra["base_version"] = base_version  # versi global yang dipakai training (FedBuff)
+    # object + index dalam satu lock store: GC dari client lain tidak bisa menghapus object ini dulu
+    entry, object_path, created = MODEL_STORE.store_version(
+        client, tmp_path, digest, size,
+        round_num=int(round_num) if round_num not in (None, "") else None,
+        extra=extra,
+    )
+    view_path = link_client_view(client, object_path)
+
+    if created:
+        print(f"✅ Model dari {client} disimpan di {object_path} (round {entry['round']})")
+    else:
+        print(f"♻️ Model dari {client} identik dengan object {digest[:12]}…, tidak ditulis ulang")
+
+    return {
+        "saved_weights": str(view_path),
+        "sha256": digest,
+        "round": entry["round"],
+        "num_tensors": fmt["num_tensors"],
+        "precision": fmt["precision"],
+        "reordered": tensor_order != [t["name"] for t in fmt["tensors"]],
+        "deduplicated": not created,
+        "num_examples": num_examples,
+        "base_version": base_version,
+    }
+
+def parse_num_examples(value):
+    """num_examples dari metadata upload → int > 0, None jika tidak dikirim; ValueError jika tidak valid."""
+    if value in (None, ""):
+        return None
+    try:
+        num_examples = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"num_examples harus integer, bukan {value!r}")
+    if num_examples <= 0 or num_examples != float(value):
+        raise ValueError(f"num_examples harus integer > 0, bukan {value!r}")
+    return num_examples
+
+def parse_base_version(value):
+    """base_version (versi global basis training) → int ≥ 0, None jika tidak dikirim."""
+    if value in (None, ""):
+        return None
+    try:
+        base_version = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"base_version harus integer, bukan {value!r}")
+    if base_version < 0 or base_version != float(value):
+        raise ValueError(f"base_version harus integer ≥ 0, bukan {value!r}")
+    return base_version
+
+def validate_upload_fields(data: dict):
+    """Cek metadata numerik upload sebelum masuk antrian (ValueError → 400)."""
+    parse_num_examples(data.get("num_examples"))
+    parse_base_version(data.get("base_version"))
+
+def import_legacy_client_files():
+    """Masukkan models/<client>_weights.npz lama (sebelum ada store) ke MODEL_STORE."""
+    for path in MODELS_DIR.glob("*_weights.npz"):
+        client = path.name[:-len("_weights.npz")]
+        if not valid_client_name(client):
+            print(f"⚠️ Lewati {path}: nama client tidak valid")
+            continue
+        if MODEL_STORE.latest(client) is not None:
+            continue
+        try:
+            fd, tmp_name = tempfile.mkstemp(suffix=".npz.part", dir=UPLOAD_TMP_DIR)
+            os.close(fd)
+            shutil.copyfile(path, tmp_name)
+            store_client_upload(client, Path(tmp_name), {})
+        except Exception as e:
+            print(f"⚠️ Gagal import {path} ke model store: {e}")
+
+import_legacy_client_files()
+
+def read_binary_upload_fields() -> dict:
+    """
+    Untuk upload binary, client & metrics dikirim lewat header atau query:
+      X-Client / ?client=BANK_A
+      X-Metrics / ?metrics=<json>     (format sama dengan field "metrics" JSON)
+      X-Accuracy / ?accuracy=0.9123
+      X-Round / ?round=3               (optional, default: versi terakhir + 1)
+      X-Num-Examples / ?num_examples=N (optional, jumlah data training → bobot FedAvg)
+      X-Base-Version / ?base_version=V (optional, versi global yang dipakai training → FedBuff)
+    Return dict dengan bentuk yang sama seperti body JSON upload.
+    """
+    fields = {
+        "client": request.headers.get("X-Client") or request.args.get("client"),
+        "metrics": request.headers.get("X-Metrics") or request.args.get("metrics"),
+        "accuracy": request.headers.get("X-Accuracy") or request.args.get("accuracy"),
+        "round": request.headers.get("X-Round") or request.args.get("round"),
+        "num_examples": request.headers.get("X-Num-Examples") or request.args.get("num_examples"),
+        "base_version": request.headers.get("X-Base-Version") or request.args.get("base_version"),
+    }
+    return {k: v for k, v in fields.items() if v}
+
+# ==========================================================
+# UTIL: logging akurasi client
+# ==========================================================
+def history_lines_from_items(history_items) -> list:
+    """Normalisasi history dari client (string multi-baris / list str / list dict) menjadi baris teks."""
+    lines = []
+    if isinstance(history_items, str):
+        for ln in history_items.splitlines():
+            if ln.strip():
+                lines.append(ln.strip())
+    elif isinstance(history_items, list):
+        for item in history_items:
+            if isinstance(item, dict):
+                r = item.get("round", "")
+                accv = item.get("acc") or item.get("accuracy") or item.get("value", "")
+                ts = item.get("timestamp", "") or item.get("time", "")
+                if r != "":
+                    try:
+                        accf = float(accv) if accv != "" else ""
+                        lines.append(f"{r}\t{accf:.6f}\t{ts}")
+                    except Exception:
+                        lines.append(json.dumps(item, ensure_ascii=False))
+                else:
+                    lines.append(json.dumps(item, ensure_ascii=False))
+            else:
+                lines.append(str(item))
+    else:
+        lines = [str(history_items)]
+    return lines
+
+def log_client_metrics(client: str, data: dict) -> dict:
+    """
+    Tulis history & best accuracy client ke METRICS_STORE (satu transaksi per upload).
+    `data` adalah body upload (JSON atau hasil read_binary_upload_fields).
+    Mengembalikan dict info log untuk response.
+    """
+    metrics = data.get("metrics") or {}
+    if isinstance(metrics, str):
+        try:
+            metrics = json.loads(metrics)
+        except Exception:
+            metrics = {}
+
+    # possible scalar fields at top-level or inside metrics
+    accuracy_value = None
+    if isinstance(metrics, dict):
+        accuracy_value = metrics.get("accuracy") or metrics.get("best_accuracy")
+    if accuracy_value is None:
+        accuracy_value = data.get("accuracy") or data.get("best_accuracy")
+
+    # possible history provided inside metrics
+    history_items = None
+    if isinstance(metrics, dict):
+        history_items = metrics.get("history") or metrics.get("accuracy_history")
+
+    metrics_log = {}
+
+    lines = []
+    if history_items:
+        try:
+            lines = history_lines_from_items(history_items)
+        except Exception as e:
+            metrics_log["history_error"] = str(e)
+
+    acc = None
+    if accuracy_value is not None:
+        try:
+            acc = max(0.0, min(1.0, float(accuracy_value)))  # clamp to [0,1]
+        except Exception as e:
+            metrics_log["accuracy_error"] = str(e)
+            print(f"⚠️ Gagal memproses accuracy untuk {client}: {e}")
+
+    if not lines and acc is None:
+        return metrics_log
+
+    try:
+        written = METRICS_STORE.record(client, lines, acc)
+    except Exception as e:
+        metrics_log["metrics_error"] = str(e)
+        print(f"⚠️ Gagal menulis metrics untuk {client}: {e}")
+        return metrics_log
+
+    metrics_log["metrics_db"] = str(METRICS_STORE.path)
+    if lines:
+        metrics_log["history_written"] = written["history_written"]
+        metrics_log["history_duplicates"] = written["history_duplicates"]
+        print(f"📈 History untuk {client} ditambahkan ({written['history_written']} baris baru, "
+              f"{written['history_duplicates']} duplikat) -> {METRICS_STORE.path}")
+    metrics_log["cursor"] = METRICS_STORE.cursor(client)
+    if acc is not None:
+        metrics_log.update({"reported_accuracy": acc, "written_best": written["written_best"]})
+        print(f"📈 Metrics diterima dari {client}: acc={acc:.6f} -> log tersimpan")
+
+    return metrics_log
+
+# ==========================================================
+# ⏳ INGESTION QUEUE (upload diproses di background)
+#   request thread : tulis body ke spool → 202 + ingestion_id
+#   worker pool    : validasi header, simpan ke store, index versi, log metrics
+# ==========================================================
+SPOOL_DIR = MODELS_DIR / "spool"
+SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "4"))
+
+# metadata upload yang ikut dibawa ke worker (JSON, header binary, atau session)
+UPLOAD_FIELDS = ("metrics", "accuracy", "best_accuracy", "round", "num_examples", "base_version")
+INGEST_WAIT_SECONDS = 120  # batas tunggu untuk ?wait=1 (mode sinkron)
+
+def process_ingestion(job_id: str, payload: dict, report) -> dict:
+    """Handler worker: spool NPZ → store_client_upload → log_client_metrics."""
+    client = payload["client"]
+    data = payload.get("fields") or {}
+    spool_path = Path(payload["spool_path"])
+    try:
+        report("validating", 0.1)
+        try:
+            stored = store_client_upload(client, spool_path, data, payload.get("sha256"))
+        except LayoutMismatch as e:
+            raise JobError(f"layout mismatch: {e}", 422, layout_errors=e.errors)
+        except Exception as e:
+            raise JobError(f"failed to load npz: {e}", 400)
+    finally:
+        spool_path.unlink(missing_ok=True)  # sudah dipindah ke store atau ditolak
+
+    report("fedavg", 0.5)
+    loaded = update_running_fedavg(client)
+
+    fedbuff = None
+    if FEDBUFF.enabled and loaded is not None:
+        report("fedbuff", 0.6)
+        fedbuff = submit_fedbuff(client, *loaded)
+
+    report("metrics", 0.7)
+    metrics_log = log_client_metrics(client, data)
+
+    result = {"client": client, **stored}
+    if fedbuff is not None:
+        result["fedbuff"] = fedbuff
+    if payload.get("session_id"):
+        result["session_id"] = payload["session_id"]
+    if metrics_log:
+        result["metrics"] = metrics_log
+    return result
+
+def update_running_fedavg(client: str):
+    """
+    Masukkan versi terakhir client ke RUNNING_FEDAVG (gagal → diperbaiki oleh sync di /aggregate).
+    Return (entry, layout, flat_layout, flat) yang sudah di-decode, atau None.
+    """
+    entry = MODEL_STORE.latest(client)
+    layout = LAYOUT_REGISTRY.get()
+    if entry is None or layout is None or entry.get("layout") != layout["sha256"]:
+        return None
+    try:
+        flat_layout = FlatLayout.from_tensors(layout["tensors"])
+        flat = load_npz_flat(MODEL_STORE.object_path(entry["sha256"]), flat_layout, entry.get("tensor_order"))
+    except Exception as e:
+        print(f"⚠️ Bobot {client} gagal di-decode: {e}")
+        return None
+    try:
+        RUNNING_FEDAVG.update(client, entry["sha256"], flat, flat_layout, layout["sha256"],
+                              num_examples=entry.get("num_examples"))
+    except Exception as e:
+        print(f"⚠️ Running sum FedAvg untuk {client} gagal di-update: {e}")
+    return entry, layout, flat_layout, flat
+
+def submit_fedbuff(client: str, entry: dict, layout: dict, flat_layout: FlatLayout, flat: np.ndarray) -> dict:
+    """Lipat update ke buffer FedBuff; gagal tidak membatalkan ingestion (model tetap di store)."""
+    try:
+        info = FEDBUFF.submit(client, entry["sha256"], flat, flat_layout, layout["sha256"],
+                              num_examples=entry.get("num_examples"), base_version=entry.get("base_version"))
+    except Exception as e:
+        print(f"⚠️ FedBuff untuk {client} gagal: {e}")
+        return {"accepted": False, "reason": str(e)}
+    if not info["accepted"]:
+        print(f"⚠️ Update {client} tidak masuk buffer FedBuff: {info['reason']}")
+    return info
+
+INGEST_QUEUE = JobQueue(SPOOL_DIR / "jobs", process_ingestion, workers=INGEST_WORKERS, name="ingest")
+INGEST_QUEUE.recover()  # upload yang sudah di-spool tapi belum diproses saat server mati
+
+def enqueue_upload(client: str, src_path: Path, data: dict, digest: str, session_id: str = None):
+    """
+    Pindahkan file upload (tmp/session) ke spool lalu masukkan ke antrian.
+    Default: langsung 202. Dengan ?wait=1 request menunggu hasil worker
+    dan membalas seperti upload sinkron (200 / 400 / 422).
+    """
+    try:
+        validate_upload_fields(data)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    spool_path = SPOOL_DIR / f"{uuid.uuid4().hex}.npz"
+    os.replace(src_path, spool_path)
+    payload = {
+        "client": client,
+        "fields": {k: data[k] for k in UPLOAD_FIELDS if k in data},
+        "spool_path": str(spool_path),
+        "sha256": digest,
+    }
+    if session_id:
+        payload["session_id"] = session_id
+    job = INGEST_QUEUE.submit(payload, client=client)
+
+    if request.args.get("wait") in ("1", "true"):
+        job = INGEST_QUEUE.wait(job["id"], timeout=INGEST_WAIT_SECONDS)
+        if job.get("status") == "done":
+            return jsonify({"status": 200, "ingestion_id": job["id"], **job["result"], "message": "model uploaded"}), 200
+        if job.get("status") == "error":
+            resp = {"status": "error", "ingestion_id": job["id"], "message": job.get("error")}
+            if job.get("layout_errors"):
+                resp["layout_errors"] = job["layout_errors"]
+            return jsonify(resp), job.get("http_status", 500)
+
+    print(f"📥 Upload {client} masuk antrian ingestion {job['id']}")
+    resp = jsonify({
+        "status": 202,
+        "client": client,
+        "ingestion_id": job["id"],
+        "status_url": f"/ingestions/{job['id']}",
+        "sha256": digest,
+        "message": "model accepted, diproses di background"
+    })
+    resp.headers["Location"] = f"/ingestions/{job['id']}"
+    return resp, 202
+
+@app.route('/ingestions/<ingestion_id>', methods=['GET'])
+def ingestion_status(ingestion_id):
+    """Status upload di antrian: queued → validating → metrics → done | error."""
+    job = INGEST_QUEUE.get(ingestion_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "ingestion tidak ditemukan"}), 404
+    resp = {
+        "ingestion_id": job["id"],
+        "client": job.get("client"),
+        "state": job.get("status"),
+        "phase": job.get("phase"),
+        "progress": job.get("progress"),
+        "created": job.get("created"),
+        "updated": job.get("updated"),
+    }
+    if job.get("status") == "done":
+        resp["result"] = job.get("result")
+    elif job.get("status") == "error":
+        resp["error"] = job.get("error")
+        resp["http_status"] = job.get("http_status")
+        if job.get("layout_errors"):
+            resp["layout_errors"] = job["layout_errors"]
+    return jsonify(resp)
+
 # ==========================================================
 # 1️⃣ ENDPOINT: UPLOAD MODEL DARI CLIENT (dengan logging akurasi)
 # ==========================================================
 @app.route('/upload-model', methods=['POST'])
 def upload_model():
     """
-    Ekspektasi JSON body:
+    Dua format diterima:
+
+    1) Binary (default client, direkomendasikan):
+       Content-Type: application/octet-stream   (boleh chunked)
+       Header: X-Client, X-Metrics (json, optional), X-Accuracy (optional),
+               X-Num-Examples (optional, jumlah data training)
+       Body: file NPZ mentah → di-stream ke disk, memori server tetap datar.
+
+    2) JSON (fallback):
     {
       "client": "BANK_A",
       "compressed_weights": "<base64 npz>",
-      "metrics": { "best_accuracy": 0.9123, "history": [...] }   # optional
+      "metrics": { "best_accuracy": 0.9123, "history": [...] },  # optional
       // atau "accuracy": 0.9123
+      "num_examples": 30000      # optional, jumlah data training → bobot FedAvg
     }
     """
+    if request.mimetype == "application/octet-stream":
+        return upload_model_binary()
+
     try:
         data = request.get_json()
         if not data:
@@ -154,142 +664,543 @@ def upload_model():
 
         if not client:
             return jsonify({"status": "error", "message": "client missing"}), 400
+        if not valid_client_name(client):
+            return jsonify({"status": "error", "message": f"nama client tidak valid: {client}"}), 400
         if not compressed_weights:
             return jsonify({"status": "error", "message": "compressed_weights missing"}), 400
 
-        # Decode base64 -> load npz from bytes
+        # Decode base64 → tulis byte NPZ apa adanya (tanpa np.load / kompres ulang)
         try:
             binary_data = base64.b64decode(compressed_weights)
-            buffer = io.BytesIO(binary_data)
-            npzfile = np.load(buffer, allow_pickle=True)
-            weights = [npzfile[key] for key in npzfile]
         except Exception as e:
-            return jsonify({"status": "error", "message": f"failed to decode/load npz: {e}"}), 400
-
-        # Simpan bobot model
-        save_path = MODELS_DIR / f"{client}_weights.npz"
-        np.savez_compressed(save_path, *weights)
-        print(f"✅ Model dari {client} disimpan di {save_path}")
-
-        # -------------------------
-        # handle metrics / accuracy logging (accept various formats)
-        # -------------------------
-        metrics = data.get("metrics") or {}
-        if isinstance(metrics, str):
-            try:
-                metrics = json.loads(metrics)
-            except Exception:
-                metrics = {}
+            return jsonify({"status": "error", "message": f"failed to decode base64: {e}"}), 400
 
-        # possible scalar fields at top-level or inside metrics
-        accuracy_value = None
-        if isinstance(metrics, dict):
-            accuracy_value = metrics.get("accuracy") or metrics.get("best_accuracy")
-        if accuracy_value is None:
-            accuracy_value = data.get("accuracy") or data.get("best_accuracy")
+        fd, tmp_name = tempfile.mkstemp(suffix=".npz", dir=UPLOAD_TMP_DIR)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(binary_data)
+            return enqueue_upload(client, Path(tmp_name), data, hashlib.sha256(binary_data).hexdigest())
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)  # no-op jika sudah dipindah ke spool
 
-        # possible history provided inside metrics
-        history_items = None
-        if isinstance(metrics, dict):
-            history_items = metrics.get("history") or metrics.get("accuracy_history")
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        best_path = LOGS_DIR / f"{client}_best_accuracy.txt"
-        history_path = LOGS_DIR / f"{client}_accuracy_history.txt"
+def upload_model_binary():
+    """Upload NPZ mentah (octet-stream): stream ke file sementara → spool → antrian ingestion."""
+    tmp_path = None
+    try:
+        data = read_binary_upload_fields()
+        client = data.get("client")
+        if not client:
+            return jsonify({"status": "error", "message": "client missing (header X-Client atau ?client=)"}), 400
+        if not valid_client_name(client):
+            return jsonify({"status": "error", "message": f"nama client tidak valid: {client}"}), 400
 
-        metrics_log = {}
+        tmp_path, digest = stream_request_to_tempfile()
+        return enqueue_upload(client, tmp_path, data, digest)
 
-        # 1) append history entries if provided (history_items)
-        if history_items:
-            try:
-                lines = []
-                if isinstance(history_items, str):
-                    for ln in history_items.splitlines():
-                        if ln.strip():
-                            lines.append(ln.strip())
-                elif isinstance(history_items, list):
-                    for item in history_items:
-                        if isinstance(item, dict):
-                            r = item.get("round", "")
-                            accv = item.get("acc") or item.get("accuracy") or item.get("value", "")
-                            ts = item.get("timestamp", "") or item.get("time", "")
-                            if r != "":
-                                try:
-                                    accf = float(accv) if accv != "" else ""
-                                    lines.append(f"{r}\t{accf:.6f}\t{ts}")
-                                except Exception:
-                                    lines.append(json.dumps(item, ensure_ascii=False))
-                            else:
-                                lines.append(json.dumps(item, ensure_ascii=False))
-                        else:
-                            lines.append(str(item))
-                else:
-                    lines = [str(history_items)]
-
-                with open(history_path, "a", encoding="utf-8") as hf:
-                    for ln in lines:
-                        ln = ln.strip()
-                        if not ln:
-                            continue
-                        hf.write(ln + "\n")
-
-                metrics_log["history_written"] = len(lines)
-                metrics_log["history_path"] = str(history_path)
-                print(f"📈 History untuk {client} ditambahkan ({len(lines)} baris) -> {history_path}")
-            except Exception as e:
-                metrics_log["history_error"] = str(e)
-                print(f"⚠️ Gagal menulis history untuk {client}: {e}")
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
 
-        # 2) handle scalar/best accuracy update (update best jika meningkat)
-        if accuracy_value is not None:
-            try:
-                acc = float(accuracy_value)
-                acc = max(0.0, min(1.0, acc))  # clamp to [0,1]
+# ==========================================================
+# 1️⃣b ENDPOINT: UPLOAD SESSION (resumable, per chunk)
+#   POST /upload-session                 → init (client, size, sha256, metrics)
+#   GET  /upload-session/<id>            → offset terakhir yang sudah diterima
+#   PUT  /upload-session/<id>?offset=N   → tulis chunk di offset N
+#   POST /upload-session/<id>/commit     → verifikasi sha256 → simpan ke store
+# ==========================================================
+SESSIONS_DIR = MODELS_DIR / "sessions"
+SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
 
-                timestamp = datetime.utcnow().isoformat() + "Z"
-                # append to history as timestamped entry
-                try:
-                    with open(history_path, "a", encoding="utf-8") as hf:
-                        hf.write(f"{timestamp}\t{acc:.6f}\n")
-                except Exception:
-                    pass
+SESSION_CHUNK_BYTES = 4 * 1024 * 1024   # ukuran chunk yang disarankan ke client
+SESSION_TTL_SECONDS = 24 * 3600         # session tanpa aktivitas > 24 jam dibuang
 
-                prev_val = -1.0
-                if best_path.exists():
-                    try:
-                        prev_txt = best_path.read_text(encoding="utf-8").strip()
-                        prev_val = float(prev_txt) if prev_txt else -1.0
-                    except Exception:
-                        prev_val = -1.0
-
-                written_best = False
-                if acc > prev_val:
-                    best_path.write_text(f"{acc:.6f}\n", encoding="utf-8")
-                    written_best = True
-
-                metrics_log.update({
-                    "best_path": str(best_path),
-                    "reported_accuracy": acc,
-                    "written_best": written_best
-                })
-                print(f"📈 Metrics diterima dari {client}: acc={acc:.6f} -> log tersimpan")
-            except Exception as e:
-                metrics_log["accuracy_error"] = str(e)
-                print(f"⚠️ Gagal memproses accuracy untuk {client}: {e}")
+def session_dir(session_id: str):
+    """Folder session; None jika id tidak valid (cegah path traversal)."""
+    if not session_id or not all(ch in "0123456789abcdef" for ch in session_id):
+        return None
+    return SESSIONS_DIR / session_id
+
+def read_session(session_id: str):
+    sdir = session_dir(session_id)
+    if sdir is None or not (sdir / "meta.json").exists():
+        return None, None
+    with open(sdir / "meta.json", "r", encoding="utf-8") as f:
+        return sdir, json.load(f)
+
+def session_offset(sdir: Path) -> int:
+    part = sdir / "data.part"
+    return part.stat().st_size if part.exists() else 0
+
+def cleanup_stale_sessions():
+    now = datetime.now().timestamp()
+    for sdir in SESSIONS_DIR.iterdir():
+        try:
+            if sdir.is_dir() and now - sdir.stat().st_mtime > SESSION_TTL_SECONDS:
+                shutil.rmtree(sdir, ignore_errors=True)
+        except Exception:
+            pass
 
-        # build response
-        resp = {
-            "status": 200,
+@app.route('/upload-session', methods=['POST'])
+def upload_session_init():
+    """
+    Body JSON:
+    {
+      "client": "BANK_A",
+      "size": 123456,            # total byte file NPZ
+      "sha256": "<hex>",         # sha256 byte file (dicek saat commit)
+      "metrics": {...}, "accuracy": 0.91, "round": 3,  # optional, sama seperti /upload-model
+      "num_examples": 30000
+    }
+    Jika session untuk (client, sha256) yang sama masih ada, session itu
+    dikembalikan beserta offset-nya → client tinggal melanjutkan.
+    """
+    try:
+        data = request.get_json() or {}
+        client = data.get("client")
+        size = data.get("size")
+        digest = (data.get("sha256") or "").lower()
+        if not client:
+            return jsonify({"status": "error", "message": "client missing"}), 400
+        if not valid_client_name(client):
+            return jsonify({"status": "error", "message": f"nama client tidak valid: {client}"}), 400
+        if not isinstance(size, int) or size <= 0:
+            return jsonify({"status": "error", "message": "size harus integer > 0"}), 400
+        if len(digest) != 64:
+            return jsonify({"status": "error", "message": "sha256 missing/invalid"}), 400
+        try:
+            validate_upload_fields(data)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        cleanup_stale_sessions()
+
+        # resume session lama untuk file yang sama
+        for sdir in SESSIONS_DIR.iterdir():
+            meta_path = sdir / "meta.json"
+            if not meta_path.exists():
+                continue
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except Exception:
+                continue
+            if meta.get("client") == client and meta.get("sha256") == digest and meta.get("size") == size:
+                return jsonify({
+                    "status": 200,
+                    "session_id": sdir.name,
+                    "offset": session_offset(sdir),
+                    "size": size,
+                    "chunk_size": SESSION_CHUNK_BYTES,
+                    "resumed": True
+                }), 200
+
+        session_id = uuid.uuid4().hex
+        sdir = SESSIONS_DIR / session_id
+        sdir.mkdir(parents=True)
+        (sdir / "data.part").touch()
+        meta = {
             "client": client,
-            "saved_weights": str(save_path),
-            "message": "model uploaded"
+            "size": size,
+            "sha256": digest,
+            "created": datetime.utcnow().isoformat() + "Z",
+            "fields": {k: data[k] for k in UPLOAD_FIELDS if k in data},
         }
-        if metrics_log:
-            resp["metrics"] = metrics_log
+        write_json_atomic(sdir / "meta.json", meta)
+        print(f"📦 Upload session {session_id} dibuat untuk {client} ({size} bytes)")
+
+        return jsonify({
+            "status": 201,
+            "session_id": session_id,
+            "offset": 0,
+            "size": size,
+            "chunk_size": SESSION_CHUNK_BYTES,
+            "resumed": False
+        }), 201
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/upload-session/<session_id>', methods=['GET'])
+def upload_session_status(session_id):
+    sdir, meta = read_session(session_id)
+    if meta is None:
+        return jsonify({"status": "error", "message": "session tidak ditemukan"}), 404
+    return jsonify({
+        "session_id": session_id,
+        "client": meta["client"],
+        "offset": session_offset(sdir),
+        "size": meta["size"]
+    })
+
+@app.route('/upload-session/<session_id>', methods=['PUT'])
+def upload_session_chunk(session_id):
+    """Body = byte chunk (octet-stream). Query ?offset=N wajib sama dengan offset server."""
+    try:
+        sdir, meta = read_session(session_id)
+        if meta is None:
+            return jsonify({"status": "error", "message": "session tidak ditemukan"}), 404
+
+        try:
+            offset = int(request.args.get("offset", request.headers.get("X-Offset", "")))
+        except ValueError:
+            return jsonify({"status": "error", "message": "offset missing/invalid"}), 400
+
+        with file_lock(sdir / ".lock"):
+            current = session_offset(sdir)
+            if offset != current:
+                # client tertinggal/terdepan → kirim offset yang benar untuk resume
+                return jsonify({"status": "error", "message": "offset mismatch", "offset": current}), 409
+
+            written = 0
+            with open(sdir / "data.part", "ab") as part:
+                while True:
+                    chunk = request.stream.read(UPLOAD_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    if current + written + len(chunk) > meta["size"]:
+                        part.truncate(current)
+                        return jsonify({"status": "error", "message": "chunk melebihi size session", "offset": current}), 400
+                    part.write(chunk)
+                    written += len(chunk)
+
+        return jsonify({"status": 200, "session_id": session_id, "offset": current + written, "size": meta["size"]})
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/upload-session/<session_id>/commit', methods=['POST'])
+def upload_session_commit(session_id):
+    """Verifikasi ukuran + sha256 file lalu masukkan ke antrian ingestion seperti /upload-model."""
+    try:
+        sdir, meta = read_session(session_id)
+        if meta is None:
+            return jsonify({"status": "error", "message": "session tidak ditemukan"}), 404
+
+        body = request.get_json(silent=True) or {}
+        expected = (body.get("sha256") or meta["sha256"]).lower()
+
+        with file_lock(sdir / ".lock"):
+            part_path = sdir / "data.part"
+            received = session_offset(sdir)
+            if received != meta["size"]:
+                return jsonify({"status": "error", "message": "upload belum lengkap", "offset": received, "size": meta["size"]}), 409
+
+            actual = sha256_file(part_path)
+            if actual != expected:
+                # data korup → mulai ulang dari awal
+                part_path.write_bytes(b"")
+                return jsonify({"status": "error", "message": "checksum mismatch", "expected": expected, "actual": actual, "offset": 0}), 422
+
+            # file lengkap & checksum cocok → sisanya dikerjakan worker ingestion
+            client = meta["client"]
+            data = dict(meta.get("fields") or {})
+            resp = enqueue_upload(client, part_path, data, actual, session_id=session_id)
+
+        shutil.rmtree(sdir, ignore_errors=True)
+        return resp
 
-        return jsonify(resp), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# ==========================================================
+# 📐 ENDPOINT: LAYOUT MODEL (skema tensor kanonik)
+# ==========================================================
+@app.route('/layout', methods=['GET'])
+def get_layout():
+    layout = LAYOUT_REGISTRY.get()
+    if layout is None:
+        return jsonify({"status": "error", "message": "layout belum ada (akan di-pin dari upload valid pertama)"}), 404
+    return jsonify(layout)
+
+@app.route('/layout', methods=['POST'])
+def declare_layout():
+    """
+    Body JSON salah satu:
+      {"tensors": [{"name": "arr_0", "shape": [39], "dtype": "float32"}, ...]}
+      {"from_client": "BANK_A"}     # ambil dari versi terakhir client ini
+    """
+    try:
+        data = request.get_json() or {}
+        if data.get("from_client"):
+            entry = MODEL_STORE.latest(data["from_client"])
+            if entry is None:
+                return jsonify({"status": "error", "message": f"model {data['from_client']} tidak ditemukan"}), 404
+            tensors = describe_weights_format(MODEL_STORE.object_path(entry["sha256"]))["tensors"]
+        elif isinstance(data.get("tensors"), list) and data["tensors"]:
+            tensors = data["tensors"]
+        else:
+            return jsonify({"status": "error", "message": "tensors atau from_client required"}), 400
+
+        layout = LAYOUT_REGISTRY.declare(tensors)
+        print(f"📐 Layout model dideklarasikan ({len(layout['tensors'])} tensor)")
+        return jsonify({"status": "success", **layout})
+
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/layout', methods=['DELETE'])
+def reset_layout():
+    """Hapus layout → upload valid berikutnya menjadi layout baru."""
+    removed = LAYOUT_REGISTRY.clear()
+    return jsonify({"status": "success", "removed": removed})
+
+# ==========================================================
+# 🌐 HIERARKI: PARTIAL SUM DARI SERVER REGIONAL
+#   regional : /aggregate → forward_regional_partial() → POST <UPSTREAM_URL>/partials/<REGION>
+#   root     : simpan partial per region, dijumlah di /aggregate
+# ==========================================================
+def forward_regional_partial(layout: dict, reconciled: dict, total, state):
+    """Kirim running sum region (bukan model per bank, dari RUNNING_FEDAVG.partial()) ke root."""
+    if total is None:
+        raise JobError("running sum region masih kosong")
+
+    meta = partial_meta(REGION_NAME, layout, state)
+    body = encode_partial(total, meta)
+    try:
+        upstream = forward_partial(UPSTREAM_URL, REGION_NAME, body)
+    except RuntimeError as e:
+        print(f"⚠️ Partial region {REGION_NAME} gagal dikirim: {e}")
+        raise JobError(str(e), 502, upstream=UPSTREAM_URL)
 
+    print(f"📤 Partial region {REGION_NAME} ({meta['num_clients']} client, {len(body)} bytes) → {UPSTREAM_URL}")
+    return {
+        "status": "success",
+        "role": "regional",
+        "region": REGION_NAME,
+        "upstream": UPSTREAM_URL,
+        "num_clients": meta["num_clients"],
+        "clients": list(meta["clients"]),
+        "weighting": meta["weighting"],
+        "total_weight": meta["total_weight"],
+        "bytes_sent": len(body),
+        "reconciled": {k: v for k, v in reconciled.items() if v},
+        "upstream_response": upstream,
+    }
+
+@app.route('/partials/<region>', methods=['POST'])
+def upload_partial(region):
+    """Partial aggregate (NPZ: sum float64 + metadata) dari server regional."""
+    if SERVER_ROLE != "root":
+        return jsonify({"status": "error", "message": "partial hanya diterima oleh server root"}), 409
+    if secure_filename(region) != region:
+        return jsonify({"status": "error", "message": f"nama region tidak valid: {region}"}), 400
+
+    tmp_path = None
+    try:
+        tmp_path, digest = stream_request_to_tempfile()
+        try:
+            total, meta = decode_partial(tmp_path)
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"partial tidak valid: {e}"}), 400
+        if meta["region"] != region:
+            return jsonify({"status": "error", "message": f"region {meta['region']} != {region} di URL"}), 400
+
+        # layout root di-pin dari partial pertama jika belum ada
+        tensors = meta.get("layout_tensors") or []
+        if not tensors or layout_digest(tensors) != meta["layout"]:
+            return jsonify({"status": "error", "message": "layout_tensors tidak cocok dengan hash layout"}), 400
+        layout = LAYOUT_REGISTRY.ensure(tensors)
+        if layout["sha256"] != meta["layout"]:
+            return jsonify({"status": "error", "message": "layout region berbeda dengan layout root",
+                            "layout": layout["sha256"], "region_layout": meta["layout"]}), 422
+        if total.shape != (FlatLayout.from_tensors(layout["tensors"]).size,):
+            return jsonify({"status": "error", "message": f"ukuran sum {total.shape} tidak sesuai layout"}), 422
+
+        changed = REGIONAL_PARTIALS.put(region, total, meta, digest)
+        print(f"📥 Partial region {region}: {len(meta['clients'])} client, bobot {meta['total_weight']}"
+              f"{'' if changed else ' (tidak berubah)'}")
+        return jsonify({
+            "status": "success",
+            "region": region,
+            "num_clients": len(meta["clients"]),
+            "weighting": meta["weighting"],
+            "total_weight": meta["total_weight"],
+            "sha256": digest,
+            "changed": changed,
+        })
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+
+@app.route('/partials', methods=['GET'])
+def list_partials():
+    return jsonify({"role": SERVER_ROLE, **REGIONAL_PARTIALS.list()})
+
+@app.route('/partials/<region>', methods=['DELETE'])
+def delete_partial(region):
+    """Keluarkan region dari agregasi root (mis. bank dipindah ke region lain)."""
+    if not REGIONAL_PARTIALS.remove(region):
+        return jsonify({"status": "error", "message": f"partial {region} tidak ditemukan"}), 404
+    return jsonify({"status": "success", "removed": region})
+
+# ==========================================================
+# ⚡ FEDBUFF (agregasi async) & VERSI GLOBAL
+# ==========================================================
+@app.route('/fedbuff', methods=['GET'])
+def fedbuff_status():
+    """Isi buffer FedBuff + jumlah versi global per jam."""
+    return jsonify({**FEDBUFF.status(), "versions": GLOBAL_VERSIONS.summary()})
+
+@app.route('/fedbuff/flush', methods=['POST'])
+def fedbuff_flush():
+    """Publikasikan buffer sekarang walaupun belum FEDBUFF_K update (mis. di akhir training)."""
+    layout = LAYOUT_REGISTRY.get()
+    if layout is None:
+        return jsonify({"status": "error", "message": "layout belum ada"}), 400
+    try:
+        published = FEDBUFF.flush(FlatLayout.from_tensors(layout["tensors"]))
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
+    if published is None:
+        return jsonify({"status": "error", "message": "buffer FedBuff kosong"}), 400
+    return jsonify({"status": "success", "published": published})
+
+@app.route('/server-optimizer', methods=['GET'])
+def server_optimizer_status():
+    """State optimizer server (nama, step, hyperparameter, versi global basis)."""
+    return jsonify({"default": SERVER_OPTIMIZER, "optimizers": SERVER_OPTIMIZERS, "state": SERVER_OPT.state()})
+
+@app.route('/global-versions', methods=['GET'])
+def list_global_versions():
+    return jsonify({**GLOBAL_VERSIONS.summary(), "versions": GLOBAL_VERSIONS.list()})
+
+# ==========================================================
+# 🔐 SECURE AGGREGATION (pairwise mask, lihat secagg.py)
+#   POST /secagg/<round>             → buka round {"expected", "threshold"?}
+#   POST /secagg/<round>/keys        → {"client", "c_pk", "s_pk"}
+#   POST /secagg/<round>/shares      → {"client", "b_commit", "shares": {peer: blob}}
+#   GET  /secagg/<round>/shares/<c>  → share terenkripsi untuk bank c
+#   POST /secagg/<round>/masked      → .npy uint64 (X-Client, X-Num-Examples)
+#   POST /secagg/<round>/unmask      → {"client", "b_shares", "s_sk_shares"}
+#   POST /secagg/<round>/advance     → tutup fase dengan bank yang sudah masuk (dropout)
+# ==========================================================
+def secagg_round_id(round_id: str) -> str:
+    if secure_filename(round_id) != round_id:
+        raise SecAggError(f"nama round tidak valid: {round_id}")
+    return round_id
+
+def secagg_client(client: str) -> str:
+    if not valid_client_name(client):
+        raise SecAggError(f"nama client tidak valid: {client}")
+    return client
+
+def publish_secagg_result(state: dict, avg_flat: np.ndarray) -> dict:
+    """Rata-rata hasil unmask → NPZ global + versi registry (source "secagg")."""
+    layout = LAYOUT_REGISTRY.get()
+    if layout is None or layout["sha256"] != state["layout"]:
+        raise ValueError("layout server berubah sejak round secagg dibuka")
+    flat_layout = FlatLayout.from_tensors(layout["tensors"])
+    flat = avg_flat.astype(np.float32)
+    path = export_global_model(flat, flat_layout, method="secagg")
+    survivors = sorted(state["u3"])
+    entry = GLOBAL_VERSIONS.register(flat, state["layout"], path, "secagg", {
+        "round": state["round"],
+        "clients": survivors,
+        "dropped": sorted(set(state["u2"]) - set(survivors)),
+        "num_examples": sum(state["u3"].values()),
+    })
+    print(f"🔐 SecAgg round {state['round']}: global v{entry['version']} dari {len(survivors)} bank → {path}")
+    return {"version": entry["version"], "file": entry["file"], "num_clients": len(survivors)}
+
+def secagg_json_body(*keys) -> dict:
+    data = request.get_json(silent=True) or {}
+    missing = [k for k in keys if not data.get(k)]
+    if missing:
+        raise SecAggError(f"field wajib tidak ada: {', '.join(missing)}")
+    return data
+
+@app.errorhandler(SecAggError)
+def handle_secagg_error(e):
+    return jsonify({"status": "error", "message": str(e)}), e.http_status
+
+@app.route('/secagg', methods=['GET'])
+def list_secagg_rounds():
+    return jsonify({"rounds": SECAGG.list()})
+
+@app.route('/secagg/<round_id>', methods=['POST'])
+def secagg_create(round_id):
+    layout = LAYOUT_REGISTRY.get()
+    if layout is None:
+        return jsonify({"status": "error", "message": "layout belum ada (POST /layout dulu)"}), 400
+    data = request.get_json(silent=True) or {}
+    try:
+        expected = int(data.get("expected", 0))
+        threshold = int(data.get("threshold") or max(2, expected // 2 + 1))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "expected/threshold harus bilangan bulat"}), 400
+    size = FlatLayout.from_tensors(layout["tensors"]).size
+    SECAGG.create(secagg_round_id(round_id), expected, threshold, layout["sha256"], size)
+    return jsonify({"status": "success", **SECAGG.status(round_id)})
+
+@app.route('/secagg/<round_id>', methods=['GET'])
+def secagg_status(round_id):
+    return jsonify(SECAGG.status(secagg_round_id(round_id)))
+
+@app.route('/secagg/<round_id>/keys', methods=['POST'])
+def secagg_keys(round_id):
+    data = secagg_json_body("client", "c_pk", "s_pk")
+    try:
+        status = SECAGG.add_keys(secagg_round_id(round_id), secagg_client(data["client"]), data["c_pk"], data["s_pk"])
+    except ValueError:
+        return jsonify({"status": "error", "message": "kunci publik harus hex"}), 400
+    return jsonify({"status": "success", **status})
+
+@app.route('/secagg/<round_id>/shares', methods=['POST'])
+def secagg_shares(round_id):
+    data = secagg_json_body("client", "b_commit")
+    if not isinstance(data.get("shares"), dict):
+        return jsonify({"status": "error", "message": "shares harus object {peer: blob}"}), 400
+    status = SECAGG.add_shares(secagg_round_id(round_id), secagg_client(data["client"]), data["b_commit"], data["shares"])
+    return jsonify({"status": "success", **status})
+
+@app.route('/secagg/<round_id>/shares/<client>', methods=['GET'])
+def secagg_shares_for(round_id, client):
+    return jsonify({"client": client, "shares": SECAGG.shares_for(secagg_round_id(round_id), secagg_client(client))})
+
+@app.route('/secagg/<round_id>/masked', methods=['POST'])
+def secagg_masked(round_id):
+    round_id = secagg_round_id(round_id)
+    client = request.headers.get("X-Client")
+    if not client:
+        return jsonify({"status": "error", "message": "header X-Client required"}), 400
+    secagg_client(client)
+    try:
+        num_examples = parse_num_examples(request.headers.get("X-Num-Examples"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if not num_examples:
+        return jsonify({"status": "error", "message": "X-Num-Examples wajib untuk secagg (bobot sudah dikali n)"}), 400
+
+    tmp_path, _ = stream_request_to_tempfile()
+    try:
+        status = SECAGG.add_masked(round_id, client, tmp_path, num_examples)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"masked input tidak valid: {e}"}), 400
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return jsonify({"status": "success", **status})
+
+@app.route('/secagg/<round_id>/unmask', methods=['POST'])
+def secagg_unmask(round_id):
+    data = secagg_json_body("client")
+    status = SECAGG.add_unmask(secagg_round_id(round_id), secagg_client(data["client"]), data.get("b_shares") or {},
+                               data.get("s_sk_shares") or {}, publish_secagg_result)
+    return jsonify({"status": "success", **status})
+
+@app.route('/secagg/<round_id>/advance', methods=['POST'])
+def secagg_advance(round_id):
+    """Koordinator menutup fase saat batas waktu habis; bank yang belum masuk dianggap dropout."""
+    return jsonify({"status": "success", **SECAGG.advance(secagg_round_id(round_id), publish_secagg_result)})
 
 # ==========================================================
 # HELPER: Preprocessing dan Testing (dari test.py)
@@ -326,42 +1237,43 @@ def auto_threshold(y_true, y_prob):
         t_roc = 0.5
     return float(np.clip((t_pr + t_roc) / 2, 0, 1))
 
-def test_global_model_silent(model_path, preproc_path, cases, label):
-    """Test model global dengan test cases, return (correct, total, accuracy)."""
-    try:
-        model = tf.saved_model.load(model_path)
-        preproc = joblib.load(preproc_path)
-    except Exception as e:
-        print(f"⚠️ Gagal memuat model untuk testing {label}: {e}")
-        return 0, 0, 0.0
-    
-    probs, labels = [], []
-    for i, (data, expected) in enumerate(cases):
-        try:
-            X = preprocess_transaction(data, preproc)
-            # Use the model's serving signature
-            infer = model.signatures["serving_default"]
-            y_pred = list(infer(tf.constant(X)).values())[0].numpy().flatten()[0]
-            probs.append(y_pred)
-            labels.append(expected)
-        except Exception as e:
-            print(f"⚠️ Gagal uji kasus {i+1} pada {label}: {e}")
-    
-    if not probs:
-        return 0, 0, 0.0
-    
-    threshold = auto_threshold(labels, probs)
-    
-    correct = 0
-    for p, y in zip(probs, labels):
-        pred = int(p >= threshold)
-        if pred == y:
-            correct += 1
-    
-    total = len(labels)
-    acc = correct / total * 100 if total > 0 else 0.0
-    
-    return correct, total, acc
+def evaluate_global_model(flat: np.ndarray, flat_layout: FlatLayout, preproc_path: Path, key: str):
+    """
+    Akurasi model global (vektor flat) atas test case semua bank: semua transaksi di-encode
+    ke satu matriks fitur lalu diskor dengan satu forward pass batch. Threshold per bank
+    tetap dari auto_threshold. None jika file preprocessing tidak ada.
+    key = nama file global (serving function-nya di-cache sampai global berikutnya terbit).
+    """
+    start = time.perf_counter()
+    all_cases = [case for _, cases in BANK_TEST_CASES for case in cases]
+    validation = load_validation_set(preproc_path, all_cases, csv_path="")
+    if validation is None:
+        return None
+    X, y = validation
+    probs = global_predictor(flat, flat_layout, key)(X)
+
+    per_bank, offset = [], 0
+    for label, cases in BANK_TEST_CASES:
+        bank_probs, bank_labels = probs[offset:offset + len(cases)], y[offset:offset + len(cases)]
+        offset += len(cases)
+        threshold = auto_threshold(bank_labels, bank_probs)
+        correct = int(((bank_probs >= threshold) == (bank_labels >= 0.5)).sum())
+        per_bank.append({
+            "bank": label,
+            "accuracy": round(correct / len(cases) * 100, 2),
+            "correct": correct,
+            "total": len(cases),
+        })
+
+    totals_correct = sum(bank["correct"] for bank in per_bank)
+    return {
+        "total_accuracy": round(totals_correct / len(all_cases) * 100, 2),
+        "total_correct": totals_correct,
+        "total_cases": len(all_cases),
+        "per_bank_results": per_bank,
+        "test_model_used": "in_memory",
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
 
 # Test cases dari test.py
 BANK_A_CASES = [
@@ -406,283 +1318,665 @@ BANK_F_CASES = [
     ({"amount": 17000000, "merchant_category": "gambling", "location": "Macau", "is_international": 1, "transaction_frequency_24h": 1}, 1),
 ]
 
+BANK_TEST_CASES = [
+    ("BANK A", BANK_A_CASES),
+    ("BANK B", BANK_B_CASES),
+    ("BANK C", BANK_C_CASES),
+    ("BANK D", BANK_D_CASES),
+    ("BANK E", BANK_E_CASES),
+    ("BANK F", BANK_F_CASES),
+]
+
 # ==========================================================
 # 2️⃣ ENDPOINT: AGREGASI SEMUA MODEL (FedAvg sederhana)
 # ==========================================================
 LAST_WEIGHT_FILE = MODELS_DIR / "last_avg_weight.json"
 
-@app.route('/aggregate', methods=['POST'])
-def aggregate_models():
-    try:
-        model_dir = MODELS_DIR
-        client_files = [f for f in os.listdir(model_dir) if f.endswith("_weights.npz")]
-
-        # Data size (optional) → untuk perhitungan kontribusi FedAvg
-        req_json = request.get_json(silent=True) or {}
-        data_sizes = req_json.get("data_sizes", {})
-
-        # Jika model kurang dari 2 → beri pesan lebih informatif
-        if len(client_files) < 2:
-            if len(client_files) == 0:
-                msg = (
-                    "Tidak ada model lokal yang ditemukan. "
-                    "Setidaknya dua client harus mengirimkan model sebelum agregasi dapat dilakukan."
-                )
-            else:  # hanya 1 model
-                msg = (
-                    f"Hanya ditemukan 1 model lokal ({client_files[0]}). "
-                    "Minimal 2 model diperlukan untuk melakukan Federated Averaging."
-                )
+AGGREGATION_MODES = ["running_sum", "out_of_core"]
 
-            return jsonify({
-                "status": "error",
-                "message": msg,
-                "found_models": client_files,
-                "required": 2,
-                "current": len(client_files)
-            }), 400
-
-        print(f"🧮 Memulai Federated Averaging untuk {len(client_files)} client...")
-
-        # =======================================
-        # LOAD semua bobot client
-        # =======================================
-        all_weights = []
-        client_weights_dict = {}   # untuk dimasukkan ke response
-        client_mean_dict = {}      # untuk perhitungan kontribusi mean weight
-
-        for fname in client_files:
-            npz = np.load(model_dir / fname, allow_pickle=True)
-            weights = [npz[key] for key in npz]
-            all_weights.append(weights)
-
-            # convert ke JSON-friendly
-            client_weights_dict[fname] = [w.tolist() for w in weights]
-
-            # Hitung rata-rata bobot client
-            flat = np.concatenate([w.flatten() for w in weights])
-            client_mean_dict[fname] = float(np.mean(flat))
-
-            print(f"✅ {fname} dimuat ({len(weights)} layer)")
-
-        num_layers = len(all_weights[0])
-        avg_weights = []
-
-        # =======================================
-        # RATA-RATA FEDAVG
-        # =======================================
-        for layer_idx in range(num_layers):
-            layer_values = [client[layer_idx] for client in all_weights]
-            try:
-                stacked = np.stack(layer_values, axis=0)
-                averaged = np.mean(stacked, axis=0)
-                avg_weights.append(averaged)
-            except Exception:
-                avg_weights.append(layer_values[-1])
-                print(f"⚠️ Layer {layer_idx} BatchNorm moving stats, tidak di-average")
-
-        # =======================================
-        # SIMPAN MODEL GLOBAL
-        # =======================================
-        from datetime import datetime
-
-        # ============================
-        # BUAT NAMA FILE PAKAI TIMESTAMP
-        # ============================
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"global_model_fedavg_{timestamp}.npz"
-        save_path = model_dir / filename
-
-        np.savez_compressed(save_path, *avg_weights)
-
-        print(f"🎯 FedAvg selesai → disimpan di {save_path}")
+# kontribusi bank (opt-in): "none" (default), leave-one-out dari running sum, atau Monte Carlo Shapley
+CONTRIBUTION_METHODS = ["loo", "shapley", "none"]
+DEFAULT_SHAPLEY_PERMUTATIONS = 20
+VALIDATION_PREPROC_PATH = Path("models_global/fitur_global_test.pkl")
 
+def score_client_contributions(flat_layout: FlatLayout, method: str, permutations: int) -> dict:
+    """LOO (+ Shapley) atas running sum yang baru di-sync; model kandidat dievaluasi batch di memori."""
+    cases = [case for _, bank_cases in BANK_TEST_CASES for case in bank_cases]
+    validation = load_validation_set(VALIDATION_PREPROC_PATH, cases)
+    if validation is None:
+        return {"skipped": f"preprocessing validation tidak ditemukan: {VALIDATION_PREPROC_PATH}"}
+    try:
+        evaluator = BatchEvaluator(flat_layout, *validation)
+    except ValueError as e:
+        return {"skipped": str(e)}
+    report = RUNNING_FEDAVG.score_with(score_contributions, evaluator=evaluator,
+                                       shapley_permutations=permutations if method == "shapley" else 0)
+    if report is None:
+        return {"skipped": "running sum kosong"}
+    # nama client → nama file, sama dengan field kontribusi lain di response
+    report["clients"] = {f"{c}_weights.npz": v for c, v in report["clients"].items()}
+    if "shapley" in report:
+        report["shapley"]["clients"] = {f"{c}_weights.npz": v for c, v in report["shapley"]["clients"].items()}
+    return report
+
+# parameter /aggregate yang juga boleh dikirim sebagai query string (?mode=...)
+AGGREGATE_QUERY_PARAMS = ["mode", "aggregator", "server_optimizer", "contribution", "shapley_permutations"]
+
+def parse_aggregate_params(params: dict) -> dict:
+    """Validasi parameter /aggregate (body JSON + query) → dict ter-normalisasi; JobError 400 jika tidak valid."""
+    # Data size (optional) → hanya untuk laporan kontribusi; bobot FedAvg
+    # sendiri memakai num_examples yang dilaporkan client saat upload
+    data_sizes = params.get("data_sizes") or {}
+    if not isinstance(data_sizes, dict):
+        raise JobError("data_sizes harus object JSON")
+
+    # running_sum (default): sum / bobot total
+    # out_of_core: hitung ulang dari kontribusi client yang di-mmap, per tensor
+    mode = params.get("mode") or "running_sum"
+    if mode not in AGGREGATION_MODES:
+        raise JobError(f"mode tidak dikenal: {mode}", modes=AGGREGATION_MODES)
+
+    # aturan agregasi: mean (default, FedAvg) atau robust (median, trimmed_mean, krum, multi_krum)
+    aggregator = params.get("aggregator") or "mean"
+    aggregator_params = params.get("aggregator_params") or {}
+    if aggregator not in AGGREGATORS:
+        raise JobError(f"aggregator tidak dikenal: {aggregator}", aggregators=list(AGGREGATORS))
+    if not isinstance(aggregator_params, dict):
+        raise JobError("aggregator_params harus object JSON")
+
+    # optimizer server: none (agregat = global baru) | fedavgm | fedadam | fedyogi
+    server_optimizer = params.get("server_optimizer") or SERVER_OPTIMIZER
+    server_optimizer_params = params.get("server_optimizer_params") or {}
+    if not isinstance(server_optimizer_params, dict):
+        raise JobError("server_optimizer_params harus object JSON")
+    try:
+        resolve_params(server_optimizer, server_optimizer_params)
+    except ValueError as e:
+        raise JobError(str(e), server_optimizers=list(SERVER_OPTIMIZERS))
+
+    # kontribusi per bank (opt-in, butuh evaluasi validation set): "none" (default) | "loo" |
+    # "shapley" (+ Monte Carlo, budget = jumlah permutasi)
+    contribution = params.get("contribution") or "none"
+    if contribution not in CONTRIBUTION_METHODS:
+        raise JobError(f"contribution tidak dikenal: {contribution}", contribution_methods=CONTRIBUTION_METHODS)
+    try:
+        shapley_permutations = int(params.get("shapley_permutations", DEFAULT_SHAPLEY_PERMUTATIONS))
+    except (TypeError, ValueError):
+        raise JobError("shapley_permutations harus integer")
+    if not 1 <= shapley_permutations <= SHAPLEY_MAX_PERMUTATIONS:
+        raise JobError(f"shapley_permutations harus 1..{SHAPLEY_MAX_PERMUTATIONS}")
 
-        # =======================================
-        # HITUNG TOTAL PARAMETER
-        # =======================================
-        total_params = sum(w.size for w in avg_weights)
+    return {
+        "data_sizes": data_sizes, "mode": mode, "aggregator": aggregator, "aggregator_params": aggregator_params,
+        "server_optimizer": server_optimizer, "server_optimizer_params": server_optimizer_params,
+        "contribution": contribution, "shapley_permutations": shapley_permutations,
+    }
 
-        # =======================================
-        # HITUNG RATA-RATA BOBOT GLOBAL
-        # =======================================
-        flat_weights = np.concatenate([w.flatten() for w in avg_weights])
-        avg_global_weight = float(np.mean(flat_weights))
+def aggregate_fingerprint(opts: dict, snapshot: dict = None) -> str:
+    """
+    Hash input agregasi: snapshot model client (sha256 + num_examples per client), layout, partial region,
+    parameter ter-normalisasi dan (jika ada optimizer server) versi global yang menjadi basis.
+    Request /aggregate dengan fingerprint sama akan menghasilkan global model yang sama.
+    """
+    snapshot = MODEL_STORE.snapshot() if snapshot is None else snapshot
+    layout = LAYOUT_REGISTRY.get()
+    layout_sha = layout["sha256"] if layout else None
+    partials = REGIONAL_PARTIALS.snapshot(layout_sha) if SERVER_ROLE == "root" and layout else {}
+    latest = GLOBAL_VERSIONS.latest() if opts["server_optimizer"] != "none" else None
+    key = {
+        "clients": {client: [entry["sha256"], entry.get("num_examples")] for client, entry in snapshot.items()},
+        "layout": layout_sha,
+        "partials": {region: info["sha256"] for region, info in partials.items()},
+        "params": opts,
+        "role": SERVER_ROLE,
+        "base_version": latest["version"] if latest else None,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
 
-        # =======================================
-        # BACA NILAI SEBELUMNYA
-        # =======================================
-        last_weight_path = model_dir / "last_avg_weight.json"
-        last_weight = None
+def cached_aggregate(fingerprint: str):
+    """
+    Laporan agregasi tersimpan untuk fingerprint ini, selama NPZ global-nya masih ada dan
+    masih menjadi versi global terbaru (FedBuff / secagg / agregasi lain belum menggantinya).
+    """
+    if SERVER_ROLE == "regional":
+        return None  # regional selalu meneruskan partial ke upstream
+    entry = AGGREGATE_CACHE.get(fingerprint)
+    if entry is None:
+        return None
+    result = entry["result"]
+    latest = GLOBAL_VERSIONS.latest()
+    if latest is None or latest["version"] != result.get("global_version") or not Path(result["saved"]).exists():
+        return None
+    AGGREGATE_CACHE.touch(fingerprint)
+    return {**result, "cached": True, "cached_at": entry["created"]}
+
+def run_aggregation(job_id: str, payload: dict, report) -> dict:
+    """Handler job agregasi (AGGREGATE_QUEUE): satu agregasi sekaligus di semua worker gunicorn."""
+    # running sum, optimizer server, last_avg_weight.json & global_versions dipakai bersama
+    # oleh semua proses → agregasi antar-proses diserialkan lewat flock
+    report("waiting_lock", 0.0)
+    with file_lock(AGGREGATE_LOCK_PATH):
+        return aggregate_locked(job_id, payload, report)
+
+def aggregate_locked(job_id: str, payload: dict, report) -> dict:
+    """Isi agregasi (dipanggil di bawah AGGREGATE_LOCK_PATH): payload = parameter /aggregate, return laporan lengkap."""
+    model_dir = MODELS_DIR
+    report("snapshot", 0.05)
+
+    # Snapshot hash terbaru per client → input agregasi tidak berubah
+    # walaupun ada upload baru selama agregasi berjalan
+    snapshot = MODEL_STORE.snapshot()
+    opts = parse_aggregate_params(payload)
+
+    # input sama dengan agregasi sebelumnya (mis. dihitung worker lain selama job ini
+    # menunggu lock) → pakai laporan & NPZ global yang sudah ada
+    fingerprint = aggregate_fingerprint(opts, snapshot)
+    cached = cached_aggregate(fingerprint)
+    if cached is not None:
+        print(f"🗃️ Input agregasi tidak berubah → hasil cache {cached['saved']}")
+        return cached
+
+    # Cek layout tiap versi (header saja, O(#tensor)) → upload yang tidak cocok
+    # dikeluarkan dari round, bukan membuat FedAvg crash / salah diam-diam
+    layout = LAYOUT_REGISTRY.get()
+    tensor_orders = {}
+    skipped_clients = {}
+    skipped_entries = {}
+    for client in list(snapshot):
+        entry = snapshot[client]
+        if layout is None or entry.get("layout") == layout["sha256"]:
+            tensor_orders[client] = entry.get("tensor_order")
+            continue
+        try:
+            fmt = describe_weights_format(MODEL_STORE.object_path(entry["sha256"]))
+            tensor_orders[client] = match_layout(layout, fmt["tensors"])
+        except Exception as e:
+            skipped_clients[f"{client}_weights.npz"] = str(e)
+            skipped_entries[client] = snapshot.pop(client)
+            print(f"⚠️ {client} dilewati: tidak cocok dengan layout ({e})")
+
+    # Hierarki (root): bank di belakang server regional ikut dihitung lewat partial sum region
+    partials = REGIONAL_PARTIALS.snapshot(layout["sha256"]) if SERVER_ROLE == "root" and layout else {}
+    regional_clients = [client for info in partials.values() for client in info["clients"]]
+    all_clients = list(snapshot) + regional_clients
+    duplicates = sorted({client for client in all_clients if all_clients.count(client) > 1})
+
+    client_files = [f"{client}_weights.npz" for client in all_clients]
+
+    data_sizes = opts["data_sizes"]
+    mode, aggregator, aggregator_params = opts["mode"], opts["aggregator"], opts["aggregator_params"]
+    server_optimizer, server_optimizer_params = opts["server_optimizer"], opts["server_optimizer_params"]
+    contribution_method, shapley_permutations = opts["contribution"], opts["shapley_permutations"]
+
+    if aggregator != "mean" and (partials or SERVER_ROLE == "regional"):
+        # partial sum tidak menyimpan kontribusi per bank → aturan robust tidak bisa dihitung
+        raise JobError(f"aggregator {aggregator} butuh model per client; agregasi hierarki hanya mendukung mean")
+    if duplicates:
+        raise JobError("client terhitung lebih dari sekali (lokal/region lain); hapus partial lama lewat DELETE /partials/<region>",
+                       409, duplicates=duplicates)
+
+    # Jika model kurang dari 2 → beri pesan lebih informatif
+    # (regional cukup 1: partial-nya tetap digabung dengan region lain di root)
+    required = 1 if SERVER_ROLE == "regional" else 2
+    if len(client_files) < required:
+        if len(client_files) == 0:
+            msg = (
+                "Tidak ada model lokal yang ditemukan. "
+                "Setidaknya dua client harus mengirimkan model sebelum agregasi dapat dilakukan."
+            )
+        else:  # hanya 1 model
+            msg = (
+                f"Hanya ditemukan 1 model lokal ({client_files[0]}). "
+                "Minimal 2 model diperlukan untuk melakukan Federated Averaging."
+            )
+
+        raise JobError(msg, 400, found_models=client_files, skipped_clients=skipped_clients,
+                       required=required, current=len(client_files))
+
+    # layout dihapus (DELETE /layout) sesudah model disimpan → tidak ada skema
+    # untuk mencocokkan / meratakan bobot
+    if layout is None:
+        raise JobError("layout belum dideklarasikan: POST /layout atau upload ulang model", 409,
+                       found_models=client_files)
+
+    print(f"🧮 Memulai Federated Averaging untuk {len(client_files)} client...")
+    report("sync", 0.15)
+
+    # =======================================
+    # RUNNING SUM FEDAVG
+    # Sum sudah di-update saat ingestion → di sini cukup rekonsiliasi
+    # dengan snapshot (normalnya tidak ada file yang dibaca) lalu dibagi.
+    # Sync, agregasi dan kontribusi berjalan di bawah SATU lock running sum:
+    # ingestion / delete yang masuk sesudah snapshot menunggu sampai round ini
+    # selesai, jadi yang dirata-rata persis snapshot yang di-sync.
+    # =======================================
+    # satu vektor float32 kontigu per client + FlatLayout (offset/shape per tensor)
+    flat_layout = FlatLayout.from_tensors(layout["tensors"])
+    aggregator_info = {}
+    contribution = None
+    regional_partial = None
+    with RUNNING_FEDAVG.locked():
+        # client yang belum ada di running sum (mis. setelah state dihapus) di-decode
+        # paralel di process pool, langsung ke shared memory
+        stale = [
+            (client, MODEL_STORE.object_path(snapshot[client]["sha256"]), tensor_orders[client])
+            for client in RUNNING_FEDAVG.stale(snapshot, layout["sha256"])
+        ]
+        with PARALLEL_AGG.load_npz_many(stale, flat_layout) as preloaded:
+            def load_client(client, entry):
+                if client in preloaded:
+                    return preloaded[client]
+                object_path = MODEL_STORE.object_path(entry["sha256"])
+                return load_npz_flat(object_path, flat_layout, tensor_orders[client])  # urutan layout, fp16/int8 → float32
+
+            reconciled = RUNNING_FEDAVG.sync(snapshot, layout["sha256"], flat_layout, load_client)
+        for change, clients in reconciled.items():
+            if clients:
+                print(f"♻️ Running sum {change}: {clients}")
+        # versi yang tidak bisa di-decode dikeluarkan dari round seperti layout yang tidak cocok
+        for client, error in reconciled.pop("skipped").items():
+            skipped_clients[f"{client}_weights.npz"] = error
+            skipped_entries[client] = snapshot.pop(client)
+        if len(snapshot) + len(regional_clients) < required:
+            raise JobError(f"Minimal {required} model yang bisa di-decode diperlukan untuk agregasi.", 400,
+                           skipped_clients=skipped_clients, required=required,
+                           current=len(snapshot) + len(regional_clients))
+
+        if SERVER_ROLE == "regional":
+            report("forward", 0.5)
+            if mode == "out_of_core":
+                RUNNING_FEDAVG.out_of_core_average()  # tulis ulang sum dari contrib sebelum dikirim
+            regional_partial = RUNNING_FEDAVG.partial()
+        else:
+            report("aggregate", 0.35)
+            if partials:
+                # Σ partial region + running sum lokal → sama dengan FedAvg datar atas semua bank
+                local_total, local_state = RUNNING_FEDAVG.partial()
+                local_clients = (local_state or {}).get("clients", {}) if local_total is not None else {}
+                weightings = {info["weighting"] for info in partials.values()}
+                if local_clients:
+                    weightings.add(local_state.get("weighting", "uniform"))
+                if len(weightings) > 1:
+                    uniform = [r for r, info in partials.items() if info["weighting"] == "uniform"]
+                    raise JobError("weighting region tidak seragam: ada bank tanpa num_examples, "
+                                   "partial sum 'examples' dan 'uniform' tidak bisa dijumlah", 409, uniform_regions=uniform)
+                total = local_total if local_total is not None else np.zeros(flat_layout.size, dtype=np.float64)
+                total_weight = REGIONAL_PARTIALS.accumulate(partials, total)
+                if local_clients:
+                    total_weight += local_state["total_weight"]
+                avg_flat = (total / total_weight).astype(np.float32)
+                fedavg_state = {
+                    "weighting": weightings.pop(),
+                    "total_weight": total_weight,
+                    "clients": {**local_clients,
+                                **{c: info for p in partials.values() for c, info in p["clients"].items()}},
+                }
+                mode = "hierarchical"
+            elif aggregator != "mean":
+                # aturan robust butuh semua kontribusi (bukan hanya jumlahnya) → dari contrib/*.npy yang di-mmap
+                try:
+                    avg_flat, fedavg_state, aggregator_info = RUNNING_FEDAVG.aggregate_with(
+                        PARALLEL_AGG.aggregator(aggregator), **aggregator_params
+                    )
+                except (TypeError, ValueError) as e:
+                    raise JobError(f"{aggregator}: {e}")
+                mode = "robust"
+            elif mode == "out_of_core":
+                avg_flat, fedavg_state = RUNNING_FEDAVG.out_of_core_average()
+            else:
+                avg_flat, fedavg_state = RUNNING_FEDAVG.average()
+            if avg_flat is None:
+                raise JobError("running sum kosong: semua client dihapus sebelum agregasi", 409)
+            local_clients_used = local_clients if mode == "hierarchical" else fedavg_state["clients"]
+
+            # kontribusi dihitung atas FedAvg datar (sum lokal); partial region & aturan robust tidak punya
+            # S − w_i·x_i per bank, jadi dilewati
+            if contribution_method != "none":
+                report("contribution", 0.5)
+                if mode in ("hierarchical", "robust"):
+                    contribution = {"skipped": f"kontribusi leave-one-out tidak tersedia untuk mode {mode}"}
+                else:
+                    try:
+                        contribution = score_client_contributions(flat_layout, contribution_method, shapley_permutations)
+                    except Exception as e:
+                        print(f"⚠️ Gagal menghitung kontribusi leave-one-out: {e}")
+                        contribution = {"error": str(e)}
+                if contribution.get("clients"):
+                    print(f"🤝 Kontribusi leave-one-out: {contribution['models_evaluated']} model dievaluasi "
+                          f"dalam {contribution['elapsed_ms']} ms")
+
+    if regional_partial is not None:
+        # kirim ke root di luar lock → ingestion tidak menunggu jaringan
+        return forward_regional_partial(layout, reconciled, *regional_partial)
+
+    # client & fingerprint dari state yang benar-benar dirata-rata (bukan snapshot awal);
+    # client yang dilewati karena layout ikut fingerprint seperti di aggregate_fingerprint
+    used = fedavg_state["clients"]
+    all_clients = [c for c in all_clients if c in used] + [c for c in used if c not in all_clients]
+    client_files = [f"{client}_weights.npz" for client in all_clients]
+    fingerprint = aggregate_fingerprint(opts, {**skipped_entries, **local_clients_used})
+
+    # (agregat − global sebelumnya) sebagai pseudo-gradient untuk momentum / Adam / Yogi
+    server_opt_info = None
+    if server_optimizer != "none":
+        previous = None
+        latest = GLOBAL_VERSIONS.latest()
+        if latest is not None and latest["layout"] == layout["sha256"]:
+            previous_flat = GLOBAL_VERSIONS.load(latest["version"])
+            if previous_flat is not None:
+                previous = (latest["version"], previous_flat)
+        avg_flat, server_opt_info = SERVER_OPT.step(server_optimizer, avg_flat, previous, layout["sha256"],
+                                                    server_optimizer_params)
+        print(f"🧭 Server optimizer {server_optimizer} step {server_opt_info['step']}")
+
+    avg_weights = flat_layout.views(avg_flat)  # view per layer, tanpa salinan
+    num_layers = len(avg_weights)
+
+    # rata-rata bobot per client dihitung sekali saat ingestion
+    client_mean_dict = {
+        f"{client}_weights.npz": fedavg_state["clients"][client]["mean"] for client in all_clients
+    }
 
-        if last_weight_path.exists():
-            with open(last_weight_path, "r") as f:
-                last_weight = json.load(f).get("avg_global_weight", None)
+    # "examples": Σ n_i·w_i / Σ n_i (semua client melapor num_examples)
+    # "uniform" : rata-rata biasa (ada client tanpa num_examples)
+    weighting = fedavg_state.get("weighting", "uniform")
+    num_examples = {
+        f"{client}_weights.npz": fedavg_state["clients"][client].get("num_examples") for client in all_clients
+    }
+    if weighting == "uniform":
+        missing = [c for c, n in num_examples.items() if not n]
+        print(f"⚠️ FedAvg tanpa bobot data: num_examples tidak dilaporkan oleh {missing}")
+
+    # =======================================
+    # SIMPAN MODEL GLOBAL
+    # =======================================
+    report("save", 0.65)
+    from datetime import datetime
+
+    # ============================
+    # BUAT NAMA FILE PAKAI TIMESTAMP
+    # ============================
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")  # dua round dalam 1 detik tidak saling menimpa (cache)
+    # metode di nama file → label di /logs & /download-global (fedavgm/fedadam/fedyogi bukan FedAvg biasa)
+    method = server_optimizer if server_optimizer != "none" else "fedavg"
+    filename = f"global_model_{method}_{timestamp}.npz"
+    save_path = model_dir / filename
+
+    np.savez_compressed(save_path, *avg_weights)
+
+    # nomor versi global → basis staleness untuk update FedBuff berikutnya
+    global_version = GLOBAL_VERSIONS.register(avg_flat, layout["sha256"], save_path, "sync", {
+        "num_clients": len(client_files), "mode": mode, "aggregator": aggregator,
+        "server_optimizer": server_optimizer,
+    })
+
+    print(f"🎯 {GLOBAL_MODEL_METHODS.get(method, method)} selesai → disimpan di {save_path} (versi global {global_version['version']})")
+
+
+    # =======================================
+    # HITUNG TOTAL PARAMETER
+    # =======================================
+    total_params = flat_layout.size
+
+    # =======================================
+    # HITUNG RATA-RATA BOBOT GLOBAL
+    # =======================================
+    avg_global_weight = float(avg_flat.mean())
+
+    # =======================================
+    # BACA NILAI SEBELUMNYA
+    # =======================================
+    last_weight_path = model_dir / "last_avg_weight.json"
+    last_weight = None
+
+    if last_weight_path.exists():
+        with open(last_weight_path, "r") as f:
+            last_weight = json.load(f).get("avg_global_weight", None)
+
+    # =======================================
+    # HITUNG PERSENTASE PERUBAHAN GLOBAL
+    # =======================================
+    if last_weight is not None and last_weight != 0:
+        change_percent = ((avg_global_weight - last_weight) / abs(last_weight)) * 100
+    else:
+        change_percent = 0.0  # Agregasi pertama
+
+    # =======================================
+    # SIMPAN NILAI TERBARU
+    # =======================================
+    with open(last_weight_path, "w") as f:
+        json.dump({"avg_global_weight": avg_global_weight}, f)
+
+    # =======================================
+    # KONTRIBUSI 1 — Persentase berdasarkan Mean Weight
+    # =======================================
+    abs_means = {c: abs(v) for c, v in client_mean_dict.items()}
+    total_abs_mean = sum(abs_means.values())
+
+    mean_weight_percentage = {
+        c: round((abs_means[c] / total_abs_mean) * 100, 4) if total_abs_mean != 0 else 0
+        for c in client_files
+    }
 
-        # =======================================
-        # HITUNG PERSENTASE PERUBAHAN GLOBAL
-        # =======================================
-        if last_weight is not None and last_weight != 0:
-            change_percent = ((avg_global_weight - last_weight) / abs(last_weight)) * 100
-        else:
-            change_percent = 0.0  # Agregasi pertama
-
-        # =======================================
-        # SIMPAN NILAI TERBARU
-        # =======================================
-        with open(last_weight_path, "w") as f:
-            json.dump({"avg_global_weight": avg_global_weight}, f)
-
-        # =======================================
-        # KONTRIBUSI 1 — Persentase berdasarkan Mean Weight
-        # =======================================
-        abs_means = {c: abs(v) for c, v in client_mean_dict.items()}
-        total_abs_mean = sum(abs_means.values())
-
-        mean_weight_percentage = {
-            c: round((abs_means[c] / total_abs_mean) * 100, 4) if total_abs_mean != 0 else 0
+    # =======================================
+    # KONTRIBUSI 2 — FedAvg contribution (berdasarkan jumlah data)
+    # =======================================
+    if not data_sizes and weighting == "examples":
+        data_sizes = num_examples  # jumlah data yang dilaporkan client = bobot yang benar-benar dipakai
+    if data_sizes:
+        total_data = sum(data_sizes.values())
+        fedavg_contrib = {
+            c: round((data_sizes.get(c, 0) / total_data) * 100, 4) if total_data != 0 else 0
             for c in client_files
         }
-
-        # =======================================
-        # KONTRIBUSI 2 — FedAvg contribution (berdasarkan jumlah data)
-        # =======================================
-        if data_sizes:
-            total_data = sum(data_sizes.values())
-            fedavg_contrib = {
-                c: round((data_sizes.get(c, 0) / total_data) * 100, 4) if total_data != 0 else 0
-                for c in client_files
-            }
+    else:
+        fedavg_contrib = None  # Jika tidak ada data size
+
+    # =======================================
+    # RESPONSE SUCCESS
+    # =======================================
+    # =======================================
+    # RESPONSE SUCCESS
+    # =======================================
+
+    # =======================================
+    # TESTING AKURASI MODEL GLOBAL (OTOMATIS)
+    # =======================================
+    test_results = None
+    total_accuracy = None
+    report("evaluate", 0.8)
+
+    # bobot global yang baru dibuat langsung dievaluasi di memori (bukan SavedModel lain dari disk)
+    try:
+        print("\n🧪 Memulai testing akurasi model global...")
+        test_results = evaluate_global_model(avg_flat, flat_layout, VALIDATION_PREPROC_PATH, save_path.name)
+        if test_results is None:
+            print(f"⚠️ Preprocessing file tidak ditemukan: {VALIDATION_PREPROC_PATH}")
         else:
-            fedavg_contrib = None  # Jika tidak ada data size
-
-        # =======================================
-        # RESPONSE SUCCESS
-        # =======================================
-        # =======================================
-        # RESPONSE SUCCESS
-        # =======================================
-
-        # =======================================
-        # TESTING AKURASI MODEL GLOBAL (OTOMATIS)
-        # =======================================
-        test_results = None
-        total_accuracy = None
-        
-        try:
-            # Konversi model npz ke SavedModel untuk testing
-            print("\n🧪 Memulai testing akurasi model global...")
-            
-            # Buat temporary model untuk testing
-            test_model_dir = MODELS_DIR / "global_test_model_temp"
-            if test_model_dir.exists():
-                shutil.rmtree(test_model_dir)
-            test_model_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Load base model architecture dan set weights
-            # Asumsi: ada base model atau kita buat dari scratch
-            # Untuk sekarang, kita skip convert ke SavedModel dan langsung load npz
-            
-            # Path ke preprocessing file
-            preproc_path = Path("models_global/fitur_global_test.pkl")
-            
-            if preproc_path.exists():
-                # Jalankan testing untuk semua bank
-                totals_correct = 0
-                totals_total = 0
-                per_bank = []
-                
-                # Temporary: convert npz to SavedModel
-                # Kita perlu model architecture untuk ini
-                # Untuk sementara, kita asumsikan SavedModel sudah ada
-                saved_model_path = MODELS_DIR / "saved_bank_B_DATA_tff"  # fallback ke model existing
-                
-                if saved_model_path.exists():
-                    for cases, label in [
-                        (BANK_A_CASES, "BANK A"),
-                        (BANK_B_CASES, "BANK B"),
-                        (BANK_C_CASES, "BANK C"),
-                        (BANK_D_CASES, "BANK D"),
-                        (BANK_E_CASES, "BANK E"),
-                        (BANK_F_CASES, "BANK F"),
-                    ]:
-                        c, t, acc_pct = test_global_model_silent(str(saved_model_path), str(preproc_path), cases, label)
-                        totals_correct += c
-                        totals_total += t
-                        per_bank.append({
-                            "bank": label,
-                            "accuracy": round(acc_pct, 2),
-                            "correct": c,
-                            "total": t
-                        })
-                        print(f"  ✅ {label}: {acc_pct:.2f}% ({c}/{t})")
-                    
-                    if totals_total > 0:
-                        total_accuracy = round((totals_correct / totals_total) * 100, 2)
-                        test_results = {
-                            "total_accuracy": total_accuracy,
-                            "total_correct": totals_correct,
-                            "total_cases": totals_total,
-                            "per_bank_results": per_bank,
-                            "test_model_used": str(saved_model_path)
-                        }
-                        print(f"\n🎯 Total Akurasi Global: {total_accuracy}% ({totals_correct}/{totals_total})")
-                    else:
-                        print("⚠️ Tidak ada test case yang valid")
-                else:
-                    print(f"⚠️ SavedModel tidak ditemukan di {saved_model_path}")
-            else:
-                print(f"⚠️ Preprocessing file tidak ditemukan: {preproc_path}")
-                
-        except Exception as e:
-            print(f"⚠️ Error saat testing model global: {e}")
-            import traceback
-            traceback.print_exc()
-
-        # =======================================
-        # BUILD RESPONSE JSON
-        # =======================================
-        response_json = {
-            "status": "success",
-            "method": "FedAvg",
-            "num_clients": len(client_files),
-            "num_layers": num_layers,
-            "total_parameters": int(total_params),
-            "avg_global_weight": avg_global_weight,
-            "avg_global_weight_change_percent": round(change_percent, 6),
-            "saved": str(save_path),
-
-            # "client_weights": client_weights_dict,
-            "client_mean_weight": client_mean_dict,
-            "client_mean_weight_percentage": mean_weight_percentage,
-            "fedavg_data_contribution_percentage": fedavg_contrib
-        }
-        
-        # Tambahkan total_accuracy jika tersedia
-        if total_accuracy is not None:
-            response_json["total_accuracy"] = total_accuracy
-        
-        # Tambahkan detail test results jika tersedia
-        if test_results is not None:
-            response_json["test_results"] = test_results
-
-        # 🔥 INI YANG AKAN MUNCUL DI RAILWAY LOG
-        print("\n========== FEDAVG JSON RESULT ==========")
-        print(json.dumps(response_json, indent=2))
-        print("========================================\n")
-
-        # ⬇️ Baru return JSON ke client
-        return jsonify(response_json)
-
-
+            for bank in test_results["per_bank_results"]:
+                print(f"  ✅ {bank['bank']}: {bank['accuracy']:.2f}% ({bank['correct']}/{bank['total']})")
+            total_accuracy = test_results["total_accuracy"]
+            print(f"\n🎯 Total Akurasi Global: {total_accuracy}% ({test_results['total_correct']}/"
+                  f"{test_results['total_cases']}) dalam {test_results['elapsed_ms']} ms")
     except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        print(f"⚠️ Error saat testing model global: {e}")
+        import traceback
+        traceback.print_exc()
+
+    # =======================================
+    # BUILD RESPONSE JSON
+    # =======================================
+    response_json = {
+        "status": "success",
+        "method": "FedAvg" if aggregator == "mean" else aggregator,
+        "num_clients": len(client_files),
+        "num_layers": num_layers,
+        "total_parameters": int(total_params),
+        "avg_global_weight": avg_global_weight,
+        "avg_global_weight_change_percent": round(change_percent, 6),
+        "saved": str(save_path),
+        "global_version": global_version["version"],
+        "fingerprint": fingerprint,
+
+        # "client_weights": client_weights_dict,
+        "client_mean_weight": client_mean_dict,
+        "client_mean_weight_percentage": mean_weight_percentage,
+        "fedavg_data_contribution_percentage": fedavg_contrib,
+        **({"contribution": contribution} if contribution is not None else {}),
+        "aggregation": {
+            "mode": mode,
+            "aggregator": aggregator,
+            **({"aggregator_info": aggregator_info} if aggregator_info else {}),
+            "weighting": weighting,
+            "num_examples": num_examples,
+            "total_weight": fedavg_state["total_weight"],
+            **({"server_optimizer": server_opt_info} if server_opt_info else {}),
+            "reconciled": {k: v for k, v in reconciled.items() if v},
+            **({"regions": {
+                region: {"num_clients": info["num_clients"], "total_weight": info["total_weight"],
+                         "weighting": info["weighting"], "received": info["received"]}
+                for region, info in partials.items()
+            }} if partials else {}),
+        },
+    }
+    if skipped_clients:
+        response_json["skipped_clients"] = skipped_clients
+    
+    # Tambahkan total_accuracy jika tersedia
+    if total_accuracy is not None:
+        response_json["total_accuracy"] = total_accuracy
+    
+    # Tambahkan detail test results jika tersedia
+    if test_results is not None:
+        response_json["test_results"] = test_results
+
+    # 🔥 INI YANG AKAN MUNCUL DI RAILWAY LOG
+    print("\n========== FEDAVG JSON RESULT ==========")
+    print(json.dumps(response_json, indent=2))
+    print("========================================\n")
+
+    # optimizer server: setiap round adalah langkah baru dari global terbaru → tidak di-cache
+    if server_optimizer == "none":
+        AGGREGATE_CACHE.put(fingerprint, response_json)
+
+    # ⬇️ laporan disimpan sebagai hasil job (GET /jobs/<id>)
+    return response_json
+
+# agregasi berjalan di worker background; satu per proses (running sum, optimizer server
+# dan last_avg_weight.json dipakai bergantian oleh setiap round)
+AGGREGATE_WAIT_SECONDS = int(os.environ.get("AGGREGATE_WAIT_SECONDS", "600"))  # batas tunggu ?wait=1
+AGGREGATE_LOCK_PATH = MODELS_DIR / "aggregate.lock"
+AGGREGATE_CACHE = ResultCache(MODELS_DIR / "aggregate_cache")
+AGGREGATE_QUEUE = JobQueue(MODELS_DIR / "jobs", run_aggregation, workers=1, name="aggregate")
+AGGREGATE_QUEUE.recover()  # agregasi yang terputus saat server mati dijalankan ulang
+# request dengan input sama (fingerprint) selama job masih berjalan → menempel ke job itu
+AGGREGATE_FLIGHTS = SingleFlight(AGGREGATE_QUEUE)
+
+# semua antrian yang statusnya bisa dibaca lewat GET /jobs/<id>
+JOB_QUEUES = {"aggregate": AGGREGATE_QUEUE, "ingest": INGEST_QUEUE}
+
+def job_error_response(job: dict) -> dict:
+    resp = {"status": "error", "message": job.get("error")}
+    resp.update({k: job[k] for k in job.get("error_details", []) if k in job})
+    return resp
+
+@app.route('/aggregate', methods=['POST'])
+def aggregate_models():
+    """
+    Masukkan agregasi ke antrian → 202 + job_id (status di GET /jobs/<id>).
+    Input tidak berubah sejak agregasi sebelumnya → 200 + laporan cache, tanpa job.
+    Jika agregasi dengan input yang sama sedang berjalan, request ini menempel ke job
+    tersebut (job_id sama, "coalesced": true) alih-alih menghitung ulang.
+    ?wait=1 → tunggu hasil dan balas laporan lengkap seperti agregasi sinkron lama.
+    """
+    body = request.get_json(silent=True)
+    if body is not None and not isinstance(body, dict):
+        return jsonify({"status": "error", "message": "body harus object JSON"}), 400
+    payload = dict(body or {})
+    for key in AGGREGATE_QUERY_PARAMS:
+        if key not in payload and key in request.args:
+            payload[key] = request.args[key]
+    try:
+        opts = parse_aggregate_params(payload)  # parameter salah → 400 langsung, bukan job gagal
+    except JobError as e:
+        return jsonify({"status": "error", "message": str(e), **e.details}), e.http_status
+
+    fingerprint = aggregate_fingerprint(opts)
+    cached = cached_aggregate(fingerprint)
+    if cached is not None:
+        return jsonify(cached)
+
+    job, coalesced = AGGREGATE_FLIGHTS.submit(fingerprint, payload)
+
+    if request.args.get("wait") in ("1", "true"):
+        job = AGGREGATE_QUEUE.wait(job["id"], timeout=AGGREGATE_WAIT_SECONDS)
+        if job.get("status") == "done":
+            return jsonify({**job["result"], "job_id": job["id"], "coalesced": coalesced})
+        if job.get("status") == "error":
+            return jsonify({**job_error_response(job), "job_id": job["id"], "coalesced": coalesced}), \
+                job.get("http_status", 500)
+
+    if coalesced:
+        print(f"🔗 Agregasi menempel ke job berjalan {job['id']}")
+    else:
+        print(f"🧮 Agregasi masuk antrian {job['id']}")
+    resp = jsonify({
+        "status": 202,
+        "job_id": job["id"],
+        "state": job.get("status"),
+        "status_url": f"/jobs/{job['id']}",
+        "coalesced": coalesced,
+        "message": "agregasi dengan input sama sedang berjalan" if coalesced else "agregasi diproses di background",
+    })
+    resp.headers["Location"] = f"/jobs/{job['id']}"
+    return resp, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status job background (agregasi / ingestion): phase, progress, lalu laporan akhir atau error."""
+    for kind, queue in JOB_QUEUES.items():
+        job = queue.get(job_id)
+        if job is not None:
+            break
+    else:
+        return jsonify({"status": "error", "message": "job tidak ditemukan"}), 404
+    resp = {
+        "job_id": job["id"],
+        "type": kind,
+        "state": job.get("status"),
+        "phase": job.get("phase"),
+        "progress": job.get("progress"),
+        "created": job.get("created"),
+        "updated": job.get("updated"),
+    }
+    if job.get("fingerprint"):
+        resp["fingerprint"] = job["fingerprint"]
+        resp["attached"] = job.get("attached", 0)
+    if job.get("duration_sec") is not None:
+        resp["duration_sec"] = job["duration_sec"]
+    if job.get("status") == "done":
+        resp["result"] = job.get("result")
+    elif job.get("status") == "error":
+        resp.update({k: v for k, v in job_error_response(job).items() if k != "status"})
+        resp["error"] = resp.pop("message")
+        resp["http_status"] = job.get("http_status")
+    return jsonify(resp)
 
 
 
 # ==========================================================
 # 3️⃣ LIST FILES DI FOLDER models
 # ==========================================================
+# prefix nama file model global → nama metode di /logs & /download-global
+GLOBAL_MODEL_METHODS = {
+    "fedavg": "FedAvg", "fedavgm": "FedAvgM", "fedadam": "FedAdam", "fedyogi": "FedYogi",
+    "fedbuff": "FedBuff", "secagg": "Secure Aggregation",
+}
+
+def global_model_method(fname: str) -> str:
+    """global_model_<metode>_<timestamp>.npz → <metode> (fedavg, fedadam, fedbuff, secagg, ...)."""
+    return fname[len("global_model_"):].split("_")[0]
+
 @app.route('/logs', methods=['GET'])
 def list_files():
     try:
@@ -705,9 +1999,10 @@ def list_files():
             # ============================
             # DETEKSI GLOBAL MODEL BARU
             # ============================
-            if fname.startswith("global_model_fedavg_"):
+            if fname.startswith("global_model_"):
+                method = global_model_method(fname)
                 client_label = "GLOBAL"
-                message = "Model global hasil agregasi FedAvg"
+                message = f"Model global hasil agregasi {GLOBAL_MODEL_METHODS.get(method, method)}"
             else:
                 # File client → contoh: bankA_weights.npz
                 client_label = fname.replace("_weights.npz", "").upper()
@@ -750,10 +2045,15 @@ def list_files():
 @app.route('/download-global', methods=['GET'])
 def download_global():
     try:
-        # Cari semua file global FedAvg dengan timestamp
-        global_files = list(MODELS_DIR.glob("global_model_fedavg_*.npz"))
-
-        if not global_files:
+        # pointer versi global terbaru (sync / FedBuff / secagg) → tanpa glob seluruh MODELS_DIR
+        latest = GLOBAL_VERSIONS.latest()
+        latest_file = MODELS_DIR / latest["file"] if latest else None
+        if latest_file is None or not latest_file.exists():
+            # model global dari sebelum ada registry versi (atau file terbaru dihapus manual)
+            global_files = list(MODELS_DIR.glob("global_model_*.npz"))
+            latest_file = max(global_files, key=lambda f: f.stat().st_mtime) if global_files else None
+
+        if latest_file is None:
             return jsonify({
                 "status": "error",
                 "message": (
@@ -763,9 +2063,6 @@ def download_global():
                 "hint": "Pastikan minimal dua client telah mengunggah model mereka."
             }), 404
 
-        # Ambil file terbaru berdasarkan waktu modifikasi
-        latest_file = max(global_files, key=lambda f: f.stat().st_mtime)
-
         file_size = latest_file.stat().st_size
         last_modified = latest_file.stat().st_mtime
 
@@ -773,7 +2070,8 @@ def download_global():
 
         # ========== BUAT NAMA FILE BARU UNTUK DOWNLOAD ==========
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        download_name = f"global_model_fedavg_{timestamp}.npz"
+        method = global_model_method(latest_file.name)
+        download_name = f"global_model_{method}_{timestamp}.npz"
 
         response = send_file(
             str(latest_file),
@@ -785,7 +2083,11 @@ def download_global():
         response.headers["X-File-Name"] = download_name
         response.headers["X-File-Size"] = file_size
         response.headers["X-Last-Modified"] = last_modified
-        response.headers["X-Description"] = "Model global terbaru hasil Federated Averaging"
+        response.headers["X-Description"] = f"Model global terbaru hasil agregasi {GLOBAL_MODEL_METHODS.get(method, method)}"
+        version = latest if latest and latest["file"] == latest_file.name else GLOBAL_VERSIONS.find_file(latest_file.name)
+        if version is not None:
+            # client simpan nilai ini lalu kirim balik sebagai X-Base-Version saat upload
+            response.headers["X-Global-Version"] = str(version["version"])
 
         return response
 
@@ -821,17 +2123,22 @@ def delete_file(filename):
     if not safe_path.exists():
         return jsonify({"status": "error", "message": f"File {filename} tidak ditemukan"}), 404
 
+    # Extract client name before "_weights"
+    client = None
+    if filename.endswith("_weights.npz"):
+        client = filename[:-len("_weights.npz")]
+        if not valid_client_name(client):
+            return jsonify({"status": "error", "message": f"nama client tidak valid: {client}"}), 400
+
     try:
         safe_path.unlink()
         print(f"🗑️ File dihapus: {safe_path}")
 
-        # Extract client name before "_weights"
-        client = None
-        if filename.endswith("_weights.npz"):
-            client = filename[:-len("_weights.npz")]
-
         deleted_logs_info = None
         if client:
+            # keluarkan juga dari store → tidak ikut agregasi berikutnya
+            MODEL_STORE.remove_client(client)
+            RUNNING_FEDAVG.remove(client)
             deleted_logs_info = remove_logs_for_client(client)
             print(f"🗑️ Logs dihapus untuk client={client}: {deleted_logs_info}")
 
@@ -859,6 +2166,8 @@ def delete_model_by_client():
             target = filename
         else:
             return jsonify({"status": "error", "message": "client atau filename required"}), 400
+        if target.endswith("_weights.npz") and not valid_client_name(target[:-len("_weights.npz")]):
+            return jsonify({"status": "error", "message": f"nama client tidak valid: {target}"}), 400
 
         safe_path = safe_model_path(target)
         if safe_path is None:
@@ -879,6 +2188,8 @@ def delete_model_by_client():
 
         deleted_logs_info = None
         if client_name:
+            MODEL_STORE.remove_client(client_name)
+            RUNNING_FEDAVG.remove(client_name)
             deleted_logs_info = remove_logs_for_client(client_name)
             print(f"🗑️ Logs dihapus untuk client={client_name}: {deleted_logs_info}")
 
@@ -895,38 +2206,19 @@ def delete_model_by_client():
 
 # ==========================================================
 # Endpoint: ambil best accuracy & tail history untuk client
-# - Cek models/logs/<client>_best_accuracy.txt terlebih dahulu
+# - Cek models/metrics.db (best + 20 baris history terakhir) terlebih dahulu
 # - Jika tidak ada, cari folder yang cocok di models/* dan baca best_accuracy.txt di sana
 # ==========================================================
 @app.route('/accuracy/<client>', methods=['GET'])
 def get_accuracy(client):
     try:
-        # 1) Cek logs folder dulu (preferred)
-        best_path = LOGS_DIR / f"{client}_best_accuracy.txt"
-        history_path = LOGS_DIR / f"{client}_accuracy_history.txt"
-
-        best = None
-        history_tail = []
+        # 1) Cek metrics database dulu (preferred) — query ber-index, LIMIT 20
+        best = METRICS_STORE.best(client)
+        history_tail = METRICS_STORE.history_tail(client, 20)
         source = None
 
-        if best_path.exists():
-            # baca best dari logs
-            try:
-                with open(best_path, "r", encoding="utf-8") as bf:
-                    best = float(bf.read().strip())
-                source = str(best_path)
-            except Exception:
-                best = None
-
-            # baca beberapa baris terakhir dari history jika ada
-            if history_path.exists():
-                try:
-                    with open(history_path, "r", encoding="utf-8") as hf:
-                        lines = hf.read().strip().splitlines()
-                        history_tail = lines[-20:] if len(lines) > 20 else lines
-                except Exception:
-                    history_tail = []
-
+        if best is not None or history_tail:
+            source = str(METRICS_STORE.path)
             return jsonify({"client": client, "best_accuracy": best, "history_tail": history_tail, "source": source})
 
         # 2) Jika tidak ada, cari folder model yang cocok di MODELS_DIR
@@ -964,6 +2256,19 @@ def get_accuracy(client):
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+# ==========================================================
+# 📊 HISTORY CURSOR (sinkronisasi history inkremental)
+# - Client memanggil ini sebelum upload lalu hanya mengirim baris history
+#   yang lebih baru dari cursor (ts lebih besar, atau round lebih besar jika
+#   baris tidak punya timestamp)
+# ==========================================================
+@app.route('/metrics-cursor/<client>', methods=['GET'])
+def get_metrics_cursor(client):
+    try:
+        return jsonify({"client": client, **METRICS_STORE.cursor(client)})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 # ==========================================================
 # 7️⃣ HOME
 # ==========================================================
@@ -972,14 +2277,26 @@ def home():
     return {
         "message": "🌍 Federated Aggregation Server aktif!",
         "status": "online",
+        "role": SERVER_ROLE,
+        **({"region": REGION_NAME, "upstream": UPSTREAM_URL} if SERVER_ROLE == "regional" else {}),
         "endpoints": {
             "/upload-model": "Upload model lokal dari client (POST)",
-            "/aggregate": "Lakukan agregasi global (POST)",
+            "/layout": "Skema tensor model: lihat (GET), deklarasi (POST), reset (DELETE)",
+            "/ingestions/<id>": "Status upload di antrian ingestion (GET)",
+            "/upload-session": "Upload resumable per chunk: init (POST), status (GET /<id>), chunk (PUT /<id>?offset=), commit (POST /<id>/commit)",
+            "/aggregate": "Antrikan agregasi global (POST → job_id, ?wait=1 menunggu); di server regional: kirim partial sum ke root",
+            "/jobs/<id>": "Status job background agregasi/ingestion: phase, progress, laporan akhir (GET)",
+            "/fedbuff": "Status agregasi async FedBuff (GET), publikasikan buffer (POST /fedbuff/flush)",
+            "/global-versions": "Registry versi model global (GET)",
+            "/server-optimizer": "State optimizer server FedAvgM/FedAdam/FedYogi (GET)",
+            "/secagg/<round>": "Secure aggregation pairwise mask: buka round (POST), status (GET), keys/shares/masked/unmask/advance (POST)",
+            "/partials": "Partial sum server regional: lihat (GET), terima (POST /<region>), hapus (DELETE /<region>)",
             "/logs": "Lihat file di models (GET)",
             "/download/<filename>": "Download file (GET)",
             "/delete/<filename>": "Hapus file (DELETE)",
             "/delete-model": "Hapus file via POST JSON",
-            "/accuracy/<client>": "Ambil best accuracy & riwayat (GET)"
+            "/accuracy/<client>": "Ambil best accuracy & riwayat (GET)",
+            "/metrics-cursor/<client>": "Round/timestamp history terakhir yang sudah diterima server (GET)"
         }
     }
 
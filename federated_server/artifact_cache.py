@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🧠 ARTIFACT CACHE — LRU per proses untuk artefak evaluasi
+#
+#   load(path, loader)   → artefak dari disk (preprocessor joblib, model, ...)
+#                          key = (path, sha256 isi file/direktori)
+#   memo(key, builder)   → objek turunan (matriks fitur validation, serving function)
+#
+# Hash isi dihitung ulang hanya jika signature stat (ukuran, mtime) berubah, jadi
+# evaluasi berulang cukup satu stat() per artefak: tanpa baca file, tanpa build ulang.
+# Dibatasi ARTIFACT_CACHE_MB (estimasi nbytes); entry paling lama tidak dipakai dibuang.
+# Entry bertag "global" dibuang setiap ada model global baru (GlobalVersions.register).
+# ==========================================================
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+ARTIFACT_CACHE_MB = int(os.environ.get("ARTIFACT_CACHE_MB", "256"))
+DEFAULT_ENTRY_BYTES = 64 * 1024  # estimasi untuk objek tanpa nbytes / file
+
+
+def estimate_nbytes(value) -> int:
+    """Perkiraan memori: array NumPy (nbytes), tuple/list/dict dijumlah rekursif."""
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values())
+    nbytes = getattr(value, "nbytes", None)
+    return int(nbytes) if isinstance(nbytes, (int, np.integer)) else DEFAULT_ENTRY_BYTES
+
+
+def _signature(path: Path) -> tuple:
+    """(ukuran, mtime) file, atau per file untuk direktori (SavedModel)."""
+    if path.is_dir():
+        return tuple(
+            (str(p.relative_to(path)), p.stat().st_size, p.stat().st_mtime_ns)
+            for p in sorted(path.rglob("*")) if p.is_file()
+        )
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _content_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    for p in files:
+        if path.is_dir():
+            h.update(str(p.relative_to(path)).encode() + b"\0")
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, max_bytes: int = ARTIFACT_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key → (value, nbytes, tag)
+        self._digests = {}             # path → (signature, sha256)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, path) -> str:
+        """sha256 isi artefak; dihitung ulang hanya jika ukuran/mtime berubah."""
+        path = Path(path)
+        signature = _signature(path)
+        cached = self._digests.get(str(path))
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = _content_hash(path)
+        self._digests[str(path)] = (signature, digest)
+        return digest
+
+    def load(self, path, loader, tag: str = "artifact"):
+        """loader(path) sekali per (path, isi); panggilan berikutnya dari memori."""
+        path = Path(path)
+        key = ("file", str(path), self.digest(path))
+        return self.memo(key, lambda: loader(path), tag=tag,
+                         nbytes=None if path.is_dir() else path.stat().st_size)
+
+    def memo(self, key, builder, tag: str = "derived", nbytes: int = None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        # build di luar lock: artefak besar tidak memblokir pembaca entry lain
+        value = builder()
+        size = max(estimate_nbytes(value), nbytes or 0)
+        if size > self.max_bytes:
+            return value  # terlalu besar untuk cache → dipakai sekali saja
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size, tag)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+        return value
+
+    def invalidate(self, tag: str) -> int:
+        """Buang semua entry dengan tag ini. Return jumlah entry yang dibuang."""
+        with self._lock:
+            keys = [k for k, (_, _, t) in self._entries.items() if t == tag]
+            for key in keys:
+                self.bytes -= self._entries.pop(key)[1]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            tags = {}
+            for _, _, tag in self._entries.values():
+                tags[tag] = tags.get(tag, 0) + 1
+            return {
+                "entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "tags": tags,
+            }
+
+
+# satu cache per proses (setiap worker gunicorn punya cache sendiri)
+ARTIFACT_CACHE = ArtifactCache()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# ============================================================
+# ⏱️ BENCHMARK ATURAN AGREGASI (aggregators.py)
+#
+# Biaya mean / median / trimmed_mean / krum / multi_krum terhadap jumlah
+# client. Kontribusi client ditulis sebagai .npy lalu di-mmap, sama seperti
+# models/fedavg/contrib/ di server.
+#
+#   python bench_aggregators.py                          # model MLP bank (13.597 parameter)
+#   python bench_aggregators.py --params 1000000 --clients 14 50 100
+#   python bench_aggregators.py --workers 4      # lewat process pool (parallel_agg.py)
+# ============================================================
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from aggregators import AGGREGATORS
+from flat_params import FlatLayout
+from parallel_agg import ParallelAggregator
+
+# arsitektur MLP bank (BatchNorm 39 fitur → 128 → 64 → 1)
+BANK_SHAPES = [(39,), (39,), (39,), (39,), (39, 128), (128,), (128, 64), (64,), (64, 1), (1,)]
+
+
+def make_contribs(root: Path, n_clients: int, flat_layout: FlatLayout, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(n_clients):
+        path = root / f"client_{i}.npy"
+        np.save(path, rng.normal(size=flat_layout.size).astype(np.float32))
+        paths.append(path)
+    return [np.load(p, mmap_mode="r") for p in paths]
+
+
+def bench(fn, contribs, weights, flat_layout, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(contribs, weights, flat_layout)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[14, 50, 100, 200])
+    parser.add_argument("--params", type=int, default=None, help="ukuran model sintetis (default: MLP bank)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help=">1 → shard paralel di process pool")
+    args = parser.parse_args()
+
+    rules = dict(AGGREGATORS)
+    engine = None
+    if args.workers > 1:
+        engine = ParallelAggregator(workers=args.workers, min_elements=0)
+        rules = {name: engine.aggregator(name) for name in AGGREGATORS}
+
+    flat_layout = FlatLayout([(args.params,)] if args.params else BANK_SHAPES)
+    print(f"Model: {flat_layout.size:,} parameter, {len(flat_layout)} tensor, workers={args.workers}")
+    print(f"{'clients':>8} " + " ".join(f"{name:>13}" for name in rules))
+
+    for n_clients in args.clients:
+        with tempfile.TemporaryDirectory() as tmp:
+            contribs = make_contribs(Path(tmp), n_clients, flat_layout)
+            weights = np.ones(n_clients)
+            row = [bench(fn, contribs, weights, flat_layout, args.repeat) for fn in rules.values()]
+            del contribs
+        print(f"{n_clients:>8} " + " ".join(f"{t * 1000:>10.2f} ms" for t in row))
+
+    if engine is not None:
+        engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
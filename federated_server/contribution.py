@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🤝 CONTRIBUTION — kontribusi tiap bank terhadap kualitas model global
+#
+# Leave-one-out (LOO), langsung dari running sum (tanpa training ulang / baca file):
+#   global      = S / W                         S = Σ w_j·x_j, W = Σ w_j
+#   global_−i   = (S − w_i·x_i) / (W − w_i)     → O(params) per bank
+#   kontribusi_i = loss(global_−i) − loss(global)  (> 0: model lebih buruk tanpa bank i)
+#
+# Monte Carlo Shapley (opsional, budget = jumlah permutasi M):
+#   untuk setiap permutasi acak, bank ditambahkan satu per satu ke prefix sum
+#   (S_prefix += w_i·x_i → model = S_prefix / W_prefix, O(params) per langkah)
+#   φ_i = rata-rata [u(prefix ∪ {i}) − u(prefix)],  u = −log_loss
+#   u(∅) = log loss prediksi konstan base rate validation set.
+#   Σ φ_i = u(semua bank) − u(∅) (efisiensi Shapley) untuk setiap permutasi.
+#
+# Semua kandidat model dievaluasi per batch (evaluation.BatchEvaluator).
+# ==========================================================
+import os
+import time
+
+import numpy as np
+
+from evaluation import BatchEvaluator, baseline_log_loss
+
+SHAPLEY_MAX_PERMUTATIONS = int(os.environ.get("SHAPLEY_MAX_PERMUTATIONS", "200"))
+
+
+def _share_percentage(deltas: dict) -> dict:
+    """Bagi kontribusi positif menjadi persentase (bank yang merugikan → 0%)."""
+    positive = {c: max(0.0, d) for c, d in deltas.items()}
+    total = sum(positive.values())
+    return {c: round(v / total * 100, 4) if total > 0 else 0.0 for c, v in positive.items()}
+
+
+def leave_one_out(total: np.ndarray, total_weight: float, clients: list, contribs: list,
+                  evaluator: BatchEvaluator) -> dict:
+    """
+    clients  : [(nama, weight)] urutan sama dengan contribs (vektor flat float32, boleh mmap)
+    Return {"global": {...}, "clients": {nama: {"log_loss_without", "delta_log_loss",
+            "accuracy_without", "delta_accuracy", "share_percentage"}}}.
+    """
+    full = evaluator.evaluate((total / total_weight)[None, :])
+    batch = np.empty((min(evaluator.batch_models, len(clients)), total.size), dtype=np.float32)
+    losses, accs = [], []
+    for start in range(0, len(clients), batch.shape[0]):
+        chunk = list(range(start, min(start + batch.shape[0], len(clients))))
+        for row, i in enumerate(chunk):
+            weight = clients[i][1]
+            rest = total_weight - weight
+            if rest <= 0:
+                raise ValueError("leave-one-out butuh minimal 2 bank dengan bobot > 0")
+            np.divide(total - weight * np.asarray(contribs[i], dtype=np.float64), rest, out=batch[row],
+                      casting="same_kind")
+        result = evaluator.evaluate(batch[:len(chunk)])
+        losses.extend(result["log_loss"])
+        accs.extend(result["accuracy"])
+
+    full_loss, full_acc = float(full["log_loss"][0]), float(full["accuracy"][0])
+    deltas = {name: float(loss) - full_loss for (name, _), loss in zip(clients, losses)}
+    shares = _share_percentage(deltas)
+    return {
+        "global": {"log_loss": round(full_loss, 6), "accuracy": round(full_acc * 100, 2)},
+        "clients": {
+            name: {
+                "log_loss_without": round(float(loss), 6),
+                "delta_log_loss": round(deltas[name], 6),
+                "accuracy_without": round(float(acc) * 100, 2),
+                "delta_accuracy": round((full_acc - float(acc)) * 100, 2),
+                "share_percentage": shares[name],
+            }
+            for (name, _), loss, acc in zip(clients, losses, accs)
+        },
+    }
+
+
+def monte_carlo_shapley(clients: list, contribs: list, evaluator: BatchEvaluator, permutations: int,
+                        seed: int = 0) -> dict:
+    """Estimasi Shapley φ_i (utility = −log_loss) dari `permutations` permutasi acak."""
+    permutations = min(int(permutations), SHAPLEY_MAX_PERMUTATIONS)
+    n = len(clients)
+    rng = np.random.default_rng(seed)
+    u_empty = -baseline_log_loss(evaluator.y)
+    samples = np.zeros((permutations, n), dtype=np.float64)
+
+    prefix = np.empty(contribs[0].shape, dtype=np.float64)
+    models = np.empty((n, prefix.size), dtype=np.float32) if n <= evaluator.batch_models else None
+    for m in range(permutations):
+        order = rng.permutation(n)
+        prefix[:] = 0.0
+        weight = 0.0
+        utilities = []
+        pending = []
+        for step, i in enumerate(order):
+            prefix += clients[i][1] * np.asarray(contribs[i], dtype=np.float64)
+            weight += clients[i][1]
+            if models is not None:
+                np.divide(prefix, weight, out=models[step], casting="same_kind")
+            else:
+                # model besar / banyak bank: evaluasi per batch agar memori = batch × params
+                pending.append((prefix / weight).astype(np.float32))
+                if len(pending) == evaluator.batch_models or step == n - 1:
+                    utilities.extend(-evaluator.evaluate(np.stack(pending))["log_loss"])
+                    pending = []
+        if models is not None:
+            utilities = list(-evaluator.evaluate(models)["log_loss"])
+        previous = u_empty
+        for i, utility in zip(order, utilities):
+            samples[m, i] = utility - previous
+            previous = utility
+
+    phi = samples.mean(axis=0)
+    stderr = samples.std(axis=0, ddof=1) / np.sqrt(permutations) if permutations > 1 else np.zeros(n)
+    shares = _share_percentage({name: float(v) for (name, _), v in zip(clients, phi)})
+    return {
+        "permutations": permutations,
+        "utility": "-log_loss",
+        "empty_log_loss": round(-u_empty, 6),
+        "clients": {
+            name: {"shapley": round(float(phi[k]), 6), "stderr": round(float(stderr[k]), 6),
+                   "share_percentage": shares[name]}
+            for k, (name, _) in enumerate(clients)
+        },
+    }
+
+
+def score_contributions(total: np.ndarray, total_weight: float, clients: list, contribs: list,
+                        evaluator: BatchEvaluator, shapley_permutations: int = 0) -> dict:
+    """LOO (selalu) + Monte Carlo Shapley (jika shapley_permutations > 0) → laporan /aggregate."""
+    start = time.perf_counter()
+    report = {"method": "leave_one_out", "metric": "log_loss", "validation_cases": int(evaluator.y.size)}
+    report.update(leave_one_out(total, total_weight, clients, contribs, evaluator))
+    if shapley_permutations > 0:
+        report["shapley"] = monte_carlo_shapley(clients, contribs, evaluator, shapley_permutations)
+    report["models_evaluated"] = evaluator.num_models
+    report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return report
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🧪 EVALUATION — evaluasi batch banyak model sekaligus dari vektor flat
+#
+# Model bank adalah MLP kecil (BatchNorm → Dense relu ... → Dense sigmoid),
+# jadi forward pass cukup ditulis dengan NumPy langsung dari vektor flat:
+# tanpa SavedModel, tanpa membaca file per kandidat model.
+#
+#   flats [K, P]  → K model (mis. K model leave-one-out) dievaluasi sekaligus:
+#   X [N, d]      → H [K, N, h] = matmul(H, W[K, d, h]) + b[K, None, h]
+#
+# Urutan tensor mengikuti model.weights keras:
+#   BatchNormalization → gamma, beta, moving_mean, moving_variance (4 vektor [d])
+#   Dense              → kernel [d, h], bias [h]
+# Layout lain (mis. conv) → ValueError; pemanggil melewati evaluasi.
+#
+# Validation set: test case bank (app.py) + opsional VALIDATION_CSV (kolom
+# is_fraud), di-preprocess sekali dalam satu DataFrame. Preprocessor, matriks
+# fitur dan serving function (layer yang sudah di-parse) disimpan di
+# ARTIFACT_CACHE per isi file / layout.
+# ==========================================================
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from artifact_cache import ARTIFACT_CACHE
+from flat_params import FlatLayout
+
+BN_EPSILON = 1e-3                                       # default keras BatchNormalization
+EVAL_BATCH_MODELS = int(os.environ.get("EVAL_BATCH_MODELS", "16"))  # model per matmul batch
+VALIDATION_CSV = os.environ.get("VALIDATION_CSV", "")   # holdout tambahan (opsional)
+LABEL_COLUMN = "is_fraud"
+
+
+# ==========================================================
+# VALIDATION SET
+# ==========================================================
+def preprocess_batch(records: pd.DataFrame, preproc: dict) -> np.ndarray:
+    """Semua transaksi sekaligus → matriks fitur float32 (one-hot + scaling, sama dengan preprocess_transaction)."""
+    if not isinstance(preproc, dict):
+        raise TypeError("File fitur_global.pkl tidak valid! Format harus dictionary.")
+    raw_cols = [c for c in preproc.get("NUM_COLS", []) + preproc.get("CAT_COLS", []) if c in records.columns]
+    df = records[raw_cols] if raw_cols else records
+    df = pd.get_dummies(df, drop_first=False)
+    df = df.reindex(columns=preproc["FEATURE_COLS"], fill_value=0)
+    return np.asarray(preproc["SCALER"].transform(df), dtype=np.float32)
+
+
+def load_validation_set(preproc_path: Path, cases: list, csv_path: str = VALIDATION_CSV) -> tuple:
+    """
+    (X [N, d] float32, y [N] float32) dari test case [(dict transaksi, label)] + VALIDATION_CSV.
+    Di-cache selama isi file preprocessing/CSV dan test case sama. None jika preprocessing tidak ada.
+    """
+    preproc_path = Path(preproc_path)
+    if not preproc_path.exists():
+        return None
+    csv = Path(csv_path) if csv_path else None
+    if csv is not None and not csv.exists():
+        csv = None
+    if not cases and csv is None:
+        return None
+    cases_digest = hashlib.sha256(json.dumps(cases, sort_keys=True, default=str).encode()).hexdigest()
+    key = ("validation", ARTIFACT_CACHE.digest(preproc_path), cases_digest,
+           ARTIFACT_CACHE.digest(csv) if csv is not None else None)
+
+    def build():
+        frames = [pd.DataFrame([{**data, LABEL_COLUMN: label} for data, label in cases])] if cases else []
+        if csv is not None:
+            frames.append(pd.read_csv(csv))
+        records = pd.concat(frames, ignore_index=True)
+        if LABEL_COLUMN not in records.columns or records[LABEL_COLUMN].isna().any():
+            raise ValueError(f"validation set butuh kolom {LABEL_COLUMN} di setiap baris")
+        y = records[LABEL_COLUMN].astype("float32").to_numpy()
+        preproc = ARTIFACT_CACHE.load(preproc_path, joblib.load)
+        return preprocess_batch(records.drop(columns=[LABEL_COLUMN]), preproc), y
+
+    return ARTIFACT_CACHE.memo(key, build)
+
+
+# ==========================================================
+# FORWARD PASS BATCH (NumPy)
+# ==========================================================
+def mlp_layers(flat_layout: FlatLayout) -> list:
+    """Urai layout menjadi [("bn", i) | ("dense", i)] (i = index tensor pertama layer)."""
+    shapes = flat_layout.shapes
+    layers, i, width = [], 0, None
+    while i < len(shapes):
+        shape = shapes[i]
+        if (len(shape) == 1 and i + 3 < len(shapes) and all(shapes[j] == shape for j in range(i, i + 4))
+                and (width is None or shape[0] == width)):
+            layers.append(("bn", i))
+            width, i = shape[0], i + 4
+        elif (len(shape) == 2 and i + 1 < len(shapes) and shapes[i + 1] == (shape[1],)
+              and (width is None or shape[0] == width)):
+            layers.append(("dense", i))
+            width, i = shape[1], i + 2
+        else:
+            raise ValueError(f"layout bukan MLP BatchNorm/Dense (tensor {i} {shape})")
+    if not layers or layers[-1][0] != "dense" or width != 1:
+        raise ValueError("layout MLP harus diakhiri Dense dengan 1 output (sigmoid)")
+    return layers
+
+
+def predict_batch(flats: np.ndarray, flat_layout: FlatLayout, X: np.ndarray, layers: list = None) -> np.ndarray:
+    """Probabilitas [K, N] untuk K model flat [K, P] atas X [N, d]."""
+    layers = layers or mlp_layers(flat_layout)
+    flats = np.asarray(flats, dtype=np.float32)
+    K = flats.shape[0]
+
+    def tensor(index):
+        return flats[:, flat_layout.slice(index)].reshape((K,) + flat_layout.shapes[index])
+
+    H = np.broadcast_to(X, (K,) + X.shape)
+    last = len(layers) - 1
+    for n, (kind, i) in enumerate(layers):
+        if kind == "bn":
+            gamma, beta, mean, var = (tensor(i + j)[:, None, :] for j in range(4))
+            H = (H - mean) * (gamma / np.sqrt(var + BN_EPSILON)) + beta
+        else:
+            H = np.matmul(H, tensor(i)) + tensor(i + 1)[:, None, :]
+            if n < last:
+                np.maximum(H, 0.0, out=H)
+    logits = H[:, :, 0].astype(np.float64)
+    return 1.0 / (1.0 + np.exp(-np.clip(logits, -60.0, 60.0)))
+
+
+def serving_function(flat_layout: FlatLayout):
+    """serve(flats [K, P], X) → probabilitas [K, N]; layer di-parse sekali per layout (di-cache)."""
+    def build():
+        layers = mlp_layers(flat_layout)
+        return lambda flats, X: predict_batch(flats, flat_layout, X, layers)
+    return ARTIFACT_CACHE.memo(("serving", tuple(flat_layout.shapes)), build)
+
+
+def global_predictor(flat: np.ndarray, flat_layout: FlatLayout, key: str):
+    """predict(X) → probabilitas [N] untuk satu model global; dibuang dari cache saat global baru terbit."""
+    def build():
+        weights = np.array(flat, dtype=np.float32)[None, :]  # salinan: vektor asli boleh di-mmap / berubah
+        serve = serving_function(flat_layout)
+        return lambda X: serve(weights, X)[0]
+    return ARTIFACT_CACHE.memo(("global", key), build, tag="global", nbytes=flat_layout.size * 4)
+
+
+def log_loss(y: np.ndarray, probs: np.ndarray) -> np.ndarray:
+    """Binary cross-entropy per model: probs [K, N] → [K]."""
+    p = np.clip(probs, 1e-7, 1.0 - 1e-7)
+    return -(y * np.log(p) + (1.0 - y) * np.log(1.0 - p)).mean(axis=1)
+
+
+def baseline_log_loss(y: np.ndarray) -> float:
+    """Log loss prediksi konstan = base rate (model 'tanpa bank mana pun')."""
+    rate = float(np.clip(y.mean(), 1e-7, 1.0 - 1e-7))
+    return float(log_loss(y, np.full((1, y.size), rate))[0])
+
+
+class BatchEvaluator:
+    """Evaluasi banyak vektor flat atas satu validation set; model diproses EVAL_BATCH_MODELS sekaligus."""
+
+    def __init__(self, flat_layout: FlatLayout, X: np.ndarray, y: np.ndarray, batch_models: int = EVAL_BATCH_MODELS):
+        self.flat_layout = flat_layout
+        self.serve = serving_function(flat_layout)
+        self.X = np.asarray(X, dtype=np.float32)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.batch_models = max(1, batch_models)
+        self.num_models = 0  # jumlah model yang sudah dievaluasi (untuk laporan biaya)
+
+    def evaluate(self, flats: np.ndarray) -> dict:
+        """flats [K, P] → {"log_loss": [K], "accuracy": [K]} (accuracy pada threshold 0.5)."""
+        losses, accs = [], []
+        for start in range(0, flats.shape[0], self.batch_models):
+            probs = self.serve(flats[start:start + self.batch_models], self.X)
+            losses.append(log_loss(self.y, probs))
+            accs.append(((probs >= 0.5) == (self.y >= 0.5)).mean(axis=1))
+        self.num_models += flats.shape[0]
+        return {"log_loss": np.concatenate(losses), "accuracy": np.concatenate(accs)}
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# ==========================================================
+# ⚡ FEDBUFF — agregasi asinkron ber-buffer dengan diskon staleness
+#
+# Update dilipat ke buffer begitu ingestion selesai, tanpa menunggu bank lain:
+#   Δ_i   = w_i − w_global[base_version_i]        (base_version = versi global yang dipakai bank)
+#   τ_i   = versi_terbaru − base_version_i        (staleness)
+#   s(τ)  = (1 + τ) ^ −FEDBUFF_STALENESS_EXPONENT
+#   buffer += s(τ_i) · n_i · Δ_i                   (n_i = num_examples, 1 jika tidak ada)
+# Setelah FEDBUFF_K update:
+#   w_global_baru = w_global_terbaru + FEDBUFF_SERVER_LR · buffer / Σ n_i
+# lalu dipublikasikan sebagai versi global baru dan buffer dikosongkan.
+#
+# Tanpa staleness (τ=0, lr=1) hasilnya sama dengan FedAvg berbobot atas K
+# update. Update basi tetap dihitung tetapi langkahnya diperkecil; update
+# dengan τ > FEDBUFF_MAX_STALENESS ditolak dari buffer (model tetap tersimpan
+# di store untuk /aggregate sinkron).
+#
+#   <root>/state.json → {"layout", "bootstrap", "count", "example_total", "entries": [{client, sha256,
+#                        base_version, staleness, discount, num_examples, weight}]}
+#   <root>/delta.npy  → Σ s(τ_i)·n_i·Δ_i (float64, flat)
+# ==========================================================
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from model_store import file_lock, write_json_atomic
+from running_fedavg import save_npy_atomic
+
+FEDBUFF_K = int(os.environ.get("FEDBUFF_K", "0"))                       # 0 = mode async nonaktif
+FEDBUFF_SERVER_LR = float(os.environ.get("FEDBUFF_SERVER_LR", "1.0"))
+FEDBUFF_MAX_STALENESS = int(os.environ.get("FEDBUFF_MAX_STALENESS", "20"))
+FEDBUFF_STALENESS_EXPONENT = float(os.environ.get("FEDBUFF_STALENESS_EXPONENT", "0.5"))
+
+
+def staleness_discount(staleness: int, exponent: float = FEDBUFF_STALENESS_EXPONENT) -> float:
+    """s(τ) = (1 + τ)^−a: τ=0 → 1, τ=3 → 0.5 (a=0.5)."""
+    return float((1.0 + staleness) ** -exponent)
+
+
+class FedBuffer:
+    def __init__(self, root: Path, versions, export, k: int = FEDBUFF_K, server_lr: float = FEDBUFF_SERVER_LR,
+                 max_staleness: int = FEDBUFF_MAX_STALENESS):
+        """
+        versions : GlobalVersions (basis delta + registry versi yang dipublikasikan)
+        export   : export(flat, flat_layout) → Path file NPZ global yang ditulis
+        """
+        self.root = Path(root)
+        self.state_path = self.root / "state.json"
+        self.delta_path = self.root / "delta.npy"
+        self.lock_path = self.root / ".lock"
+        self.versions = versions
+        self.export = export
+        self.k = k
+        self.server_lr = server_lr
+        self.max_staleness = max_staleness
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.k > 0
+
+    # ---------- state di disk ----------
+    def _empty(self, layout_sha: str) -> dict:
+        return {"layout": layout_sha, "bootstrap": False, "count": 0, "example_total": 0.0, "entries": []}
+
+    def _load_state(self):
+        if not self.state_path.exists():
+            return None
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, state: dict, delta):
+        state["updated"] = datetime.utcnow().isoformat() + "Z"
+        if delta is not None:
+            save_npy_atomic(self.delta_path, delta)
+        else:
+            self.delta_path.unlink(missing_ok=True)
+        write_json_atomic(self.state_path, state)
+
+    # ---------- API ----------
+    def submit(self, client: str, digest: str, flat: np.ndarray, flat_layout, layout_sha: str,
+               num_examples: int = None, base_version: int = None) -> dict:
+        """
+        Masukkan satu update ke buffer. Return info untuk hasil ingestion:
+        {"accepted", "staleness", "discount", "buffered", "k", "published"?: entry versi}.
+        base_version None → dianggap versi terbaru (τ=0).
+        """
+        with file_lock(self.lock_path):
+            state = self._load_state()
+            if state is None or state["layout"] != layout_sha:
+                state = self._empty(layout_sha)
+            if any(e["sha256"] == digest for e in state["entries"]):
+                return {"accepted": False, "reason": "update yang sama sudah ada di buffer"}
+
+            latest = self.versions.latest()
+            base_assumed = base_version is None
+            if latest is None or state.get("bootstrap"):
+                # belum ada global → bootstrap dari nol: Δ = w, global pertama = rata-rata berbobot
+                # (buffer bootstrap tetap bootstrap walau ada versi baru di tengah jalan)
+                state["bootstrap"] = True
+                base, base_version, staleness = None, None, 0
+            else:
+                if base_assumed:
+                    base_version = latest["version"]
+                staleness = latest["version"] - int(base_version)
+                if staleness < 0:
+                    return {"accepted": False, "reason": f"base_version {base_version} > versi terbaru {latest['version']}"}
+                if staleness > self.max_staleness:
+                    return {"accepted": False, "staleness": staleness,
+                            "reason": f"terlalu basi (τ={staleness} > {self.max_staleness})"}
+                entry = self.versions.get(int(base_version))
+                base = self.versions.load(int(base_version)) if entry else None
+                if base is None or entry["layout"] != layout_sha:
+                    return {"accepted": False, "reason": f"versi global {base_version} tidak tersedia untuk layout ini"}
+
+            discount = staleness_discount(staleness)
+            examples = float(num_examples) if num_examples else 1.0
+            weight = discount * examples
+
+            delta = np.load(self.delta_path) if state["count"] else np.zeros(flat_layout.size, dtype=np.float64)
+            update = flat.astype(np.float64)
+            if base is not None:
+                update -= base
+            delta += weight * update
+            del base
+
+            state["count"] += 1
+            state["example_total"] += examples
+            state["entries"].append({
+                "client": client, "sha256": digest, "base_version": base_version, "base_assumed": base_assumed,
+                "staleness": staleness, "discount": discount, "num_examples": num_examples, "weight": weight,
+            })
+            result = {"accepted": True, "staleness": staleness, "discount": round(discount, 6),
+                      "base_version": base_version, "buffered": state["count"], "k": self.k}
+
+            if state["count"] >= self.k:
+                result["published"] = self._publish_locked(state, delta, flat_layout)
+                state, delta = self._empty(layout_sha), None
+            self._save(state, delta)
+        return result
+
+    def flush(self, flat_layout) -> dict:
+        """Publikasikan isi buffer sekarang walaupun belum K (mis. akhir training). None jika kosong."""
+        with file_lock(self.lock_path):
+            state = self._load_state()
+            if state is None or not state["count"]:
+                return None
+            published = self._publish_locked(state, np.load(self.delta_path), flat_layout)
+            self._save(self._empty(state["layout"]), None)
+        return published
+
+    def _publish_locked(self, state: dict, delta: np.ndarray, flat_layout) -> dict:
+        latest = self.versions.latest()
+        step = delta / state["example_total"]
+        if state.get("bootstrap") or latest is None or latest["layout"] != state["layout"]:
+            new_flat = step.astype(np.float32)  # bootstrap: rata-rata berbobot, tanpa server lr
+        else:
+            new_flat = (self.versions.load(latest["version"]) + self.server_lr * step).astype(np.float32)
+        path = self.export(new_flat, flat_layout)
+        stalenesses = [e["staleness"] for e in state["entries"]]
+        entry = self.versions.register(new_flat, state["layout"], path, "fedbuff", {
+            "num_updates": state["count"],
+            "clients": [e["client"] for e in state["entries"]],
+            "mean_staleness": round(float(np.mean(stalenesses)), 4),
+            "max_staleness": int(max(stalenesses)),
+            "server_lr": self.server_lr,
+        })
+        print(f"⚡ FedBuff: versi global {entry['version']} dipublikasikan dari {state['count']} update "
+              f"(τ rata-rata {entry['info']['mean_staleness']}) → {path}")
+        return {"version": entry["version"], "file": entry["file"], "num_updates": state["count"]}
+
+    def status(self) -> dict:
+        state = self._load_state() or self._empty(None)
+        return {
+            "enabled": self.enabled,
+            "k": self.k,
+            "server_lr": self.server_lr,
+            "max_staleness": self.max_staleness,
+            "staleness_exponent": FEDBUFF_STALENESS_EXPONENT,
+            "buffered": state["count"],
+            "entries": state["entries"],
+        }
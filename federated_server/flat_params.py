@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 📏 FLAT PARAMS — bobot model sebagai satu vektor float32 kontigu
+#
+#   FlatLayout(shapes) → offsets/sizes tiap tensor di dalam vektor flat
+#   vektor flat        → rata-rata, norm, similarity, statistik = satu operasi vektor
+#   layout.views(flat) → list tensor (reshape zero-copy, bukan salinan)
+#
+# Dipakai server untuk semua matematika bobot, sehingga tidak ada lagi
+# np.concatenate([w.flatten() ...]) atau konversi list Python berulang.
+# ==========================================================
+import numpy as np
+
+
+class FlatLayout:
+    def __init__(self, shapes):
+        self.shapes = [tuple(int(d) for d in shape) for shape in shapes]
+        self.sizes = [int(np.prod(shape, dtype=np.int64)) for shape in self.shapes]
+        self.offsets = [0]
+        for size in self.sizes:
+            self.offsets.append(self.offsets[-1] + size)
+        self.size = self.offsets[-1]
+
+    @classmethod
+    def from_tensors(cls, tensors: list):
+        """Dari daftar tensor layout model ([{"name", "shape", "dtype"}, ...])."""
+        return cls([t["shape"] for t in tensors])
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def __eq__(self, other):
+        return isinstance(other, FlatLayout) and self.shapes == other.shapes
+
+    def to_json(self) -> list:
+        return [list(shape) for shape in self.shapes]
+
+    def slice(self, index: int) -> slice:
+        return slice(self.offsets[index], self.offsets[index + 1])
+
+    def empty(self, dtype=np.float32) -> np.ndarray:
+        return np.empty(self.size, dtype=dtype)
+
+    def views(self, flat: np.ndarray) -> list:
+        """Tensor per layer sebagai view dari `flat` (tanpa salinan)."""
+        if flat.shape != (self.size,):
+            raise ValueError(f"vektor flat berukuran {flat.shape}, layout butuh ({self.size},)")
+        return [flat[self.slice(i)].reshape(shape) for i, shape in enumerate(self.shapes)]
+
+    def pack(self, tensors, out: np.ndarray = None) -> np.ndarray:
+        """Salin tensor (iterable) ke satu vektor float32; setiap tensor ditulis langsung ke slot-nya."""
+        out = self.empty() if out is None else out
+        views = self.views(out)
+        count = 0
+        for i, tensor in enumerate(tensors):
+            if i >= len(views) or tuple(np.shape(tensor)) != self.shapes[i]:
+                raise ValueError(
+                    f"tensor {i}: shape {tuple(np.shape(tensor))} tidak sesuai layout "
+                    f"{self.shapes[i] if i < len(views) else '(lebih banyak tensor dari layout)'}"
+                )
+            views[i][...] = tensor
+            count += 1
+        if count != len(views):
+            raise ValueError(f"jumlah tensor {count} != {len(views)} di layout")
+        return out
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🏷️ GLOBAL VERSIONS — registry versi model global (sync /aggregate & FedBuff)
+#
+#   <root>/registry.json → {"latest": N, "versions": [{"version", "file", "layout", "source",
+#                                                      "created", "info"}, ...]}
+#   <root>/v<N>.npy      → bobot global flat float32 versi N (basis delta FedBuff)
+#   <root>/latest.json   → entry versi terbaru (pointer; /download-global tanpa glob/registry penuh)
+#
+# Setiap model global yang dipublikasikan mendapat nomor versi naik. Client
+# mengirim versi yang ia pakai untuk training (X-Base-Version) sehingga server
+# tahu seberapa basi (stale) update-nya. Hanya MAX_FLAT_VERSIONS vektor flat
+# terakhir yang disimpan; metadata semua versi tetap tercatat.
+# ==========================================================
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from artifact_cache import ARTIFACT_CACHE
+from model_store import file_lock, write_json_atomic
+from running_fedavg import save_npy_atomic
+
+MAX_FLAT_VERSIONS = 32  # ≥ FEDBUFF_MAX_STALENESS + 1, agar basis update yang masih diterima selalu ada
+
+
+class GlobalVersions:
+    def __init__(self, root: Path, keep: int = MAX_FLAT_VERSIONS):
+        self.root = Path(root)
+        self.path = self.root / "registry.json"
+        self.latest_path = self.root / "latest.json"
+        self.lock_path = self.root / ".lock"
+        self.keep = keep
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _flat_path(self, version: int) -> Path:
+        return self.root / f"v{version}.npy"
+
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {"latest": None, "versions": []}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def register(self, flat: np.ndarray, layout_sha: str, file: Path, source: str, info: dict = None) -> dict:
+        """Catat model global baru (sudah ditulis ke `file`) → entry versi {"version", ...}."""
+        with file_lock(self.lock_path):
+            registry = self._load()
+            version = 0 if registry["latest"] is None else registry["latest"] + 1
+            save_npy_atomic(self._flat_path(version), np.asarray(flat, dtype=np.float32))
+            entry = {
+                "version": version,
+                "file": Path(file).name,
+                "layout": layout_sha,
+                "source": source,
+                "created": datetime.utcnow().isoformat() + "Z",
+                "info": info or {},
+            }
+            registry["versions"].append(entry)
+            registry["latest"] = version
+            write_json_atomic(self.path, registry)
+            write_json_atomic(self.latest_path, entry)
+            # vektor flat lama tidak dibutuhkan lagi (update dengan basis itu sudah terlalu basi)
+            self._flat_path(version - self.keep).unlink(missing_ok=True)
+        # serving function model global lama di proses ini tidak dipakai lagi
+        ARTIFACT_CACHE.invalidate("global")
+        return entry
+
+    def latest(self):
+        if self.latest_path.exists():
+            with open(self.latest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        registry = self._load()  # registry lama (sebelum ada latest.json)
+        return registry["versions"][-1] if registry["versions"] else None
+
+    def get(self, version: int):
+        for entry in reversed(self._load()["versions"]):
+            if entry["version"] == version:
+                return entry
+        return None
+
+    def find_file(self, name: str):
+        for entry in reversed(self._load()["versions"]):
+            if entry["file"] == name:
+                return entry
+        return None
+
+    def load(self, version: int):
+        """Vektor flat versi `version` (mmap), None jika sudah dibuang."""
+        path = self._flat_path(version)
+        if not path.exists():
+            return None
+        return np.load(path, mmap_mode="r")
+
+    def summary(self, window_seconds: int = 3600) -> dict:
+        registry = self._load()
+        since = (datetime.utcnow() - timedelta(seconds=window_seconds)).isoformat() + "Z"
+        recent = [v for v in registry["versions"] if v["created"] >= since]
+        return {
+            "latest": registry["latest"],
+            "total_versions": len(registry["versions"]),
+            "versions_last_hour": len(recent),
+            "by_source": {
+                source: sum(1 for v in recent if v["source"] == source) for source in {v["source"] for v in recent}
+            },
+        }
+
+    def list(self, limit: int = 50) -> list:
+        return self._load()["versions"][-limit:]
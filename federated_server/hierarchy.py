@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🌐 HIERARCHY — agregasi dua tingkat (regional → root)
+#
+#   SERVER_ROLE=regional → server menerima upload bank seperti biasa, lalu
+#                          /aggregate meneruskan partial sum ke UPSTREAM_URL
+#   SERVER_ROLE=root     → (default) menerima partial dari regional di
+#                          POST /partials/<region> dan menggabungkannya
+#
+# Partial = running sum FedAvg region (Σ weight_i · w_i, float64) + bobot
+# total + metadata ringan per bank. Root cukup menjumlah R partial:
+#   global = (Σ_r sum_r + sum_lokal) / (Σ_r total_weight_r + total_weight_lokal)
+# = hasil FedAvg datar atas semua bank (satu vektor per region, bukan per bank).
+#
+# Format kirim: NPZ tanpa kompresi
+#   "sum"         → float64 [jumlah parameter], urutan layout
+#   "__partial__" → JSON {"format", "region", "layout", "layout_tensors", "weighting",
+#                         "total_weight", "num_clients", "clients": {CLIENT: {"sha256", "num_examples", "mean"}}}
+#
+# Root menyimpan:
+#   <root>/state.json       → {"layout", "regions": {REGION: {metadata partial, "sha256", "received"}}}
+#   <root>/<REGION>.npy     → partial sum float64
+# ==========================================================
+import io
+import os
+import json
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from model_store import file_lock, write_json_atomic
+from running_fedavg import save_npy_atomic
+
+SERVER_ROLE = os.environ.get("SERVER_ROLE", "root")      # "root" | "regional"
+REGION_NAME = os.environ.get("REGION_NAME", "")          # nama region (wajib untuk regional)
+UPSTREAM_URL = os.environ.get("UPSTREAM_URL", "")        # base URL root (wajib untuk regional)
+SERVER_ROLES = ("root", "regional")
+
+PARTIAL_KEY = "__partial__"
+PARTIAL_FORMAT = "cin-partial-v1"
+FORWARD_TIMEOUT_SECONDS = 120
+
+
+# ==========================================================
+# FORMAT PARTIAL
+# ==========================================================
+def encode_partial(total: np.ndarray, meta: dict) -> bytes:
+    buf = io.BytesIO()
+    np.savez(buf, sum=np.asarray(total, dtype=np.float64),
+             **{PARTIAL_KEY: np.array(json.dumps({"format": PARTIAL_FORMAT, **meta}))})
+    return buf.getvalue()
+
+
+def decode_partial(path: Path) -> tuple:
+    """NPZ partial → (sum float64, metadata). ValueError jika format/isi tidak valid."""
+    with np.load(path, allow_pickle=False) as npzfile:
+        if PARTIAL_KEY not in npzfile.files or "sum" not in npzfile.files:
+            raise ValueError(f"partial butuh entry 'sum' dan '{PARTIAL_KEY}'")
+        meta = json.loads(str(npzfile[PARTIAL_KEY][()]))
+        total = npzfile["sum"]
+    if meta.get("format") != PARTIAL_FORMAT:
+        raise ValueError(f"format partial tidak dikenal: {meta.get('format')}")
+    if total.dtype != np.float64 or total.ndim != 1:
+        raise ValueError(f"sum harus vektor float64, bukan {total.dtype} {total.shape}")
+    for key in ("region", "layout", "weighting", "total_weight", "clients"):
+        if key not in meta:
+            raise ValueError(f"metadata partial tidak lengkap: {key}")
+    if meta["weighting"] not in ("examples", "uniform"):
+        raise ValueError(f"weighting tidak dikenal: {meta['weighting']}")
+    if not meta["clients"] or float(meta["total_weight"]) <= 0:
+        raise ValueError("partial kosong (tidak ada client)")
+    return total, meta
+
+
+def partial_meta(region: str, layout: dict, state: dict) -> dict:
+    """Metadata partial dari state RunningFedAvg region."""
+    return {
+        "region": region,
+        "layout": layout["sha256"],
+        "layout_tensors": layout["tensors"],
+        "weighting": state.get("weighting", "uniform"),
+        "total_weight": state["total_weight"],
+        "num_clients": len(state["clients"]),
+        "clients": {
+            client: {"sha256": info["sha256"], "num_examples": info.get("num_examples"), "mean": info["mean"]}
+            for client, info in state["clients"].items()
+        },
+    }
+
+
+def forward_partial(upstream_url: str, region: str, body: bytes) -> dict:
+    """POST partial ke root; return JSON balasan root. Error HTTP → RuntimeError berisi pesan root."""
+    url = f"{upstream_url.rstrip('/')}/partials/{region}"
+    req = urllib.request.Request(url, data=body, method="POST",
+                                 headers={"Content-Type": "application/octet-stream"})
+    try:
+        with urllib.request.urlopen(req, timeout=FORWARD_TIMEOUT_SECONDS) as resp:
+            return json.loads(resp.read().decode("utf-8") or "{}")
+    except urllib.error.HTTPError as e:
+        detail = e.read().decode("utf-8", errors="replace")
+        try:
+            detail = json.loads(detail).get("message", detail)
+        except (ValueError, AttributeError):
+            pass
+        raise RuntimeError(f"root menolak partial ({e.code}): {detail}") from e
+    except urllib.error.URLError as e:
+        raise RuntimeError(f"root tidak bisa dihubungi ({url}): {e.reason}") from e
+
+
+# ==========================================================
+# PENYIMPANAN PARTIAL DI ROOT
+# ==========================================================
+class RegionalPartials:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.state_path = self.root / "state.json"
+        self.lock_path = self.root / ".lock"
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _sum_path(self, region: str) -> Path:
+        return self.root / f"{region}.npy"
+
+    def _load_state(self) -> dict:
+        if not self.state_path.exists():
+            return {"layout": None, "regions": {}}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, region: str, total: np.ndarray, meta: dict, digest: str) -> bool:
+        """Simpan/ganti partial region. Return False jika partial yang sama sudah ada."""
+        with file_lock(self.lock_path):
+            state = self._load_state()
+            current = state["regions"].get(region)
+            if current and current["sha256"] == digest and state["layout"] == meta["layout"]:
+                return False
+            if state["layout"] != meta["layout"]:
+                # layout berganti → partial region lain tidak bisa dijumlah lagi
+                for old in state["regions"]:
+                    self._sum_path(old).unlink(missing_ok=True)
+                state = {"layout": meta["layout"], "regions": {}}
+            save_npy_atomic(self._sum_path(region), total)
+            info = {k: v for k, v in meta.items() if k not in ("format", "layout_tensors")}
+            info["num_clients"] = len(meta["clients"])
+            info["sha256"] = digest
+            info["received"] = datetime.utcnow().isoformat() + "Z"
+            state["regions"][region] = info
+            write_json_atomic(self.state_path, state)
+        return True
+
+    def remove(self, region: str) -> bool:
+        with file_lock(self.lock_path):
+            state = self._load_state()
+            if state["regions"].pop(region, None) is None:
+                return False
+            write_json_atomic(self.state_path, state)
+            self._sum_path(region).unlink(missing_ok=True)
+        return True
+
+    def snapshot(self, layout_sha: str) -> dict:
+        """{region: metadata} untuk layout aktif (partial layout lain tidak ikut)."""
+        state = self._load_state()
+        if state["layout"] != layout_sha:
+            return {}
+        return state["regions"]
+
+    def list(self) -> dict:
+        return self._load_state()
+
+    def accumulate(self, regions: dict, total: np.ndarray) -> float:
+        """total += Σ sum region (di-mmap satu per satu). Return Σ total_weight region."""
+        weight = 0.0
+        for region, info in regions.items():
+            partial = np.load(self._sum_path(region), mmap_mode="r")
+            if partial.shape != total.shape:
+                raise ValueError(f"partial {region} berukuran {partial.shape}, butuh {total.shape}")
+            total += partial
+            del partial
+            weight += float(info["total_weight"])
+        return weight
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# ==========================================================
+# ⏳ JOB QUEUE — antrian kerja background dengan status di disk
+#
+#   <root>/<job_id>.json   → {"id", "status", "phase", "progress", "payload",
+#                              "result", "error", "created", "updated", "owner"}
+#
+# status: queued → running → done | error
+# Status disimpan sebagai file (bukan memori) sehingga endpoint status bisa
+# dilayani worker gunicorn mana pun, dan job yang tertinggal saat proses
+# mati bisa dijalankan ulang saat server start.
+#
+# SingleFlight: satu job per fingerprint input. Marker in-flight
+#   <root>/inflight/<fingerprint>.json → {"job_id", "created"}
+# dicek & ditulis di bawah flock, jadi request bersamaan (di worker gunicorn
+# mana pun) dengan input yang sama menempel ke job yang sudah berjalan.
+# ==========================================================
+import os
+import json
+import time
+import uuid
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from model_store import file_lock, write_json_atomic
+
+JOB_TTL_SECONDS = 24 * 3600  # status job selesai disimpan 24 jam
+
+# identitas proses ini; pid saja tidak cukup karena pid di container sering
+# sama persis setelah restart
+PROCESS_TOKEN = uuid.uuid4().hex[:12]
+
+
+class JobError(Exception):
+    """Error dari handler job beserta detail tambahan untuk status."""
+
+    def __init__(self, message: str, http_status: int = 400, **details):
+        super().__init__(message)
+        self.http_status = http_status
+        self.details = details
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+def _owner() -> dict:
+    return {"pid": os.getpid(), "token": PROCESS_TOKEN}
+
+def _orphaned(job: dict) -> bool:
+    """True jika proses pemilik job sudah tidak ada (job tertinggal saat restart/crash)."""
+    owner = job.get("owner") or {}
+    pid = owner.get("pid")
+    if pid == os.getpid():
+        return owner.get("token") != PROCESS_TOKEN
+    try:
+        os.kill(int(pid), 0)
+        return False
+    except (OSError, TypeError, ValueError):
+        return True
+
+
+class JobQueue:
+    def __init__(self, root: Path, handler, workers: int = 4, name: str = "job"):
+        """
+        handler(job_id, payload, report) → dict hasil.
+        report(phase, progress) dipanggil handler untuk update status.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.handler = handler
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=name)
+
+    # ---------- status file ----------
+    def _path(self, job_id: str) -> Path:
+        return self.root / f"{job_id}.json"
+
+    def get(self, job_id: str):
+        if not job_id or not all(ch in "0123456789abcdef" for ch in job_id):
+            return None
+        path = self._path(job_id)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def update(self, job_id: str, **fields) -> dict:
+        with file_lock(self.root / ".lock"):
+            job = self.get(job_id) or {"id": job_id}
+            job.update(fields)
+            job["updated"] = _now()
+            write_json_atomic(self._path(job_id), job)
+        return job
+
+    # ---------- submit / run ----------
+    def submit(self, payload: dict, **fields) -> dict:
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        job = self.update(
+            job_id,
+            status="queued", phase="queued", progress=0.0,
+            payload=payload, result=None, error=None,
+            created=_now(), owner=_owner(), **fields,
+        )
+        self.executor.submit(self._run, job_id)
+        return job
+
+    def _run(self, job_id: str):
+        job = self.get(job_id)
+        if job is None:
+            return
+        started = time.time()
+        self.update(job_id, status="running", phase="running", owner=_owner())
+
+        def report(phase: str, progress: float = None):
+            fields = {"phase": phase}
+            if progress is not None:
+                fields["progress"] = round(float(progress), 4)
+            self.update(job_id, **fields)
+
+        try:
+            result = self.handler(job_id, job.get("payload") or {}, report)
+            self.update(job_id, status="done", phase="done", progress=1.0, result=result,
+                        duration_sec=round(time.time() - started, 4))
+        except JobError as e:
+            self.update(job_id, status="error", phase="error", error=str(e), http_status=e.http_status,
+                        duration_sec=round(time.time() - started, 4), error_details=sorted(e.details), **e.details)
+        except Exception as e:
+            traceback.print_exc()
+            self.update(job_id, status="error", phase="error", error=str(e), http_status=500,
+                        duration_sec=round(time.time() - started, 4))
+
+    def is_active(self, job: dict) -> bool:
+        """True jika job masih queued/running dan proses pemiliknya masih hidup."""
+        return bool(job) and job.get("status") in ("queued", "running") and not _orphaned(job)
+
+    def wait(self, job_id: str, timeout: float = None, poll: float = 0.05) -> dict:
+        """Tunggu job selesai (dipakai mode sinkron / ?wait=1)."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.get("status") in ("done", "error"):
+                return job
+            if deadline is not None and time.time() > deadline:
+                return job
+            time.sleep(poll)
+
+    # ---------- housekeeping ----------
+    def recover(self):
+        """Jalankan ulang job queued/running milik proses yang sudah mati."""
+        for path in self.root.glob("*.json"):
+            job_id = path.stem
+            # cek + klaim di bawah lock → dua worker gunicorn tidak mengambil job yang sama
+            with file_lock(self.root / ".lock"):
+                job = self.get(job_id)
+                if not job or job.get("status") not in ("queued", "running") or not _orphaned(job):
+                    continue
+                job.update(status="queued", phase="queued", owner=_owner(), recovered=True, updated=_now())
+                write_json_atomic(self._path(job_id), job)
+            self.executor.submit(self._run, job_id)
+            print(f"♻️ {self.name} {job_id} dijalankan ulang setelah restart")
+
+    def cleanup(self):
+        now = time.time()
+        for path in self.root.glob("*.json"):
+            try:
+                if now - path.stat().st_mtime < JOB_TTL_SECONDS:
+                    continue
+                job = self.get(path.stem)
+                if job and job.get("status") in ("done", "error"):
+                    path.unlink(missing_ok=True)
+            except Exception:
+                pass
+
+
+class SingleFlight:
+    def __init__(self, queue: JobQueue):
+        self.queue = queue
+        self.root = queue.root / "inflight"
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def submit(self, fingerprint: str, payload: dict, **fields) -> tuple:
+        """
+        Return (job, attached). attached=True → job dengan fingerprint sama sedang berjalan
+        dan dipakai bersama; selain itu job baru dibuat dan dicatat sebagai in-flight.
+        """
+        marker_path = self.root / f"{fingerprint}.json"
+        with file_lock(self.root / ".lock"):
+            if marker_path.exists():
+                with open(marker_path, "r", encoding="utf-8") as f:
+                    job = self.queue.get(json.load(f).get("job_id"))
+                if self.queue.is_active(job):
+                    self.queue.update(job["id"], attached=int(job.get("attached", 0)) + 1)
+                    return job, True
+            job = self.queue.submit(payload, fingerprint=fingerprint, **fields)
+            write_json_atomic(marker_path, {"job_id": job["id"], "created": _now()})
+        self.cleanup()
+        return job, False
+
+    def cleanup(self):
+        """Buang marker lama (job-nya sudah selesai > JOB_TTL_SECONDS)."""
+        now = time.time()
+        for path in self.root.glob("*.json"):
+            try:
+                if now - path.stat().st_mtime > JOB_TTL_SECONDS:
+                    path.unlink(missing_ok=True)
+            except OSError:
+                pass
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 📐 MODEL LAYOUT — skema tensor kanonik model global
+#
+#   models/layout.json
+#   {"tensors": [{"name": "arr_0", "shape": [39], "dtype": "float32"}, ...],
+#    "source": "declared" | "first_upload", "created": "...", "sha256": "..."}
+#
+# Setiap upload dicek terhadap layout ini dari header NPZ saja (O(#tensor)).
+# Upload yang urutannya beda tapi nama tensornya cocok akan di-reorder;
+# yang tidak cocok ditolak sebelum bisa merusak round FedAvg.
+# ==========================================================
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from model_store import file_lock, write_json_atomic
+
+
+class LayoutMismatch(ValueError):
+    """Upload tidak cocok dengan layout; `errors` berisi detail per tensor."""
+
+    def __init__(self, message: str, errors: list):
+        super().__init__(message)
+        self.errors = errors
+
+
+def layout_digest(tensors: list) -> str:
+    canonical = json.dumps(
+        [{"name": t["name"], "shape": list(t["shape"]), "dtype": t["dtype"]} for t in tensors],
+        sort_keys=True,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _is_float(dtype: str) -> bool:
+    try:
+        return np.issubdtype(np.dtype(dtype), np.floating)
+    except TypeError:
+        return False
+
+def _compatible(expected: dict, actual: dict) -> bool:
+    """Shape harus sama persis; dtype float boleh beda presisi (di-cast ke float32 saat load)."""
+    if list(expected["shape"]) != list(actual["shape"]):
+        return False
+    if expected["dtype"] == actual["dtype"]:
+        return True
+    return _is_float(expected["dtype"]) and _is_float(actual["dtype"])
+
+
+class LayoutRegistry:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+
+    def get(self):
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def declare(self, tensors: list, source: str = "declared") -> dict:
+        for t in tensors:
+            if not isinstance(t, dict) or "name" not in t or "shape" not in t:
+                raise ValueError("setiap tensor butuh 'name' dan 'shape'")
+        clean = [
+            {"name": str(t["name"]), "shape": [int(d) for d in t["shape"]], "dtype": str(t.get("dtype", "float32"))}
+            for t in tensors
+        ]
+        layout = {
+            "tensors": clean,
+            "source": source,
+            "created": datetime.utcnow().isoformat() + "Z",
+            "sha256": layout_digest(clean),
+        }
+        with file_lock(self.lock_path):
+            write_json_atomic(self.path, layout)
+        return layout
+
+    def clear(self) -> bool:
+        with file_lock(self.lock_path):
+            if not self.path.exists():
+                return False
+            self.path.unlink()
+        return True
+
+    def ensure(self, tensors: list) -> dict:
+        """Layout aktif; jika belum ada, upload valid pertama menjadi layout (source=first_upload)."""
+        with file_lock(self.lock_path):
+            layout = self.get()
+            if layout is not None:
+                return layout
+            clean = [{"name": t["name"], "shape": list(t["shape"]), "dtype": t["dtype"]} for t in tensors]
+            layout = {
+                "tensors": clean,
+                "source": "first_upload",
+                "created": datetime.utcnow().isoformat() + "Z",
+                "sha256": layout_digest(clean),
+            }
+            write_json_atomic(self.path, layout)
+            print(f"📐 Layout model di-pin dari upload pertama ({len(clean)} tensor)")
+            return layout
+
+
+def match_layout(layout: dict, tensors: list) -> list:
+    """
+    Cocokkan tensor upload (hasil describe_weights_format) dengan layout.
+    Return urutan nama tensor upload sesuai urutan layout.
+
+    1) semua nama layout ada di upload (shape/dtype cocok) → urut berdasarkan nama,
+       tensor ekstra (mis. slot optimizer) diabaikan
+    2) jumlah sama & shape/dtype cocok per posisi → urutan file dipakai apa adanya
+    selain itu → LayoutMismatch
+    """
+    expected = layout["tensors"]
+    by_name = {t["name"]: t for t in tensors}
+
+    if all(e["name"] in by_name for e in expected):
+        errors = [
+            {"name": e["name"], "expected": e, "actual": by_name[e["name"]]}
+            for e in expected if not _compatible(e, by_name[e["name"]])
+        ]
+        if not errors:
+            return [e["name"] for e in expected]
+        raise LayoutMismatch("shape/dtype tensor tidak sesuai layout", errors)
+
+    if len(tensors) == len(expected):
+        errors = [
+            {"index": i, "expected": e, "actual": t}
+            for i, (e, t) in enumerate(zip(expected, tensors)) if not _compatible(e, t)
+        ]
+        if not errors:
+            return [t["name"] for t in tensors]
+        raise LayoutMismatch("shape/dtype tensor tidak sesuai layout (cocok posisi)", errors)
+
+    raise LayoutMismatch(
+        f"jumlah tensor {len(tensors)} != {len(expected)} dan nama tidak cocok dengan layout",
+        [{"expected_names": [e["name"] for e in expected], "actual_names": [t["name"] for t in tensors]}],
+    )
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 📊 METRICS STORE — riwayat & best accuracy client di SQLite (WAL)
+#
+#   models/metrics.db
+#     history(id, client, round, ts, accuracy, raw, source, key)
+#       idx (client, round, ts)  → query per client/round
+#       idx (client, id)         → tail N baris terakhir tanpa scan seluruh riwayat
+#       unique (client, key)     → baris yang dikirim ulang diabaikan (INSERT OR IGNORE)
+#     best(client, accuracy, ts) → best accuracy (upsert atomik, hanya jika naik)
+#     sync_cursor(client, round, ts) → entry history client terbaru yang sudah diterima;
+#       client hanya mengirim baris yang lebih baru dari cursor ini
+#
+# Satu koneksi per thread; WAL + busy_timeout sehingga beberapa worker
+# gunicorn bisa menulis bersamaan tanpa saling menimpa.
+# ==========================================================
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from model_store import file_lock
+
+BUSY_TIMEOUT_MS = 30_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    client   TEXT NOT NULL,
+    round    INTEGER,
+    ts       TEXT,
+    accuracy REAL,
+    raw      TEXT NOT NULL,
+    source   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_client_round_ts ON history(client, round, ts);
+CREATE INDEX IF NOT EXISTS idx_history_client_id ON history(client, id);
+CREATE TABLE IF NOT EXISTS best (
+    client   TEXT PRIMARY KEY,
+    accuracy REAL NOT NULL,
+    ts       TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_cursor (
+    client   TEXT PRIMARY KEY,
+    round    INTEGER,
+    ts       TEXT NOT NULL
+);
+"""
+
+# kunci dedupe baris history; harus sama dengan history_key()
+KEY_SQL = "CASE WHEN round IS NULL AND ts IS NULL THEN 'raw:' || raw ELSE COALESCE(round, '') || '|' || COALESCE(ts, '') END"
+
+_TS_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+_INT_RE = re.compile(r"^\d+$")
+_FLOAT_RE = re.compile(r"^-?\d*\.\d+$")
+
+
+def parse_history_line(line: str):
+    """
+    Ambil (round, ts, accuracy) dari satu baris history. Format yang dikenal:
+      bank_A_DATA<TAB>3<TAB>0.897650<TAB>0.32<TAB>0.31<TAB>2026-01-05T04:48:11Z   (accuracy_history.txt bank)
+      3<TAB>0.897650<TAB>2026-01-05T04:48:11Z                                    (history list of dict)
+      2026-01-05T04:48:11Z<TAB>0.897650                                          (accuracy skalar)
+    Field yang tidak dikenali → None. Baris header ("bank<TAB>round…") → None.
+    """
+    fields = [f.strip() for f in line.split("\t")]
+    if "round" in fields and "acc" in fields:
+        return None
+    round_num = ts = acc = None
+    for f in fields:
+        if round_num is None and acc is None and _INT_RE.match(f):
+            round_num = int(f)
+        elif acc is None and _FLOAT_RE.match(f):
+            acc = float(f)
+        elif ts is None and _TS_RE.match(f):
+            ts = f
+    return round_num, ts, acc
+
+def history_key(round_num, ts, raw: str) -> str:
+    """(round, ts) menentukan satu entry; baris tanpa keduanya di-dedupe per teks aslinya."""
+    if round_num is None and ts is None:
+        return f"raw:{raw}"
+    return f"{'' if round_num is None else round_num}|{ts or ''}"
+
+
+class MetricsStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+
+    def _migrate(self, conn):
+        """Tambah kolom key jika belum ada (database baru / versi lama): isi key, buang duplikat, pasang unique index + cursor."""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+        if "key" in columns:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+            if "key" not in columns:  # proses lain mungkin sudah migrasi duluan
+                conn.execute("ALTER TABLE history ADD COLUMN key TEXT")
+                conn.execute(f"UPDATE history SET key = {KEY_SQL}")
+                removed = conn.execute(
+                    "DELETE FROM history WHERE id NOT IN (SELECT MIN(id) FROM history GROUP BY client, key)"
+                ).rowcount
+                conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_history_client_key ON history(client, key)")
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_cursor (client, round, ts) "
+                    "SELECT client, round, MAX(ts) FROM history "
+                    "WHERE round IS NOT NULL AND ts IS NOT NULL AND source != 'accuracy' GROUP BY client"
+                )
+                if removed:
+                    print(f"📊 {removed} baris history duplikat dihapus dari {self.path}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None → transaksi diatur manual (BEGIN IMMEDIATE)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- tulis ----------
+    def record(self, client: str, history_lines: list = (), accuracy: float = None, source: str = "upload") -> dict:
+        """
+        Tulis satu batch dalam satu transaksi: semua baris history (executemany,
+        baris yang key-nya sudah ada diabaikan) + baris accuracy skalar + update
+        best jika accuracy naik + majukan sync cursor.
+        """
+        now = datetime.utcnow().isoformat() + "Z"
+        rows = []
+        for line in history_lines:
+            line = line.strip()
+            if not line:
+                continue
+            parsed = parse_history_line(line)
+            if parsed is None:
+                continue
+            round_num, ts, acc = parsed
+            rows.append((client, round_num, ts, acc, line, source, history_key(round_num, ts, line)))
+        # entry terbaru dari history client (bukan baris accuracy yang di-timestamp server)
+        latest = max(((r[2], r[1]) for r in rows if r[1] is not None and r[2] is not None), default=None)
+
+        n_history = len(rows)
+        if accuracy is not None:
+            raw = f"{now}\t{accuracy:.6f}"
+            rows.append((client, None, now, accuracy, raw, "accuracy", history_key(None, now, raw)))
+
+        written_best = False
+        inserted = 0
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if rows:
+                inserted = conn.executemany(
+                    "INSERT OR IGNORE INTO history (client, round, ts, accuracy, raw, source, key) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                ).rowcount
+            if latest is not None:
+                conn.execute(
+                    "INSERT INTO sync_cursor (client, round, ts) VALUES (?, ?, ?) "
+                    "ON CONFLICT(client) DO UPDATE SET round = excluded.round, ts = excluded.ts "
+                    "WHERE excluded.ts > sync_cursor.ts",
+                    (client, latest[1], latest[0]),
+                )
+            if accuracy is not None:
+                cur = conn.execute(
+                    "INSERT INTO best (client, accuracy, ts) VALUES (?, ?, ?) "
+                    "ON CONFLICT(client) DO UPDATE SET accuracy = excluded.accuracy, ts = excluded.ts "
+                    "WHERE excluded.accuracy > best.accuracy",
+                    (client, accuracy, now),
+                )
+                written_best = cur.rowcount > 0
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if accuracy is not None:
+            inserted -= 1
+        return {
+            "history_written": inserted,
+            "history_duplicates": n_history - inserted,
+            "written_best": written_best,
+        }
+
+    def set_best(self, client: str, accuracy: float, ts: str = None):
+        self._conn().execute(
+            "INSERT INTO best (client, accuracy, ts) VALUES (?, ?, ?) "
+            "ON CONFLICT(client) DO UPDATE SET accuracy = excluded.accuracy, ts = excluded.ts "
+            "WHERE excluded.accuracy > best.accuracy",
+            (client, accuracy, ts),
+        )
+
+    def delete_client(self, client: str) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = conn.execute("DELETE FROM history WHERE client = ?", (client,)).rowcount
+            deleted += conn.execute("DELETE FROM best WHERE client = ?", (client,)).rowcount
+            conn.execute("DELETE FROM sync_cursor WHERE client = ?", (client,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return deleted
+
+    # ---------- baca ----------
+    def best(self, client: str):
+        row = self._conn().execute("SELECT accuracy FROM best WHERE client = ?", (client,)).fetchone()
+        return row[0] if row else None
+
+    def history_tail(self, client: str, limit: int = 20) -> list:
+        """N baris terakhir (urutan masuk) via idx (client, id) → biaya tidak tumbuh dengan panjang riwayat."""
+        rows = self._conn().execute(
+            "SELECT raw FROM history WHERE client = ? ORDER BY id DESC LIMIT ?", (client, limit)
+        ).fetchall()
+        return [r[0] for r in reversed(rows)]
+
+    def cursor(self, client: str) -> dict:
+        """Entry history client terbaru yang sudah tersimpan: {"round", "ts"} (None jika belum ada)."""
+        row = self._conn().execute("SELECT round, ts FROM sync_cursor WHERE client = ?", (client,)).fetchone()
+        if row is None:
+            return {"round": None, "ts": None}
+        return {"round": row[0], "ts": row[1]}
+
+    # ---------- migrasi ----------
+    def import_legacy_logs(self, logs_dir: Path):
+        """
+        Pindahkan <client>_accuracy_history.txt / <client>_best_accuracy.txt lama
+        ke database sekali saja; file lama di-rename menjadi *.migrated.
+        """
+        logs_dir = Path(logs_dir)
+        with file_lock(logs_dir / ".migrate.lock"):  # worker gunicorn lain bisa start bersamaan
+            self._import_legacy_logs(logs_dir)
+
+    def _import_legacy_logs(self, logs_dir: Path):
+        clients = {p.name[:-len("_accuracy_history.txt")] for p in logs_dir.glob("*_accuracy_history.txt")}
+        clients |= {p.name[:-len("_best_accuracy.txt")] for p in logs_dir.glob("*_best_accuracy.txt")}
+        for client in sorted(clients):
+            history_path = logs_dir / f"{client}_accuracy_history.txt"
+            best_path = logs_dir / f"{client}_best_accuracy.txt"
+            try:
+                if history_path.exists():
+                    lines = history_path.read_text(encoding="utf-8").splitlines()
+                    self.record(client, lines, source="legacy")
+                if best_path.exists():
+                    txt = best_path.read_text(encoding="utf-8").strip()
+                    if txt:
+                        self.set_best(client, float(txt))
+                for p in (history_path, best_path):
+                    if p.exists():
+                        p.rename(p.with_name(p.name + ".migrated"))
+                print(f"📊 Log akurasi {client} dipindah ke {self.path}")
+            except Exception as e:
+                print(f"⚠️ Gagal migrasi log {client}: {e}")
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 📦 MODEL STORE — penyimpanan bobot client berbasis hash (content-addressed)
+#
+#   <root>/objects/ab/abcdef....npz   → blob immutable, nama = SHA-256 byte file
+#   <root>/index/<CLIENT>.json        → daftar versi per client (round, ts, hash)
+#
+# Upload identik tidak ditulis ulang (dedupe), dan agregasi membaca snapshot
+# hash yang tidak bisa berubah di tengah jalan.
+# ==========================================================
+import os
+import json
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev lokal) → lock antar-proses tidak tersedia
+    fcntl = None
+
+MAX_VERSIONS_PER_CLIENT = 50
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+# ==========================================================
+# UTIL: lock & tulis atomik
+# ==========================================================
+@contextmanager
+def file_lock(lock_path: Path):
+    """Lock eksklusif antar-proses (gunicorn workers) via flock."""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+def write_json_atomic(path: Path, obj):
+    """Tulis JSON ke file sementara lalu rename → pembaca tidak pernah melihat file setengah jadi."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(obj, f, indent=2)
+        os.replace(tmp_name, path)
+    except Exception:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+def sha256_file(path: Path) -> str:
+    """SHA-256 byte file, dibaca per 1 MB."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# ==========================================================
+# MODEL STORE
+# ==========================================================
+class ModelStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_dir = self.root / "index"
+        self.lock_path = self.root / ".lock"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+    # ---------- objects ----------
+    def object_path(self, digest: str) -> Path:
+        # fan-out 2 karakter pertama agar satu folder tidak berisi ribuan file
+        return self.objects_dir / digest[:2] / f"{digest}.npz"
+
+    def put_file(self, src: Path, digest: str) -> tuple:
+        """
+        Pindahkan file upload ke objects/. Jika hash sudah ada, file upload
+        dibuang (dedupe) dan tidak ada byte yang ditulis. Return (path, created).
+        Object tanpa versi di index bisa di-GC; untuk upload client pakai store_version().
+        """
+        with file_lock(self.lock_path):
+            return self._put_file_locked(src, digest)
+
+    def _put_file_locked(self, src: Path, digest: str) -> tuple:
+        dest = self.object_path(digest)
+        if dest.exists():
+            Path(src).unlink(missing_ok=True)
+            return dest, False
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src, dest)
+        return dest, True
+
+    # ---------- index per client ----------
+    def _index_path(self, client: str) -> Path:
+        return self.index_dir / f"{client}.json"
+
+    def versions(self, client: str) -> list:
+        path = self._index_path(client)
+        if not path.exists():
+            return []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("versions", [])
+        except Exception:
+            return []
+
+    def latest(self, client: str):
+        versions = self.versions(client)
+        return versions[-1] if versions else None
+
+    def clients(self) -> list:
+        return sorted(p.stem for p in self.index_dir.glob("*.json"))
+
+    def add_version(self, client: str, digest: str, size: int, round_num=None, extra=None) -> dict:
+        """
+        Catat versi baru untuk client. Jika hash sama dengan versi terakhir, tidak ada
+        versi baru: metadata `extra` yang berbeda (mis. num_examples / base_version yang
+        dikoreksi) digabung ke entry terakhir, selain itu entry lama dikembalikan apa adanya.
+        """
+        with file_lock(self.lock_path):
+            return self._add_version_locked(client, digest, size, round_num, extra)
+
+    def store_version(self, client: str, src: Path, digest: str, size: int, round_num=None, extra=None) -> tuple:
+        """
+        put_file + add_version di bawah satu lock store → _gc dari client lain tidak bisa
+        menghapus object (dedupe atau baru) sebelum index client ini menunjuknya.
+        Return (entry, path object, created).
+        """
+        with file_lock(self.lock_path):
+            path, created = self._put_file_locked(src, digest)
+            entry = self._add_version_locked(client, digest, size, round_num, extra)
+        return entry, path, created
+
+    def _add_version_locked(self, client: str, digest: str, size: int, round_num=None, extra=None) -> dict:
+        versions = self.versions(client)
+        if versions and versions[-1]["sha256"] == digest:
+            last = versions[-1]
+            changed = {k: v for k, v in (extra or {}).items() if last.get(k) != v}
+            if changed:
+                last.update(changed)
+                last["updated"] = datetime.utcnow().isoformat() + "Z"
+                write_json_atomic(self._index_path(client), {"client": client, "versions": versions})
+            entry = dict(last)
+            entry["deduplicated"] = True
+            if changed:
+                entry["updated_fields"] = sorted(changed)
+            return entry
+
+        if round_num is None:
+            round_num = (versions[-1].get("round", len(versions)) + 1) if versions else 1
+        entry = {
+            "round": int(round_num),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "sha256": digest,
+            "size": int(size),
+        }
+        if extra:
+            entry.update(extra)
+        versions.append(entry)
+
+        dropped = versions[:-MAX_VERSIONS_PER_CLIENT]
+        versions = versions[-MAX_VERSIONS_PER_CLIENT:]
+        write_json_atomic(self._index_path(client), {"client": client, "versions": versions})
+        if dropped:
+            self._gc({v["sha256"] for v in dropped})
+        return entry
+
+    def snapshot(self) -> dict:
+        """
+        {client: entry versi terakhir}. Object yang ditunjuk immutable,
+        jadi upload baru selama agregasi tidak mengubah input agregasi.
+        """
+        snap = {}
+        for client in self.clients():
+            entry = self.latest(client)
+            if entry is not None:
+                snap[client] = entry
+        return snap
+
+    def remove_client(self, client: str) -> bool:
+        with file_lock(self.lock_path):
+            path = self._index_path(client)
+            if not path.exists():
+                return False
+            digests = {v["sha256"] for v in self.versions(client)}
+            path.unlink()
+            self._gc(digests)
+        return True
+
+    def _gc(self, candidates: set):
+        """Hapus object yang sudah tidak direferensikan index client mana pun."""
+        if not candidates:
+            return
+        referenced = set()
+        for client in self.clients():
+            referenced.update(v["sha256"] for v in self.versions(client))
+        for digest in candidates - referenced:
+            self.object_path(digest).unlink(missing_ok=True)
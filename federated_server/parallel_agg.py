@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🧵 PARALLEL AGG — agregasi & decode NPZ di process pool (multi-core)
+#
+#   PARALLEL_AGG.aggregator(name)  → callable dengan signature sama seperti
+#                                    aggregators.AGGREGATORS[name], tetapi ruang
+#                                    parameter dipecah per shard kolom dan setiap
+#                                    shard direduksi di proses worker
+#   PARALLEL_AGG.load_npz_many(...) → decode banyak NPZ client paralel, langsung
+#                                    ke baris matriks di shared memory
+#
+# Tensor client tidak pernah di-pickle ke worker. Worker hanya menerima
+# nama blok shared memory atau path .npy yang di-mmap (page cache dipakai
+# bersama semua proses). Hasil shard ditulis langsung ke output di shared memory.
+# Krum: tiap worker menghitung Gram parsial X·Xᵀ untuk shard-nya (n×n, kecil), lalu dijumlah.
+#
+# Modul ini sengaja hanya mengimpor numpy + modul agregasi (tanpa TensorFlow/
+# Flask) karena di-import ulang oleh setiap proses worker (start method spawn).
+# Fungsi worker (_reduce_shard, _gram_shard, _load_npz_row) di-import dari
+# modul ini lewat nama, jadi __main__ tidak perlu diubah. Spawn tetap meng-import
+# ulang script peluncur sebagai __mp_main__: di gunicorn itu hanya launcher-nya,
+# di `python app.py` itu app.py (TensorFlow dimuat sekali per worker saat pool start).
+#
+#   AGG_WORKERS (env) → jumlah proses worker per proses server (1 = serial).
+#                       Default: 1 di gunicorn (tiap worker gunicorn akan punya pool
+#                       sendiri), jumlah CPU jika dijalankan langsung.
+# ==========================================================
+import os
+import sys
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from aggregators import AGGREGATORS, distances_from_gram, gram_matrix, krum_select, trim_count
+from flat_params import FlatLayout
+from weights_format import load_npz_flat
+
+
+def _default_workers() -> int:
+    # gunicorn sudah multi-proses → pool cpu_count() per worker gunicorn = oversubscription
+    if "gunicorn" in sys.modules or "gunicorn" in os.path.basename(sys.argv[0] if sys.argv else ""):
+        return 1
+    return os.cpu_count() or 1
+
+
+AGG_WORKERS = int(os.environ.get("AGG_WORKERS") or _default_workers())
+SPAWN = mp.get_context("spawn")  # tanpa fork: aman untuk proses induk yang punya thread (queue, Flask)
+
+# di bawah ini pool tidak sepadan dengan overhead kirim task (dihitung n_client × parameter)
+PARALLEL_MIN_ELEMENTS = 1024 * 1024
+PARALLEL_MIN_FILES = 8          # decode NPZ paralel mulai dari jumlah file ini
+SHARDS_PER_WORKER = 4           # shard lebih kecil dari 1/workers → beban lebih rata
+SHARD_ALIGN = 1024              # batas shard kelipatan 1024 elemen (4 KB float32)
+
+
+# ==========================================================
+# SHARED MEMORY
+# ==========================================================
+class SharedMatrix:
+    """Matriks float32 [rows, cols] di multiprocessing.shared_memory (dibuat & di-unlink oleh proses induk)."""
+
+    def __init__(self, rows: int, cols: int):
+        self.shape = (rows, cols)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, rows * cols * 4))
+        self.array = np.ndarray(self.shape, dtype=np.float32, buffer=self.shm.buf)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(name: str, shape: tuple):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+
+
+# ==========================================================
+# WORKER (dijalankan di proses pool)
+# ==========================================================
+def _open_source(source: tuple) -> tuple:
+    """
+    Sumber kontribusi client di worker → (handle shared memory, list vektor flat float32):
+      ("shm", name, (rows, cols), row_indices)   baris SharedMatrix
+      ("files", [(path, offset), ...], cols)     .npy yang di-mmap
+    """
+    if source[0] == "shm":
+        _, name, shape, rows = source
+        shm, matrix = _attach(name, shape)
+        return [shm], [matrix[i] for i in rows]
+    _, files, cols = source
+    return [], [np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(cols,)) for path, offset in files]
+
+
+def _close(handles: list):
+    for shm in handles:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # view masih dipegang traceback error; mapping dilepas saat GC
+
+
+def _reduce_shard(rule: str, source: tuple, weights, start: int, stop: int, out_name: str, size: int, params: dict):
+    """Jalankan aturan `rule` pada kolom [start, stop) lalu tulis hasilnya ke output shared memory."""
+    handles, contribs = _open_source(source)
+    try:
+        result, _ = AGGREGATORS[rule]([c[start:stop] for c in contribs], weights,
+                                      FlatLayout([(stop - start,)]), **params)
+        del contribs
+        out_shm, out = _attach(out_name, (1, size))
+        handles.append(out_shm)
+        out[0, start:stop] = result
+        del out
+    finally:
+        _close(handles)
+
+
+def _gram_shard(source: tuple, start: int, stop: int) -> np.ndarray:
+    handles, contribs = _open_source(source)
+    try:
+        gram = gram_matrix([c[start:stop] for c in contribs], FlatLayout([(stop - start,)]))
+        del contribs
+        return gram
+    finally:
+        _close(handles)
+
+
+def _load_npz_row(name: str, shape: tuple, row: int, path: str, order, shapes: list):
+    shm, matrix = _attach(name, shape)
+    try:
+        load_npz_flat(path, FlatLayout(shapes), order, out=matrix[row])
+        del matrix
+    finally:
+        _close([shm])
+
+
+def _ping():
+    return os.getpid()
+
+
+# ==========================================================
+# ENGINE (proses induk)
+# ==========================================================
+def shard_ranges(size: int, n_shards: int):
+    width = -(-size // max(1, n_shards))
+    width = max(SHARD_ALIGN, -(-width // SHARD_ALIGN) * SHARD_ALIGN)
+    return [(start, min(start + width, size)) for start in range(0, size, width)]
+
+
+class ParallelAggregator:
+    def __init__(self, workers: int = AGG_WORKERS, min_elements: int = PARALLEL_MIN_ELEMENTS,
+                 min_files: int = PARALLEL_MIN_FILES):
+        self.workers = max(1, int(workers))
+        self.min_elements = min_elements
+        self.min_files = min_files
+        self._executor = None
+        self._lock = threading.Lock()
+
+    # ---------- pool ----------
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._start_pool()
+            return self._executor
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=SPAWN)
+        executor.submit(_ping).result()
+        print(f"🧵 Pool agregasi siap: {self.workers} proses")
+        return executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def enabled(self, n_clients: int, size: int) -> bool:
+        return self.workers > 1 and n_clients * size >= self.min_elements
+
+    # ---------- sumber data ----------
+    @staticmethod
+    def _source(contribs: list, size: int, shared: SharedMatrix = None) -> tuple:
+        """Deskripsi sumber untuk worker: path+offset untuk memmap, nama shared memory untuk SharedMatrix."""
+        if shared is not None:
+            return ("shm", shared.name, shared.shape, list(range(len(contribs))))
+        return ("files", [(c.filename, c.offset) for c in contribs], size)
+
+    @staticmethod
+    def _subset(source: tuple, indices) -> tuple:
+        if source[0] == "shm":
+            return ("shm", source[1], source[2], [source[3][i] for i in indices])
+        return ("files", [source[1][i] for i in indices], source[2])
+
+    @contextmanager
+    def _as_source(self, contribs: list, size: int):
+        # .npy yang di-mmap cukup dikirim path-nya; array lain disalin sekali ke shared memory
+        if all(isinstance(c, np.memmap) and c.filename for c in contribs):
+            yield self._source(contribs, size)
+            return
+        with SharedMatrix(len(contribs), size) as shared:
+            for i, c in enumerate(contribs):
+                shared.array[i] = c
+            yield self._source(contribs, size, shared)
+
+    # ---------- reduksi ----------
+    def _reduce(self, rule: str, source: tuple, weights, size: int, params: dict) -> np.ndarray:
+        pool = self._pool()
+        with SharedMatrix(1, size) as out:
+            futures = [
+                pool.submit(_reduce_shard, rule, source, weights, start, stop, out.name, size, params)
+                for start, stop in shard_ranges(size, self.workers * SHARDS_PER_WORKER)
+            ]
+            for future in futures:
+                future.result()
+            return out.array[0].copy()
+
+    def _gram(self, source: tuple, size: int) -> np.ndarray:
+        pool = self._pool()
+        futures = [
+            pool.submit(_gram_shard, source, start, stop)
+            for start, stop in shard_ranges(size, self.workers * SHARDS_PER_WORKER)
+        ]
+        return sum(future.result() for future in futures)
+
+    def aggregator(self, rule: str):
+        """Callable (contribs, weights, flat_layout, **params) → (vektor float32, info), seperti AGGREGATORS[rule]."""
+        serial = AGGREGATORS[rule]
+
+        def run(contribs, weights, flat_layout, **params):
+            size = flat_layout.size
+            if not self.enabled(len(contribs), size):
+                return serial(contribs, weights, flat_layout, **params)
+            weights = np.asarray(weights, dtype=np.float64)
+            info = {}
+            if rule == "trimmed_mean":
+                trim = float(params.get("trim", 0.1))
+                info = {"trim": trim, "trimmed_per_side": trim_count(len(contribs), trim)}
+            with self._as_source(contribs, size) as source:
+                if rule in ("krum", "multi_krum"):
+                    m = 1 if rule == "krum" else params.get("m")
+                    selected, info = krum_select(distances_from_gram(self._gram(source, size)), params.get("f"), m)
+                    out = self._reduce("mean", self._subset(source, selected), weights[selected], size, {})
+                else:
+                    out = self._reduce(rule, source, weights, size, params)
+            info["workers"] = self.workers
+            return out, info
+
+        return run
+
+    # ---------- decode NPZ ----------
+    @contextmanager
+    def load_npz_many(self, items: list, flat_layout: FlatLayout):
+        """
+        items = [(key, path, tensor_order), ...] → yield {key: vektor float32}.
+        Paralel: setiap worker men-decode satu file langsung ke barisnya di
+        shared memory. Vektor hanya valid di dalam blok `with`. File yang gagal
+        di-decode tidak ada di dict (pemanggil men-decode ulang & menangani errornya).
+        """
+        if self.workers <= 1 or len(items) < self.min_files:
+            loaded = {}
+            for key, path, order in items:
+                try:
+                    loaded[key] = load_npz_flat(path, flat_layout, order)
+                except Exception:
+                    pass
+            yield loaded
+            return
+        pool = self._pool()
+        with SharedMatrix(len(items), flat_layout.size) as shared:
+            futures = [
+                pool.submit(_load_npz_row, shared.name, shared.shape, row, str(path), order, flat_layout.to_json())
+                for row, (_, path, order) in enumerate(items)
+            ]
+            failed = set()
+            for row, future in enumerate(futures):
+                try:
+                    future.result()
+                except Exception:
+                    failed.add(row)
+            loaded = {key: shared.array[row] for row, (key, _, _) in enumerate(items) if row not in failed}
+            try:
+                yield loaded
+            finally:
+                loaded.clear()  # lepas view sebelum shared memory ditutup
+
+
+PARALLEL_AGG = ParallelAggregator()
+atexit.register(PARALLEL_AGG.shutdown)
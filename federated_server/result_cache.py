@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🗃️ RESULT CACHE — laporan agregasi per fingerprint input
+#
+#   <root>/<fingerprint>.json → {"fingerprint", "created", "hits", "result"}
+#
+# Fingerprint = hash snapshot model client + layout + partial region +
+# parameter agregasi (lihat aggregate_fingerprint di app.py). Input sama →
+# global model sama, jadi /aggregate cukup mengembalikan laporan & NPZ global
+# yang sudah ada tanpa membaca tensor. Hanya MAX_ENTRIES entry terbaru disimpan.
+# ==========================================================
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from model_store import file_lock, write_json_atomic
+
+MAX_ENTRIES = int(os.environ.get("AGGREGATE_CACHE_ENTRIES", "64"))
+
+
+class ResultCache:
+    def __init__(self, root: Path, max_entries: int = MAX_ENTRIES):
+        self.root = Path(root)
+        self.lock_path = self.root / ".lock"
+        self.max_entries = max_entries
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, fingerprint: str) -> Path:
+        return self.root / f"{fingerprint}.json"
+
+    def get(self, fingerprint: str):
+        """Entry cache atau None (tidak ada / file rusak)."""
+        path = self._path(fingerprint)
+        if self.max_entries <= 0 or not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def touch(self, fingerprint: str):
+        """Catat hit (dipakai untuk urutan LRU saat prune)."""
+        with file_lock(self.lock_path):
+            entry = self.get(fingerprint)
+            if entry is not None:
+                entry["hits"] = entry.get("hits", 0) + 1
+                write_json_atomic(self._path(fingerprint), entry)
+
+    def put(self, fingerprint: str, result: dict):
+        if self.max_entries <= 0:
+            return
+        with file_lock(self.lock_path):
+            write_json_atomic(self._path(fingerprint), {
+                "fingerprint": fingerprint,
+                "created": datetime.utcnow().isoformat() + "Z",
+                "hits": 0,
+                "result": result,
+            })
+            self._prune()
+
+    def invalidate(self, fingerprint: str):
+        with file_lock(self.lock_path):
+            self._path(fingerprint).unlink(missing_ok=True)
+
+    def _prune(self):
+        entries = sorted(self.root.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# ==========================================================
+# ➕ RUNNING FEDAVG — jumlah bobot berjalan, di-update saat ingestion
+#
+#   <root>/state.json            → {"layout", "shapes" (FlatLayout), "weighting", "total_weight", "generation",
+#                                   "clients": {CLIENT: {"sha256", "num_examples", "weight", "mean"}}}
+#   <root>/sum.<generation>.npy  → float64, Σ weight_i · w_i (semua tensor di-flatten, urutan layout)
+#   <root>/contrib/<CLIENT>.npy  → float32, bobot flat versi client yang sedang dihitung
+#
+# Upload baru: sum += weight · w_baru (dan -= weight_lama · w_lama jika client upload ulang).
+# /aggregate cukup sum / total_weight → biaya tidak bergantung jumlah client.
+# Semantik sama dengan agregasi lama: versi terakhir tiap client.
+#
+# weighting:
+#   "examples" → weight_i = num_examples_i (FedAvg asli, dipakai jika SEMUA client melapor)
+#   "uniform"  → weight_i = 1 (rata-rata biasa, jika ada client tanpa num_examples)
+# Saat skema berganti, sum dibangun ulang dari contrib/*.npy (blok demi blok).
+#
+# Mode out-of-core: rata-rata dihitung ulang dari contrib/*.npy yang di-mmap,
+# satu tensor (atau blok OUT_OF_CORE_BLOCK elemen) sekaligus → memori puncak
+# = satu blok + buffer output, berapa pun jumlah client. Sum hasilnya ditulis
+# ulang sebagai generasi baru (membuang akumulasi error pembulatan).
+#
+# Satu round /aggregate memakai locked(): sync + average/aggregate/score
+# berjalan di bawah satu lock, jadi ingestion / delete tidak bisa mengubah
+# sum di antara keduanya (input agregasi = snapshot yang di-sync).
+# ==========================================================
+import os
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from flat_params import FlatLayout
+from model_store import file_lock, write_json_atomic
+
+OUT_OF_CORE_BLOCK = 4 * 1024 * 1024  # elemen per blok (32 MB akumulator float64)
+
+
+def save_npy_atomic(path: Path, arr: np.ndarray):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(suffix=".npy.tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp_name, path)
+    except Exception:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class RunningFedAvg:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.contrib_dir = self.root / "contrib"
+        self.state_path = self.root / "state.json"
+        self.lock_path = self.root / ".lock"
+        self.contrib_dir.mkdir(parents=True, exist_ok=True)
+        self._held = threading.local()  # thread ini sedang memegang lock (di dalam locked())
+
+    @contextmanager
+    def locked(self):
+        """
+        Lock running sum antar-proses; method lain yang dipanggil di dalam blok ini
+        (di thread yang sama) tidak mengunci ulang.
+        """
+        if getattr(self._held, "active", False):
+            yield
+            return
+        with file_lock(self.lock_path):
+            self._held.active = True
+            try:
+                yield
+            finally:
+                self._held.active = False
+
+    # ---------- state di disk ----------
+    def _sum_path(self, generation: int) -> Path:
+        return self.root / f"sum.{generation}.npy"
+
+    def _contrib_path(self, client: str) -> Path:
+        return self.contrib_dir / f"{client}.npy"
+
+    def _empty(self, layout_sha: str) -> tuple:
+        return {"layout": layout_sha, "shapes": None, "weighting": "examples", "total_weight": 0.0,
+                "generation": 0, "clients": {}}, None
+
+    def _load_state(self):
+        if not self.state_path.exists():
+            return None
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load(self) -> tuple:
+        state = self._load_state()
+        if state is None:
+            return None, None
+        total = None
+        if state.get("shapes") is not None:
+            total = np.load(self._sum_path(state["generation"]))
+        return state, total
+
+    def _save(self, state: dict, total):
+        """sum ditulis ke file generasi baru dulu, baru state.json menunjuknya → crash tidak merusak state lama."""
+        old_generation = state.get("generation", 0)
+        state["generation"] = old_generation + 1
+        state["updated"] = datetime.utcnow().isoformat() + "Z"
+        if total is not None:
+            save_npy_atomic(self._sum_path(state["generation"]), total)
+        write_json_atomic(self.state_path, state)
+        self._sum_path(old_generation).unlink(missing_ok=True)
+
+    def _reset(self, layout_sha: str) -> tuple:
+        for p in self.contrib_dir.glob("*.npy"):
+            p.unlink(missing_ok=True)
+        return self._empty(layout_sha)
+
+    # ---------- bobot per client ----------
+    @staticmethod
+    def _weighting_for(clients: dict) -> str:
+        """"examples" hanya jika semua client melaporkan num_examples."""
+        if all(info.get("num_examples") for info in clients.values()):
+            return "examples"
+        return "uniform"
+
+    @staticmethod
+    def _weight(num_examples, weighting: str) -> float:
+        return float(num_examples) if weighting == "examples" else 1.0
+
+    def _weighted_sum(self, clients: list, flat_layout: FlatLayout, total: np.ndarray, out: np.ndarray = None):
+        """
+        total[:] = Σ weight_i · contrib_i dari contrib/*.npy yang di-mmap, satu tensor
+        (atau blok OUT_OF_CORE_BLOCK elemen) sekaligus. Jika `out` diberikan,
+        rata-rata float32 (total / Σ weight) ikut ditulis ke sana.
+        """
+        total_weight = sum(info["weight"] for _, info in clients)
+        contribs = [np.load(self._contrib_path(client), mmap_mode="r") for client, _ in clients]
+        for index in range(len(flat_layout)):
+            offset, end = flat_layout.offsets[index], flat_layout.offsets[index + 1]
+            # tensor besar dipecah per blok agar akumulator tetap kecil
+            for start in range(offset, end, OUT_OF_CORE_BLOCK):
+                stop = min(start + OUT_OF_CORE_BLOCK, end)
+                acc = np.zeros(stop - start, dtype=np.float64)
+                for (_, info), contrib in zip(clients, contribs):
+                    if info["weight"] == 1.0:
+                        acc += contrib[start:stop]
+                    else:
+                        acc += info["weight"] * contrib[start:stop].astype(np.float64)
+                total[start:stop] = acc
+                if out is not None:
+                    np.divide(acc, total_weight, out=acc)
+                    out[start:stop] = acc
+        del contribs
+        return total_weight
+
+    def _reweight_locked(self, state: dict, weighting: str):
+        """Ganti skema bobot semua client lalu bangun ulang sum dari kontribusi di disk."""
+        state["weighting"] = weighting
+        for info in state["clients"].values():
+            info["weight"] = self._weight(info.get("num_examples"), weighting)
+        flat_layout = FlatLayout(state["shapes"])
+        total = np.zeros(flat_layout.size, dtype=np.float64)
+        state["total_weight"] = self._weighted_sum(list(state["clients"].items()), flat_layout, total)
+        print(f"➕ Running sum FedAvg dibangun ulang dengan weighting={weighting}")
+        return total
+
+    # ---------- operasi (dipanggil di bawah lock) ----------
+    def _remove_locked(self, state: dict, total, client: str, rebalance: bool = True):
+        old = state["clients"].pop(client, None)
+        if old is None:
+            return total
+        contrib_path = self._contrib_path(client)
+        total -= old["weight"] * np.load(contrib_path).astype(np.float64)
+        state["total_weight"] -= old["weight"]
+        contrib_path.unlink(missing_ok=True)
+        if not state["clients"]:
+            # tidak ada client tersisa → buang sisa pembulatan
+            state["total_weight"] = 0.0
+            total[:] = 0.0
+        elif rebalance:
+            # client tanpa num_examples keluar → sisanya mungkin bisa kembali ke "examples"
+            weighting = self._weighting_for(state["clients"])
+            if weighting != state.get("weighting", "uniform"):
+                total = self._reweight_locked(state, weighting)
+        return total
+
+    def _add_locked(self, state: dict, total, client: str, digest: str, flat: np.ndarray,
+                    flat_layout: FlatLayout, num_examples=None):
+        if state["shapes"] is None:
+            state["shapes"] = flat_layout.to_json()
+            total = np.zeros(flat_layout.size, dtype=np.float64)
+        elif FlatLayout(state["shapes"]) != flat_layout:
+            raise ValueError(f"shape bobot {client} tidak sama dengan running sum")
+
+        total = self._remove_locked(state, total, client, rebalance=False)
+        save_npy_atomic(self._contrib_path(client), flat)
+        info = {"sha256": digest, "num_examples": num_examples, "weight": 1.0, "mean": float(flat.mean())}
+        state["clients"][client] = info
+
+        weighting = self._weighting_for(state["clients"])
+        if weighting != state.get("weighting", "uniform") and len(state["clients"]) > 1:
+            # satu client tanpa num_examples (atau client terakhir yang kurang akhirnya
+            # melapor) → semua bobot berubah, sum dihitung ulang dari contrib
+            return self._reweight_locked(state, weighting)
+        state["weighting"] = weighting
+        info["weight"] = self._weight(num_examples, weighting)
+        total += info["weight"] * flat.astype(np.float64)
+        state["total_weight"] += info["weight"]
+        return total
+
+    def _current(self, layout_sha: str) -> tuple:
+        state, total = self._load()
+        if state is None or state["layout"] != layout_sha:
+            # layout berganti → kontribusi lama tidak bisa dijumlah dengan yang baru
+            return self._reset(layout_sha)
+        return state, total
+
+    # ---------- API ----------
+    def update(self, client: str, digest: str, flat: np.ndarray, flat_layout: FlatLayout,
+               layout_sha: str, num_examples: int = None) -> bool:
+        """
+        Tambah/ganti kontribusi client (`flat` = vektor float32 sesuai flat_layout,
+        `num_examples` = jumlah data training yang dilaporkan client, None jika tidak ada).
+        Return False jika versi yang sama sudah dihitung.
+        """
+        with self.locked():
+            state, total = self._current(layout_sha)
+            current = state["clients"].get(client)
+            if current and current["sha256"] == digest and current.get("num_examples") == num_examples:
+                return False
+            total = self._add_locked(state, total, client, digest, flat, flat_layout, num_examples)
+            self._save(state, total)
+        return True
+
+    def remove(self, client: str) -> bool:
+        with self.locked():
+            state, total = self._load()
+            if state is None or client not in state["clients"]:
+                return False
+            total = self._remove_locked(state, total, client)
+            self._save(state, total)
+        return True
+
+    def stale(self, snapshot: dict, layout_sha: str) -> list:
+        """Client di snapshot yang versinya belum ada di running sum (akan di-load oleh sync)."""
+        state = self._load_state()
+        if state is None or state["layout"] != layout_sha:
+            return list(snapshot)
+        return [
+            client for client, entry in snapshot.items()
+            if (state["clients"].get(client) or {}).get("sha256") != entry["sha256"]
+            or state["clients"][client].get("num_examples") != entry.get("num_examples")
+        ]
+
+    def sync(self, snapshot: dict, layout_sha: str, flat_layout: FlatLayout, loader) -> dict:
+        """
+        Samakan running sum dengan snapshot store {client: entry}. Normalnya no-op
+        (sudah di-update saat ingestion); hanya client yang beda yang di-load
+        lewat loader(client, entry) → vektor float32 sesuai flat_layout.
+        num_examples diambil dari entry store (dicatat saat upload).
+        Client yang gagal di-decode keluar dari sum dan dicatat di changes["skipped"] {client: error}.
+        """
+        changes = {"added": [], "replaced": [], "removed": [], "skipped": {}}
+        with self.locked():
+            state, total = self._current(layout_sha)
+            for client in [c for c in state["clients"] if c not in snapshot]:
+                total = self._remove_locked(state, total, client)
+                changes["removed"].append(client)
+            for client, entry in snapshot.items():
+                current = state["clients"].get(client)
+                num_examples = entry.get("num_examples")
+                if current and current["sha256"] == entry["sha256"] and current.get("num_examples") == num_examples:
+                    continue
+                try:
+                    flat = loader(client, entry)
+                except Exception as e:
+                    # versi terbaru rusak → client dilewati round ini (versi lamanya juga tidak dihitung)
+                    if current:
+                        total = self._remove_locked(state, total, client)
+                        changes["removed"].append(client)
+                    changes["skipped"][client] = str(e)
+                    continue
+                total = self._add_locked(state, total, client, entry["sha256"], flat, flat_layout, num_examples)
+                changes["replaced" if current else "added"].append(client)
+            if changes["added"] or changes["replaced"] or changes["removed"]:
+                self._save(state, total)
+        return changes
+
+    def out_of_core_average(self) -> tuple:
+        """
+        Seperti average() (vektor flat + state), tetapi dihitung dari kontribusi
+        client yang di-mmap, blok demi blok, ke satu buffer output yang
+        dialokasikan sekali.
+        Sum hasil hitung ulang disimpan sebagai generasi baru.
+        """
+        with self.locked():
+            state = self._load_state()
+            if state is None or not state["clients"] or state["total_weight"] <= 0:
+                return None, state
+
+            clients = list(state["clients"].items())
+            flat_layout = FlatLayout(state["shapes"])
+
+            generation = state["generation"] + 1
+            tmp_sum_path = self.root / f"sum.{generation}.npy.tmp"
+            total = np.lib.format.open_memmap(tmp_sum_path, mode="w+", dtype=np.float64, shape=(flat_layout.size,))
+            out = flat_layout.empty()
+            total_weight = self._weighted_sum(clients, flat_layout, total, out)
+
+            total.flush()
+            del total
+            os.replace(tmp_sum_path, self._sum_path(generation))
+            old_generation = state["generation"]
+            state["generation"] = generation
+            state["total_weight"] = total_weight
+            state["updated"] = datetime.utcnow().isoformat() + "Z"
+            write_json_atomic(self.state_path, state)
+            self._sum_path(old_generation).unlink(missing_ok=True)
+
+        return out, state
+
+    def aggregate_with(self, aggregator, **params) -> tuple:
+        """
+        Jalankan aturan agregasi lain (aggregators.py) atas kontribusi client
+        yang di-mmap. Return (vektor float32, state, info aturan).
+        Running sum tidak diubah.
+        """
+        with self.locked():
+            state = self._load_state()
+            if state is None or not state["clients"]:
+                return None, state, {}
+            clients = list(state["clients"].items())
+            contribs = [np.load(self._contrib_path(client), mmap_mode="r") for client, _ in clients]
+            weights = np.array([info["weight"] for _, info in clients], dtype=np.float64)
+            out, info = aggregator(contribs, weights, FlatLayout(state["shapes"]), **params)
+            del contribs
+        if "selected" in info:
+            info["selected"] = [clients[i][0] for i in info["selected"]]
+        if "scores" in info:
+            info["scores"] = {client: score for (client, _), score in zip(clients, info["scores"])}
+        return out, state, info
+
+    def score_with(self, scorer, **params):
+        """
+        scorer(total float64, total_weight, [(client, weight)], contribs mmap, **params) atas
+        running sum & kontribusi yang sedang dihitung (mis. leave-one-out). None jika kosong.
+        """
+        with self.locked():
+            state, total = self._load()
+            if state is None or not state["clients"] or state["total_weight"] <= 0:
+                return None
+            clients = [(client, info["weight"]) for client, info in state["clients"].items()]
+            contribs = [np.load(self._contrib_path(client), mmap_mode="r") for client, _ in clients]
+            try:
+                return scorer(total, state["total_weight"], clients, contribs, **params)
+            finally:
+                del contribs
+
+    def partial(self) -> tuple:
+        """(salinan sum float64, state) → partial aggregate yang diteruskan regional ke root."""
+        with self.locked():
+            state, total = self._load()
+        if state is None or not state["clients"] or state["total_weight"] <= 0:
+            return None, state
+        return total, state
+
+    def average(self) -> tuple:
+        """(vektor rata-rata float32, state); tensor per layer = FlatLayout(state["shapes"]).views(...)."""
+        with self.locked():
+            state, total = self._load()
+        if state is None or not state["clients"] or state["total_weight"] <= 0:
+            return None, state
+        return (total / state["total_weight"]).astype(np.float32), state
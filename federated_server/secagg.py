@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🔐 SECAGG — secure aggregation dengan pairwise mask (Bonawitz et al. 2017)
+#
+# Server hanya melihat jumlah bobot semua bank, tidak pernah bobot satu bank.
+# Setiap bank i mengirim (di ring uint64, semua operasi mod 2^64):
+#   y_i = encode(n_i · w_i) + PRG(b_i) + Σ_{j>i} PRG(s_ij) − Σ_{j<i} PRG(s_ij)
+#   s_ij = seed bersama dari Diffie-Hellman (RFC 3526 grup 14, 2048-bit)
+#   b_i  = seed self-mask acak milik bank i
+#   PRG  = numpy Philox (counter-based): satu panggilan random_raw(size) per peer
+# Mask pairwise saling menghapus di Σ y_i; self-mask dihapus server setelah
+# b_i direkonstruksi dari share Shamir (t-of-n) para survivor.
+#
+# Dropout: bank yang sudah membagi share tetapi tidak mengirim y_d → mask
+# pairwise-nya dengan survivor tidak terhapus. Survivor mengirim share s_sk_d
+# (kunci DH mask milik d), server merekonstruksi s_sk_d lalu menghitung ulang
+# dan membuang mask (d, i) dari jumlah. Untuk satu bank, server hanya pernah
+# mendapat b_i ATAU s_sk_i, tidak pernah keduanya.
+#
+# Fase satu round: keys → shares → masked → unmask → done
+#   keys    : bank kirim c_pk (kanal enkripsi share) & s_pk (seed mask)
+#   shares  : bank kirim share Shamir b_i & s_sk_i, dienkripsi per peer (HMAC-SHA256 stream + tag)
+#   masked  : bank ambil share untuknya, kirim y_i (.npy uint64) + num_examples
+#   unmask  : survivor kirim share b_j (j survivor) & s_sk_d (d dropout)
+#
+# Model ancaman: server honest-but-curious (tidak memalsukan kunci publik);
+# kunci publik tidak ditandatangani.
+# ==========================================================
+import os
+import hmac
+import json
+import base64
+import hashlib
+import secrets
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from model_store import file_lock, write_json_atomic
+
+# RFC 3526 grup 14 (MODP 2048-bit), generator 2
+MODP_PRIME = int(
+    "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74"
+    "020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437"
+    "4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+    "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05"
+    "98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB"
+    "9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+    "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718"
+    "3995497CEA956AE515D2261898FA051015728E5A8AACAA68FFFFFFFFFFFFFFFF", 16)
+MODP_GENERATOR = 2
+DH_EXPONENT_BITS = 256         # eksponen pendek (≥ 2× level keamanan grup 2048-bit)
+FIELD_PRIME = 2 ** 521 - 1     # prime Mersenne untuk Shamir (> kunci DH & seed)
+FRAC_BITS = 24                 # fixed point: x → round(x · 2^24) di ring uint64
+SEED_BYTES = 32
+
+PHASES = ("keys", "shares", "masked", "unmask", "done", "failed")
+
+
+class SecAggError(Exception):
+    """Request secagg yang tidak valid untuk fase/round saat ini."""
+
+    def __init__(self, message: str, http_status: int = 400):
+        super().__init__(message)
+        self.http_status = http_status
+
+
+# ==========================================================
+# PRIMITIF: DH, KDF, PRG, fixed point
+# ==========================================================
+def dh_keypair() -> tuple:
+    sk = secrets.randbits(DH_EXPONENT_BITS) | (1 << (DH_EXPONENT_BITS - 1))
+    return sk, pow(MODP_GENERATOR, sk, MODP_PRIME)
+
+
+def dh_agree(sk: int, peer_pk: int) -> bytes:
+    if not 2 <= peer_pk <= MODP_PRIME - 2:
+        raise ValueError("kunci publik DH di luar grup")
+    shared = pow(peer_pk, sk, MODP_PRIME)
+    return hashlib.sha256(shared.to_bytes(256, "big")).digest()
+
+
+def kdf(key: bytes, *labels) -> bytes:
+    return hmac.new(key, "|".join(str(label) for label in labels).encode("utf-8"), hashlib.sha256).digest()
+
+
+def pair_seed(shared: bytes, round_id: str, a: str, b: str) -> bytes:
+    lo, hi = sorted((a, b))
+    return kdf(shared, "secagg-mask", round_id, lo, hi)
+
+
+def prg_mask(seed: bytes, size: int) -> np.ndarray:
+    """Mask uint64 sepanjang `size` dari seed: satu panggilan Philox.random_raw (tanpa loop per parameter)."""
+    key = np.frombuffer(hashlib.sha256(seed).digest()[:16], dtype="<u8")
+    return np.random.Philox(key=key).random_raw(size)
+
+
+def encode_fixed(values: np.ndarray) -> np.ndarray:
+    return np.rint(np.asarray(values, dtype=np.float64) * (1 << FRAC_BITS)).astype(np.int64).view(np.uint64)
+
+
+def decode_fixed(ring: np.ndarray) -> np.ndarray:
+    return ring.view(np.int64).astype(np.float64) / (1 << FRAC_BITS)
+
+
+def max_encodable(num_clients: int) -> float:
+    """Batas |n·w| per bank agar Σ encode tidak overflow int64."""
+    return float(2 ** (62 - FRAC_BITS)) / max(1, num_clients)
+
+
+# ==========================================================
+# SHAMIR t-of-n di GF(2^521 − 1)
+# ==========================================================
+def shamir_split(secret: int, xs: list, threshold: int) -> dict:
+    coeffs = [secret] + [secrets.randbelow(FIELD_PRIME) for _ in range(threshold - 1)]
+    shares = {}
+    for x in xs:
+        y = 0
+        for c in reversed(coeffs):
+            y = (y * x + c) % FIELD_PRIME
+        shares[x] = y
+    return shares
+
+
+def lagrange_at_zero(xs: list) -> dict:
+    """Koefisien Lagrange di x=0 untuk himpunan x tetap (dihitung sekali, dipakai semua secret)."""
+    coeffs = {}
+    for xi in xs:
+        num, den = 1, 1
+        for xj in xs:
+            if xj != xi:
+                num = num * (-xj) % FIELD_PRIME
+                den = den * (xi - xj) % FIELD_PRIME
+        coeffs[xi] = num * pow(den, -1, FIELD_PRIME) % FIELD_PRIME
+    return coeffs
+
+
+def shamir_combine(shares: dict, coeffs: dict) -> int:
+    return sum(y * coeffs[x] for x, y in shares.items()) % FIELD_PRIME
+
+
+# ==========================================================
+# ENKRIPSI SHARE (kunci dari DH c_sk/c_pk; HMAC-SHA256 counter stream + tag)
+# ==========================================================
+def _keystream(key: bytes, nonce: bytes, length: int) -> bytes:
+    blocks = [hmac.new(key, nonce + i.to_bytes(4, "big"), hashlib.sha256).digest() for i in range(-(-length // 32))]
+    return b"".join(blocks)[:length]
+
+
+def seal(shared: bytes, plaintext: bytes) -> str:
+    enc_key, mac_key = kdf(shared, "secagg-enc"), kdf(shared, "secagg-mac")
+    nonce = secrets.token_bytes(16)
+    ct = bytes(a ^ b for a, b in zip(plaintext, _keystream(enc_key, nonce, len(plaintext))))
+    tag = hmac.new(mac_key, nonce + ct, hashlib.sha256).digest()[:16]
+    return base64.b64encode(nonce + ct + tag).decode("ascii")
+
+
+def unseal(shared: bytes, blob: str) -> bytes:
+    raw = base64.b64decode(blob)
+    nonce, ct, tag = raw[:16], raw[16:-16], raw[-16:]
+    enc_key, mac_key = kdf(shared, "secagg-enc"), kdf(shared, "secagg-mac")
+    if not hmac.compare_digest(tag, hmac.new(mac_key, nonce + ct, hashlib.sha256).digest()[:16]):
+        raise ValueError("tag share tidak valid")
+    return bytes(a ^ b for a, b in zip(ct, _keystream(enc_key, nonce, len(ct))))
+
+
+# ==========================================================
+# SISI BANK
+# ==========================================================
+class SecAggClient:
+    """State protokol satu bank untuk satu round (disimpan di memori proses upload)."""
+
+    def __init__(self, client: str, round_id: str):
+        self.client = client
+        self.round_id = str(round_id)
+        self.c_sk, self.c_pk = dh_keypair()
+        self.s_sk, self.s_pk = dh_keypair()
+        self.b_seed = secrets.token_bytes(SEED_BYTES)
+        self.peers = {}         # U1: {client: {"index", "c_pk", "s_pk"}}
+        self.received = {}      # share dari peer: {sender: {"b": int, "s_sk": int}}
+
+    def advertise(self) -> dict:
+        return {"client": self.client, "c_pk": format(self.c_pk, "x"), "s_pk": format(self.s_pk, "x")}
+
+    def _channel(self, peer: str) -> bytes:
+        return dh_agree(self.c_sk, int(self.peers[peer]["c_pk"], 16))
+
+    def share_keys(self, peers: dict, threshold: int) -> dict:
+        """peers = U1 dari server → {"client", "b_commit", "shares": {peer: blob terenkripsi}}."""
+        if self.client not in peers:
+            raise ValueError(f"{self.client} tidak ada di daftar peer round")
+        self.peers = peers
+        xs = {peer: info["index"] for peer, info in peers.items()}
+        b_shares = shamir_split(int.from_bytes(self.b_seed, "big"), list(xs.values()), threshold)
+        sk_shares = shamir_split(self.s_sk, list(xs.values()), threshold)
+        sealed = {}
+        for peer, x in xs.items():
+            plaintext = json.dumps({"from": self.client, "to": peer, "round": self.round_id,
+                                    "b": format(b_shares[x], "x"), "s_sk": format(sk_shares[x], "x")}).encode("utf-8")
+            if peer == self.client:
+                self.received[peer] = {"b": b_shares[x], "s_sk": sk_shares[x]}
+                continue
+            sealed[peer] = seal(self._channel(peer), plaintext)
+        return {"client": self.client, "b_commit": hashlib.sha256(self.b_seed).hexdigest(), "shares": sealed}
+
+    def receive_shares(self, sealed: dict):
+        """Dekripsi share dari U2 (pengirim & tujuan dicek, agar server tidak bisa menukar share)."""
+        for sender, blob in sealed.items():
+            msg = json.loads(unseal(self._channel(sender), blob))
+            if msg["from"] != sender or msg["to"] != self.client or msg["round"] != self.round_id:
+                raise ValueError(f"share dari {sender} tidak cocok dengan pengirim/tujuan/round")
+            self.received[sender] = {"b": int(msg["b"], 16), "s_sk": int(msg["s_sk"], 16)}
+
+    def masked_input(self, flat: np.ndarray, num_examples: int, u2: list) -> np.ndarray:
+        """y = encode(n·w) + PRG(b) ± PRG(s_ij) untuk setiap peer j di U2 (mod 2^64)."""
+        bound = max_encodable(len(u2))
+        scaled = np.asarray(flat, dtype=np.float64) * float(num_examples)
+        if np.abs(scaled).max(initial=0.0) >= bound:
+            raise ValueError(f"|num_examples · bobot| ≥ {bound:.3g}, fixed point {FRAC_BITS} bit akan overflow")
+        y = encode_fixed(scaled)
+        y += prg_mask(self.b_seed, y.size)
+        for peer in u2:
+            if peer == self.client:
+                continue
+            seed = pair_seed(dh_agree(self.s_sk, int(self.peers[peer]["s_pk"], 16)), self.round_id, self.client, peer)
+            if self.client < peer:
+                y += prg_mask(seed, y.size)
+            else:
+                y -= prg_mask(seed, y.size)
+        return y
+
+    def unmask(self, survivors: list, dropped: list) -> dict:
+        """Share b_j untuk survivor dan s_sk_d untuk dropout (tidak pernah keduanya untuk bank yang sama)."""
+        if set(survivors) & set(dropped):
+            raise ValueError("survivor dan dropout tumpang tindih")
+        return {
+            "client": self.client,
+            "b_shares": {j: format(self.received[j]["b"], "x") for j in survivors if j in self.received},
+            "s_sk_shares": {d: format(self.received[d]["s_sk"], "x") for d in dropped if d in self.received},
+        }
+
+
+# ==========================================================
+# SISI SERVER (state per round di disk)
+# ==========================================================
+class SecAggRounds:
+    """
+    <root>/<round>/state.json        → fase, threshold, U1 (kunci publik), U2, U3, respon unmask
+    <root>/<round>/from/<CLIENT>.json → share terenkripsi yang dikirim bank (fase shares)
+    <root>/<round>/to/<CLIENT>.json   → share untuk bank (ditranspos sekali saat fase shares ditutup)
+    <root>/<round>/masked/<CLIENT>.npy → y_i (uint64, sudah ter-mask)
+    <root>/<round>/unmask/<CLIENT>.json → share b (survivor) & s_sk (dropout) dari bank
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, round_id: str) -> Path:
+        return self.root / round_id
+
+    def _lock(self, round_id: str):
+        return file_lock(self._dir(round_id) / ".lock")
+
+    def _load(self, round_id: str) -> dict:
+        path = self._dir(round_id) / "state.json"
+        if not path.exists():
+            raise SecAggError(f"round secagg {round_id} tidak ditemukan", 404)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, state: dict):
+        state["updated"] = datetime.utcnow().isoformat() + "Z"
+        write_json_atomic(self._dir(state["round"]) / "state.json", state)
+
+    @staticmethod
+    def _expect_phase(state: dict, phase: str):
+        if state["phase"] != phase:
+            raise SecAggError(f"round {state['round']} sedang di fase {state['phase']}, bukan {phase}", 409)
+
+    # ---------- round ----------
+    def create(self, round_id: str, expected: int, threshold: int, layout_sha: str, size: int) -> dict:
+        if expected < 2:
+            raise SecAggError("secure aggregation butuh minimal 2 bank")
+        if not 2 <= threshold <= expected:
+            raise SecAggError(f"threshold harus di antara 2 dan {expected}")
+        rdir = self._dir(round_id)
+        if (rdir / "state.json").exists():
+            raise SecAggError(f"round secagg {round_id} sudah ada", 409)
+        for sub in ("from", "to", "masked", "unmask"):
+            (rdir / sub).mkdir(parents=True, exist_ok=True)
+        state = {
+            "round": round_id, "phase": "keys", "expected": expected, "threshold": threshold,
+            "layout": layout_sha, "size": size, "created": datetime.utcnow().isoformat() + "Z",
+            "keys": {}, "u2": [], "commits": {}, "u3": {}, "unmask": [], "result": None, "error": None,
+        }
+        with self._lock(round_id):
+            self._save(state)
+        return state
+
+    def status(self, round_id: str) -> dict:
+        state = self._load(round_id)
+        survivors = sorted(state["u3"])
+        return {
+            "round": state["round"], "phase": state["phase"], "expected": state["expected"],
+            "threshold": state["threshold"], "size": state["size"], "layout": state["layout"],
+            "keys": state["keys"] if state["phase"] != "keys" else {},
+            "registered": sorted(state["keys"]),
+            "u2": state["u2"],
+            "survivors": survivors if state["phase"] in ("unmask", "done") else [],
+            "dropped": sorted(set(state["u2"]) - set(survivors)) if state["phase"] in ("unmask", "done") else [],
+            "masked_received": len(state["u3"]),
+            "unmask_received": len(state["unmask"]),
+            "result": state["result"],
+            "error": state["error"],
+        }
+
+    # ---------- fase keys ----------
+    def add_keys(self, round_id: str, client: str, c_pk: str, s_pk: str) -> dict:
+        with self._lock(round_id):
+            state = self._load(round_id)
+            self._expect_phase(state, "keys")
+            for pk in (c_pk, s_pk):
+                if not 2 <= int(pk, 16) <= MODP_PRIME - 2:
+                    raise SecAggError("kunci publik DH di luar grup")
+            state["keys"][client] = {"c_pk": c_pk, "s_pk": s_pk}
+            if len(state["keys"]) >= state["expected"]:
+                self._close_keys(state)
+            self._save(state)
+        return self.status(round_id)
+
+    def _close_keys(self, state: dict):
+        if len(state["keys"]) < state["threshold"]:
+            raise SecAggError(f"baru {len(state['keys'])} bank mendaftar, threshold {state['threshold']}", 409)
+        # U1 dibekukan; index = koordinat x Shamir (1..n)
+        for index, client in enumerate(sorted(state["keys"]), start=1):
+            state["keys"][client]["index"] = index
+        state["phase"] = "shares"
+
+    # ---------- fase shares ----------
+    def add_shares(self, round_id: str, client: str, b_commit: str, shares: dict) -> dict:
+        with self._lock(round_id):
+            state = self._load(round_id)
+            self._expect_phase(state, "shares")
+            if client not in state["keys"]:
+                raise SecAggError(f"{client} tidak terdaftar di round ini", 403)
+            missing = sorted(set(state["keys"]) - set(shares) - {client})
+            if missing:
+                raise SecAggError(f"share untuk peer berikut tidak ada: {missing}")
+            write_json_atomic(self._dir(round_id) / "from" / f"{client}.json", shares)
+            state["commits"][client] = b_commit
+            if client not in state["u2"]:
+                state["u2"].append(client)
+            if len(state["u2"]) >= len(state["keys"]):
+                self._close_shares(state)
+            self._save(state)
+        return self.status(round_id)
+
+    def _close_shares(self, state: dict):
+        if len(state["u2"]) < state["threshold"]:
+            raise SecAggError(f"baru {len(state['u2'])} bank mengirim share, threshold {state['threshold']}", 409)
+        # transpos sekali: from/<pengirim>.json → to/<penerima>.json (hanya pengirim di U2)
+        rdir = self._dir(state["round"])
+        inbox = {client: {} for client in state["u2"]}
+        for sender in state["u2"]:
+            with open(rdir / "from" / f"{sender}.json", "r", encoding="utf-8") as f:
+                for recipient, blob in json.load(f).items():
+                    if recipient in inbox:
+                        inbox[recipient][sender] = blob
+        for recipient, sealed in inbox.items():
+            write_json_atomic(rdir / "to" / f"{recipient}.json", sealed)
+        state["u2"] = sorted(state["u2"])
+        state["phase"] = "masked"
+
+    def shares_for(self, round_id: str, client: str) -> dict:
+        state = self._load(round_id)
+        if state["phase"] in ("keys", "shares"):
+            raise SecAggError(f"share belum siap (fase {state['phase']})", 409)
+        if client not in state["u2"]:
+            raise SecAggError(f"{client} tidak ada di U2", 403)
+        with open(self._dir(round_id) / "to" / f"{client}.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    # ---------- fase masked ----------
+    def add_masked(self, round_id: str, client: str, path: Path, num_examples: int) -> dict:
+        with self._lock(round_id):
+            state = self._load(round_id)
+            self._expect_phase(state, "masked")
+            if client not in state["u2"]:
+                raise SecAggError(f"{client} tidak ada di U2", 403)
+            y = np.load(path, mmap_mode="r", allow_pickle=False)
+            if y.dtype != np.uint64 or y.shape != (state["size"],):
+                raise SecAggError(f"masked input harus uint64 [{state['size']}], bukan {y.dtype} {y.shape}", 422)
+            del y
+            os.replace(path, self._dir(round_id) / "masked" / f"{client}.npy")
+            state["u3"][client] = int(num_examples)
+            if len(state["u3"]) >= len(state["u2"]):
+                self._close_masked(state)
+            self._save(state)
+        return self.status(round_id)
+
+    def _close_masked(self, state: dict):
+        if len(state["u3"]) < state["threshold"]:
+            raise SecAggError(f"baru {len(state['u3'])} masked input, threshold {state['threshold']}", 409)
+        state["phase"] = "unmask"
+
+    # ---------- fase unmask ----------
+    def add_unmask(self, round_id: str, client: str, b_shares: dict, s_sk_shares: dict, finish) -> dict:
+        """finish(state, total_flat_float64) dipanggil sekali saat jumlah berhasil dibuka → info hasil."""
+        with self._lock(round_id):
+            state = self._load(round_id)
+            self._expect_phase(state, "unmask")
+            if client not in state["u3"]:
+                raise SecAggError(f"{client} bukan survivor round ini", 403)
+            survivors = set(state["u3"])
+            dropped = set(state["u2"]) - survivors
+            if set(b_shares) != survivors or set(s_sk_shares) != dropped:
+                raise SecAggError("unmask harus berisi share b untuk semua survivor dan s_sk untuk semua dropout")
+            for owner, share in {**b_shares, **s_sk_shares}.items():
+                try:
+                    value = int(share, 16)
+                except (TypeError, ValueError):
+                    raise SecAggError(f"share untuk {owner} bukan hex")
+                if not 0 <= value < FIELD_PRIME:
+                    raise SecAggError(f"share untuk {owner} di luar field")
+            write_json_atomic(self._dir(round_id) / "unmask" / f"{client}.json",
+                              {"client": client, "b_shares": b_shares, "s_sk_shares": s_sk_shares})
+            state["unmask"] = sorted(set(state["unmask"]) | {client})
+            if len(state["unmask"]) >= len(state["u3"]):
+                self._finish(state, finish)
+            self._save(state)
+        return self.status(round_id)
+
+    def advance(self, round_id: str, finish) -> dict:
+        """Tutup fase sekarang dengan bank yang sudah masuk (batas waktu koordinator); dropout diproses."""
+        with self._lock(round_id):
+            state = self._load(round_id)
+            closers = {"keys": self._close_keys, "shares": self._close_shares, "masked": self._close_masked}
+            if state["phase"] in closers:
+                closers[state["phase"]](state)
+            elif state["phase"] == "unmask":
+                if len(state["unmask"]) < state["threshold"]:
+                    raise SecAggError(f"baru {len(state['unmask'])} respon unmask, threshold {state['threshold']}", 409)
+                self._finish(state, finish)
+            else:
+                raise SecAggError(f"round sudah {state['phase']}", 409)
+            self._save(state)
+        return self.status(round_id)
+
+    def _finish(self, state: dict, finish):
+        # error apa pun di sini → round "failed"; kalau tidak, round tertahan di unmask dan setiap retry gagal lagi
+        try:
+            total = self.unmasked_sum(state)
+        except Exception as e:
+            state["phase"], state["error"] = "failed", str(e)
+            self._save(state)
+            raise SecAggError(f"unmask gagal: {e}", 422)
+        num_examples = sum(state["u3"].values())
+        try:
+            state["result"] = finish(state, decode_fixed(total) / num_examples)
+        except Exception as e:
+            state["phase"], state["error"] = "failed", str(e)
+            self._save(state)
+            raise SecAggError(f"publish global gagal: {e}", 422)
+        state["phase"] = "done"
+        # bahan unmask tidak diperlukan lagi
+        for sub in ("from", "to", "masked", "unmask"):
+            for path in (self._dir(state["round"]) / sub).glob("*"):
+                path.unlink(missing_ok=True)
+
+    def unmasked_sum(self, state: dict) -> np.ndarray:
+        """Σ y_i (survivor) − PRG(b_i) − mask pairwise survivor×dropout → Σ encode(n_i·w_i)."""
+        round_id, size = state["round"], state["size"]
+        survivors = sorted(state["u3"])
+        dropped = sorted(set(state["u2"]) - set(survivors))
+        responses = []
+        for client in state["unmask"]:
+            with open(self._dir(round_id) / "unmask" / f"{client}.json", "r", encoding="utf-8") as f:
+                responses.append(json.load(f))
+        keys = state["keys"]
+
+        # satu set responder → koefisien Lagrange dihitung sekali untuk semua secret
+        xs = [keys[r["client"]]["index"] for r in responses]
+        coeffs = lagrange_at_zero(xs)
+
+        def reconstruct(field: str, owner: str) -> int:
+            return shamir_combine({keys[r["client"]]["index"]: int(r[field][owner], 16) for r in responses}, coeffs)
+
+        total = np.zeros(size, dtype=np.uint64)
+        for client in survivors:
+            total += np.load(self._dir(round_id) / "masked" / f"{client}.npy")
+
+        for client in survivors:
+            b_int = reconstruct("b_shares", client)
+            if b_int >= 1 << (8 * SEED_BYTES):
+                raise ValueError(f"self-mask {client} hasil rekonstruksi di luar {SEED_BYTES} byte (share rusak)")
+            b_seed = b_int.to_bytes(SEED_BYTES, "big")
+            if hashlib.sha256(b_seed).hexdigest() != state["commits"][client]:
+                raise ValueError(f"self-mask {client} hasil rekonstruksi tidak cocok dengan commit")
+            total -= prg_mask(b_seed, size)
+
+        for d in dropped:
+            s_sk = reconstruct("s_sk_shares", d)
+            if pow(MODP_GENERATOR, s_sk, MODP_PRIME) != int(keys[d]["s_pk"], 16):
+                raise ValueError(f"kunci mask {d} hasil rekonstruksi tidak cocok dengan s_pk")
+            for client in survivors:
+                seed = pair_seed(dh_agree(s_sk, int(keys[client]["s_pk"], 16)), round_id, client, d)
+                # survivor menambah mask jika namanya < d, mengurangi jika > d
+                if client < d:
+                    total -= prg_mask(seed, size)
+                else:
+                    total += prg_mask(seed, size)
+        return total
+
+    def list(self) -> list:
+        rounds = []
+        for path in sorted(self.root.glob("*/state.json")):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            rounds.append({"round": state["round"], "phase": state["phase"], "expected": state["expected"],
+                           "updated": state.get("updated")})
+        return rounds
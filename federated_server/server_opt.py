@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🧭 SERVER OPTIMIZER — FedAvgM / FedAdam / FedYogi di /aggregate
+#
+# Hasil agregasi tidak langsung menggantikan global. Selisihnya dengan
+# global sebelumnya dipakai sebagai pseudo-gradient (Reddi et al., "Adaptive
+# Federated Optimization"):
+#   Δ = agregat − global_sebelumnya
+#   fedavgm : m = β·m + Δ                          x = x + η·m
+#   fedadam : m = β₁·m + (1−β₁)·Δ
+#             v = β₂·v + (1−β₂)·Δ²                 x = x + η·m / (√v + τ)
+#   fedyogi : m sama dengan fedadam
+#             v = v − (1−β₂)·Δ²·sign(v − Δ²)       x = x + η·m / (√v + τ)
+#   none    : x = agregat (FedAvg biasa)
+#
+# State optimizer (m, v, step, versi global basis) disimpan di
+# models/server_opt/state.npz → "m", "v" (float32 flat) + "__state__" (JSON).
+# Ganti optimizer atau layout → state di-reset dan round itu memakai agregat apa adanya.
+# ==========================================================
+import os
+import json
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from model_store import file_lock
+
+SERVER_OPTIMIZER = os.environ.get("SERVER_OPTIMIZER", "none")
+STATE_KEY = "__state__"
+
+# default hyperparameter per optimizer (bisa ditimpa lewat server_optimizer_params)
+SERVER_OPTIMIZERS = {
+    "none": {},
+    "fedavgm": {"lr": 1.0, "momentum": 0.9},
+    "fedadam": {"lr": 0.01, "beta1": 0.9, "beta2": 0.99, "tau": 1e-3},
+    "fedyogi": {"lr": 0.01, "beta1": 0.9, "beta2": 0.99, "tau": 1e-3},
+}
+
+
+def resolve_params(name: str, params: dict) -> dict:
+    """Default optimizer + override dari request; ValueError untuk key/nilai yang tidak valid."""
+    if name not in SERVER_OPTIMIZERS:
+        raise ValueError(f"server_optimizer tidak dikenal: {name} (pilihan: {', '.join(SERVER_OPTIMIZERS)})")
+    defaults = SERVER_OPTIMIZERS[name]
+    unknown = sorted(set(params) - set(defaults))
+    if unknown:
+        raise ValueError(f"parameter {name} tidak dikenal: {unknown} (pilihan: {sorted(defaults)})")
+    resolved = {k: float(params.get(k, v)) for k, v in defaults.items()}
+    if resolved.get("lr", 1.0) <= 0:
+        raise ValueError("lr harus > 0")
+    for key in ("momentum", "beta1", "beta2"):
+        if key in resolved and not 0.0 <= resolved[key] < 1.0:
+            raise ValueError(f"{key} harus di antara 0 dan 1")
+    if resolved.get("tau", 1.0) <= 0:
+        raise ValueError("tau harus > 0")
+    return resolved
+
+
+class ServerOptimizer:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+
+    def _load(self):
+        if not self.path.exists():
+            return None, {}
+        with np.load(self.path, allow_pickle=False) as npzfile:
+            state = json.loads(str(npzfile[STATE_KEY][()]))
+            arrays = {k: npzfile[k] for k in npzfile.files if k != STATE_KEY}
+        return state, arrays
+
+    def _save(self, state: dict, arrays: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(suffix=".npz.tmp", dir=self.path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays, **{STATE_KEY: np.array(json.dumps(state))})
+            os.replace(tmp_name, self.path)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def state(self) -> dict:
+        state, _ = self._load()
+        return state
+
+    def step(self, name: str, aggregate: np.ndarray, previous, layout_sha: str, params: dict = None) -> tuple:
+        """
+        aggregate : vektor float32 hasil agregasi round ini
+        previous  : (versi, vektor flat) global sebelumnya, atau None
+        Return (vektor global baru float32, info).
+        """
+        hp = resolve_params(name, params or {})
+        if name == "none":
+            return aggregate, {"name": "none"}
+
+        with file_lock(self.lock_path):
+            state, arrays = self._load()
+            fresh = (state is None or state.get("name") != name or state.get("layout") != layout_sha
+                     or arrays.get("m") is None or arrays["m"].shape != aggregate.shape)
+            if previous is None:
+                # belum ada global → tidak ada pseudo-gradient; agregat menjadi titik awal
+                new_state = {"name": name, "layout": layout_sha, "step": 0}
+                self._save({**new_state, "params": hp, "updated": datetime.utcnow().isoformat() + "Z"},
+                           {"m": np.zeros_like(aggregate), "v": np.full_like(aggregate, hp.get("tau", 0.0) ** 2)})
+                return aggregate, {"name": name, "step": 0, "params": hp, "base_version": None,
+                                   "note": "global sebelumnya belum ada, agregat dipakai apa adanya"}
+
+            base_version, x = previous
+            x = np.asarray(x, dtype=np.float32)
+            if fresh:
+                m = np.zeros_like(aggregate)
+                v = np.full_like(aggregate, hp.get("tau", 0.0) ** 2)  # v₋₁ = τ² (Reddi et al.)
+                step = 0
+            else:
+                m, v, step = arrays["m"], arrays["v"], state["step"]
+
+            delta = aggregate - x
+            if name == "fedavgm":
+                m = hp["momentum"] * m + delta
+                update = hp["lr"] * m
+            else:
+                m = hp["beta1"] * m + (1.0 - hp["beta1"]) * delta
+                delta_sq = delta * delta
+                if name == "fedadam":
+                    v = hp["beta2"] * v + (1.0 - hp["beta2"]) * delta_sq
+                else:  # fedyogi: v tumbuh lebih lambat saat Δ² > v → langkah lebih stabil
+                    v = v - (1.0 - hp["beta2"]) * delta_sq * np.sign(v - delta_sq)
+                update = hp["lr"] * m / (np.sqrt(v) + hp["tau"])
+            new_x = (x + update).astype(np.float32)
+
+            step += 1
+            self._save({"name": name, "layout": layout_sha, "step": step, "base_version": base_version,
+                        "params": hp, "updated": datetime.utcnow().isoformat() + "Z"},
+                       {"m": m.astype(np.float32), "v": v.astype(np.float32)})
+
+        return new_x, {
+            "name": name,
+            "step": step,
+            "params": hp,
+            "base_version": base_version,
+            "reset": fresh,
+            "pseudo_gradient_norm": float(np.linalg.norm(delta)),
+            "update_norm": float(np.linalg.norm(update)),
+        }
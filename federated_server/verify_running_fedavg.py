@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# ============================================================
+# ✅ VERIFIKASI RUNNING FEDAVG (running_fedavg.py + contribution.py)
+#
+# Dibandingkan dengan hitung ulang brute-force (Σ nᵢ·wᵢ / Σ nᵢ dari versi
+# terakhir tiap client), di direktori sementara, tanpa HTTP:
+#   1. running sum setelah urutan acak upload / upload ulang / delete,
+#      termasuk client tanpa num_examples (weighting berganti ke uniform)
+#   2. out_of_core_average() = average()
+#   3. leave-one-out dari S − wᵢ·xᵢ = evaluasi rata-rata tanpa bank i
+#   4. race sync + average vs delete dari thread lain: hasil agregasi harus
+#      sama persis dengan snapshot yang di-sync (locked() satu round)
+#
+#   python verify_running_fedavg.py
+#   python verify_running_fedavg.py --clients 20 --steps 500 --race-rounds 100
+# ============================================================
+import argparse
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from bench_aggregators import BANK_SHAPES
+from contribution import leave_one_out
+from evaluation import BatchEvaluator
+from flat_params import FlatLayout
+from running_fedavg import RunningFedAvg
+
+LAYOUT_SHA = "verify"
+TOLERANCE = 1e-5
+
+
+def random_weights(flat_layout: FlatLayout, rng) -> np.ndarray:
+    """Bobot MLP bank acak; varians BatchNorm (tensor ke-4) dibuat positif agar forward pass valid."""
+    flat = rng.normal(scale=0.1, size=flat_layout.size).astype(np.float32)
+    var = flat_layout.views(flat)[3]
+    var[:] = np.abs(var) + 1.0
+    return flat
+
+
+def brute_force(versions: dict) -> np.ndarray:
+    """FedAvg dari nol atas {client: (vektor, num_examples)}; uniform jika ada yang tanpa num_examples."""
+    uniform = any(n is None for _, n in versions.values())
+    weights = {c: 1.0 if uniform else float(n) for c, (_, n) in versions.items()}
+    total = sum(weights[c] * flat.astype(np.float64) for c, (flat, _) in versions.items())
+    return (total / sum(weights.values())).astype(np.float32)
+
+
+def check(name: str, err: float, failures: list):
+    ok = err <= TOLERANCE  # NaN → gagal
+    print(f"{'OK ' if ok else 'FAIL'} {name:<44} max err {err:.1e}")
+    if not ok:
+        failures.append(name)
+
+
+def verify_sequence(root: Path, flat_layout: FlatLayout, n_clients: int, steps: int, rng, failures: list):
+    fedavg = RunningFedAvg(root)
+    names = [f"BANK_{i:03d}" for i in range(n_clients)]
+    versions = {}
+    errors = []
+    for step in range(steps):
+        client = names[rng.integers(n_clients)]
+        if client in versions and rng.random() < 0.2:
+            fedavg.remove(client)
+            del versions[client]
+        else:
+            flat = random_weights(flat_layout, rng)
+            # sesekali client tanpa num_examples → seluruh sum di-reweight
+            num_examples = None if rng.random() < 0.05 else int(rng.integers(100, 10_000))
+            fedavg.update(client, f"{client}-{step}", flat, flat_layout, LAYOUT_SHA, num_examples)
+            versions[client] = (flat, num_examples)
+        if len(versions) >= 1 and step % 10 == 0:
+            avg, _ = fedavg.average()
+            errors.append(np.abs(avg - brute_force(versions)).max())
+    avg, _ = fedavg.average()
+    errors.append(np.abs(avg - brute_force(versions)).max())
+    check(f"running sum ({steps} upload/ulang/delete)", float(np.max(errors)), failures)
+
+    out_of_core, _ = fedavg.out_of_core_average()
+    check("out_of_core_average = average", float(np.abs(out_of_core - avg).max()), failures)
+    return fedavg, versions
+
+
+def verify_leave_one_out(fedavg: RunningFedAvg, versions: dict, flat_layout: FlatLayout, rng, failures: list):
+    X = rng.normal(size=(512, flat_layout.shapes[0][0])).astype(np.float32)
+    y = (rng.random(512) < 0.1).astype(np.float64)
+    evaluator = BatchEvaluator(flat_layout, X, y)
+    report = fedavg.score_with(leave_one_out, evaluator=evaluator)
+    errors = []
+    for client in versions:
+        rest = {c: v for c, v in versions.items() if c != client}
+        expected = evaluator.evaluate(brute_force(rest)[None, :])["log_loss"][0]
+        errors.append(abs(report["clients"][client]["log_loss_without"] - expected))
+    check(f"leave-one-out = hitung ulang ({len(versions)} bank)", float(np.max(errors)), failures)
+
+
+def verify_race(root: Path, flat_layout: FlatLayout, n_clients: int, rounds: int, rng, failures: list):
+    """Thread agregasi: locked() { sync(snapshot); average() }. Thread lain menghapus client bersamaan."""
+    fedavg = RunningFedAvg(root)
+    names = [f"BANK_{i:03d}" for i in range(n_clients)]
+    mismatches = 0
+    errors = []
+    for r in range(rounds):
+        versions = {c: (random_weights(flat_layout, rng), int(rng.integers(100, 10_000))) for c in names}
+        snapshot = {c: {"sha256": f"{c}-{r}", "num_examples": n} for c, (_, n) in versions.items()}
+        for c, (flat, n) in versions.items():
+            fedavg.update(c, snapshot[c]["sha256"], flat, flat_layout, LAYOUT_SHA, n)
+        victim = names[r % n_clients]
+        start = threading.Barrier(2)
+
+        def delete():
+            start.wait()
+            fedavg.remove(victim)
+
+        deleter = threading.Thread(target=delete)
+        deleter.start()
+        with fedavg.locked():
+            start.wait()
+            fedavg.sync(snapshot, LAYOUT_SHA, flat_layout, lambda c, entry: versions[c][0])
+            avg, state = fedavg.average()
+        deleter.join()
+        used = set(state["clients"])
+        if used != set(snapshot):
+            mismatches += 1
+        errors.append(np.abs(avg - brute_force({c: versions[c] for c in used})).max())
+    check(f"sync+average vs delete ({rounds} round)", float(np.max(errors)), failures)
+    if mismatches:
+        print(f"FAIL {mismatches} round: client yang dirata-rata berbeda dari snapshot")
+        failures.append("race snapshot")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=14)
+    parser.add_argument("--steps", type=int, default=200, help="jumlah upload/ulang/delete acak")
+    parser.add_argument("--race-rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    flat_layout = FlatLayout(BANK_SHAPES)
+    rng = np.random.default_rng(args.seed)
+    failures = []
+    print(f"Model: {flat_layout.size:,} parameter, {args.clients} bank")
+    with tempfile.TemporaryDirectory() as tmp:
+        fedavg, versions = verify_sequence(Path(tmp) / "seq", flat_layout, args.clients, args.steps, rng, failures)
+        verify_leave_one_out(fedavg, versions, flat_layout, rng, failures)
+        verify_race(Path(tmp) / "race", flat_layout, args.clients, args.race_rounds, rng, failures)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# ============================================================
+# ✅ VERIFIKASI SECURE AGGREGATION (secagg.py)
+#
+# Round lengkap in-process (tanpa HTTP) untuk beberapa kombinasi jumlah bank
+# dan dropout (drop setelah fase shares, dipulihkan lewat share s_sk):
+#   1. hasil unmask / Σ n = FedAvg biasa Σ nᵢ·wᵢ / Σ nᵢ atas survivor
+#   2. publikasi global gagal → round "failed" dengan error, SecAggError 422
+#
+#   python verify_secagg.py
+#   python verify_secagg.py --clients 5 14 50 --dropout 0 0.2 0.4
+# ============================================================
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from secagg import SecAggClient, SecAggError, SecAggRounds
+
+TOLERANCE = 1e-6  # fixed point 24 bit pecahan
+
+
+def run_round(root: Path, n_clients: int, size: int, dropout: float, finish, seed: int = 0) -> dict:
+    """Satu round secagg → {"expected": FedAvg survivor, "status": status akhir server, "dropped"}
+    (atau "error" = SecAggError dari add_unmask)."""
+    rng = np.random.default_rng(seed)
+    names = [f"BANK_{i:03d}" for i in range(n_clients)]
+    weights = {c: rng.normal(scale=0.1, size=size) for c in names}
+    examples = {c: int(rng.integers(1_000, 50_000)) for c in names}
+    dropped = set(rng.choice(names, size=int(round(dropout * n_clients)), replace=False).tolist())
+    survivors = [c for c in names if c not in dropped]
+
+    server = SecAggRounds(root)
+    server.create("verify", n_clients, max(2, n_clients // 2 + 1), "layout", size)
+    clients = {c: SecAggClient(c, "verify") for c in names}
+    for c in names:
+        msg = clients[c].advertise()
+        server.add_keys("verify", c, msg["c_pk"], msg["s_pk"])
+    status = server.status("verify")
+    for c in names:
+        msg = clients[c].share_keys(status["keys"], status["threshold"])
+        server.add_shares("verify", c, msg["b_commit"], msg["shares"])
+    u2 = server.status("verify")["u2"]
+    for c in survivors:
+        clients[c].receive_shares(server.shares_for("verify", c))
+        path = root / f"{c}.npy"
+        np.save(path, clients[c].masked_input(weights[c], examples[c], u2))
+        server.add_masked("verify", c, path, examples[c])
+    if dropped:
+        server.advance("verify", finish)
+
+    status = server.status("verify")
+    try:
+        for c in survivors:
+            msg = clients[c].unmask(status["survivors"], status["dropped"])
+            server.add_unmask("verify", c, msg["b_shares"], msg["s_sk_shares"], finish)
+    except SecAggError as e:
+        return {"error": e, "status": server.status("verify"), "dropped": len(dropped)}
+    total = sum(examples[c] for c in survivors)
+    return {
+        "expected": sum(examples[c] * weights[c] for c in survivors) / total,
+        "status": server.status("verify"),
+        "dropped": len(dropped),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[3, 14, 30])
+    parser.add_argument("--dropout", type=float, nargs="+", default=[0.0, 0.1, 0.3])
+    parser.add_argument("--params", type=int, default=2_000)
+    args = parser.parse_args()
+
+    failures = []
+    for n_clients in args.clients:
+        seen = set()
+        for dropout in args.dropout:
+            n_dropped = int(round(dropout * n_clients))
+            if n_dropped in seen or n_clients - n_dropped < max(2, n_clients // 2 + 1):
+                continue  # kombinasi sama, atau survivor di bawah threshold (round memang tidak bisa selesai)
+            seen.add(n_dropped)
+            result = {}
+
+            def finish(state, avg):
+                result["avg"] = avg
+                return {"num_clients": len(state["u3"])}
+
+            with tempfile.TemporaryDirectory() as tmp:
+                r = run_round(Path(tmp), n_clients, args.params, dropout, finish, seed=n_clients)
+            err = float(np.abs(result["avg"] - r["expected"]).max()) if "avg" in result else float("nan")
+            ok = r["status"]["phase"] == "done" and err <= TOLERANCE
+            print(f"{'OK ' if ok else 'FAIL'} {n_clients:>4} bank, {r['dropped']:>3} dropout"
+                  f"   FedAvg max err {err:.1e}")
+            if not ok:
+                failures.append((n_clients, dropout))
+
+    def failing_finish(state, avg):
+        raise ValueError("layout server berubah sejak round secagg dibuka")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        r = run_round(Path(tmp), 5, args.params, 0.2, failing_finish)
+    error, status = r.get("error"), r["status"]
+    ok = (error is not None and error.http_status == 422
+          and status["phase"] == "failed" and bool(status.get("error")))
+    print(f"{'OK ' if ok else 'FAIL'} publish gagal → phase {status['phase']}, "
+          f"HTTP {getattr(error, 'http_status', '-')}, error: {status.get('error')}")
+    if not ok:
+        failures.append("publish")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# ==========================================================
+# 🧊 WEIGHTS FORMAT — baca NPZ bobot client (float32 biasa atau terkuantisasi)
+#
+# NPZ terkuantisasi berisi entry "__format__" (JSON) yang menyatakan presisi:
+#   {"format": "cin-quant-v1", "precision": "int8", "per_channel": true,
+#    "tensors": [{"name": "arr_4", "precision": "int8", "shape": [39, 128],
+#                 "dtype": "float32", "axis": -1}, ...]}
+#
+#   precision "fp16"    → <name>            disimpan float16
+#   precision "int8"    → <name>.q          int8
+#                         <name>.scale      float32 (skalar atau per-channel, sumbu terakhir)
+#                         <name>.zero_point int8   (shape sama dengan scale)
+#                         dtype & shape ketiganya divalidasi dari header saat upload
+#   precision lain      → <name>            disimpan apa adanya
+#
+# Dequantize: x = (q - zero_point) * scale
+#
+# Validasi upload hanya membaca central directory zip + header .npy tiap
+# member (shape, dtype) — data tensor tidak di-decompress.
+# ==========================================================
+import json
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_KEY = "__format__"
+FORMAT_NAME = "cin-quant-v1"
+
+_HEADER_READERS = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+
+def inspect_npz(path: Path) -> list:
+    """
+    Baca daftar tensor NPZ tanpa memuat datanya:
+    [{"name", "shape", "dtype", "compressed_size"}, ...] sesuai urutan di zip.
+    Hanya header .npy (±128 byte per member) yang dibaca dari tiap member.
+    """
+    entries = []
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if not info.filename.endswith(".npy"):
+                raise ValueError(f"member bukan .npy: {info.filename}")
+            with zf.open(info) as fh:
+                version = np.lib.format.read_magic(fh)
+                reader = _HEADER_READERS.get(version)
+                if reader is None:
+                    raise ValueError(f"versi format .npy tidak didukung: {version}")
+                shape, _, dtype = reader(fh)
+                header_len = fh.tell()
+            if dtype.hasobject:
+                raise ValueError(f"{info.filename}: tensor object/pickle tidak diterima")
+            # ukuran asli harus cocok dengan header → deteksi file terpotong/palsu tanpa decompress
+            expected = header_len + int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+            if info.file_size != expected:
+                raise ValueError(f"{info.filename}: ukuran {info.file_size} != {expected} dari header")
+            entries.append({
+                "name": info.filename[:-len(".npy")],
+                "shape": [int(d) for d in shape],
+                "dtype": dtype.name,
+                "compressed_size": info.compress_size,
+            })
+    if not entries:
+        raise ValueError("npz tidak berisi tensor")
+    return entries
+
+
+def read_format(npzfile):
+    """Metadata kuantisasi dari NPZ yang sudah dibuka, atau None untuk NPZ float biasa."""
+    if FORMAT_KEY not in npzfile.files:
+        return None
+    meta = json.loads(str(npzfile[FORMAT_KEY][()]))
+    if meta.get("format") != FORMAT_NAME:
+        raise ValueError(f"format bobot tidak dikenal: {meta.get('format')}")
+    return meta
+
+def describe_weights_format(path: Path) -> dict:
+    """
+    Validasi struktur NPZ dari header saja (tanpa memuat/dequantize tensor):
+    {"precision": "float32" | "fp16" | "int8",
+     "num_tensors": N,
+     "tensors": [{"name", "shape", "dtype"}, ...]}   # tensor logis (setelah dequantize)
+    """
+    entries = inspect_npz(path)
+    members = {e["name"]: e for e in entries}
+
+    if FORMAT_KEY not in members:
+        tensors = [{"name": e["name"], "shape": e["shape"], "dtype": e["dtype"]} for e in entries]
+        precisions = {e["dtype"] for e in entries}
+        precision = precisions.pop() if len(precisions) == 1 else "mixed"
+        return {"precision": precision, "num_tensors": len(tensors), "tensors": tensors}
+
+    with np.load(path, allow_pickle=False) as npzfile:
+        meta = read_format(npzfile)  # hanya entry __format__ yang dibaca
+
+    tensors = []
+    for t in meta.get("tensors", []):
+        name = t["name"]
+        if t.get("precision") == "int8":
+            missing = [k for k in (f"{name}.q", f"{name}.scale", f"{name}.zero_point") if k not in members]
+            stored_shape = members.get(f"{name}.q", {}).get("shape")
+        else:
+            missing = [name] if name not in members else []
+            stored_shape = members.get(name, {}).get("shape")
+        if missing:
+            raise ValueError(f"tensor {name} tidak lengkap, hilang: {missing}")
+        if t.get("precision") == "int8":
+            _check_int8(name, members)
+        if "shape" in t and stored_shape != list(t["shape"]):
+            raise ValueError(f"tensor {name}: shape {stored_shape} != {t['shape']} di __format__")
+        tensors.append({"name": name, "shape": list(t.get("shape", stored_shape)), "dtype": t.get("dtype", "float32")})
+    return {"precision": meta.get("precision", "mixed"), "num_tensors": len(tensors), "tensors": tensors}
+
+def _check_int8(name: str, members: dict):
+    """dtype .q/.zero_point int8, scale float; scale & zero_point skalar atau per-channel (sumbu terakhir)."""
+    q, scale, zero_point = members[f"{name}.q"], members[f"{name}.scale"], members[f"{name}.zero_point"]
+    if q["dtype"] != "int8" or zero_point["dtype"] != "int8":
+        raise ValueError(f"tensor {name}: .q/.zero_point harus int8, bukan {q['dtype']}/{zero_point['dtype']}")
+    if not np.issubdtype(np.dtype(scale["dtype"]), np.floating):
+        raise ValueError(f"tensor {name}: .scale harus float, bukan {scale['dtype']}")
+    allowed = [[], [1]] + ([[q["shape"][-1]]] if q["shape"] else [])
+    if scale["shape"] not in allowed:
+        raise ValueError(f"tensor {name}: shape .scale {scale['shape']} bukan skalar atau per-channel {allowed[-1]}")
+    if zero_point["shape"] != scale["shape"]:
+        raise ValueError(f"tensor {name}: shape .zero_point {zero_point['shape']} != .scale {scale['shape']}")
+
+def dequantize_int8(q, scale, zero_point) -> np.ndarray:
+    return (q.astype(np.float32) - zero_point.astype(np.float32)) * scale.astype(np.float32)
+
+def iter_npz_weights(path: Path, order: list = None):
+    """
+    Tensor bobot client satu per satu. `order` = daftar nama tensor sesuai
+    layout (hasil match_layout); None → urutan tensor di file. NPZ
+    terkuantisasi di-dequantize ke float32 sehingga agregasi selalu bekerja
+    di float32.
+    """
+    with np.load(path, allow_pickle=False) as npzfile:
+        meta = read_format(npzfile)
+        if meta is None:
+            names = order if order is not None else npzfile.files
+            for key in names:
+                yield npzfile[key]
+            return
+
+        specs = {t["name"]: t for t in meta["tensors"]}
+        names = order if order is not None else [t["name"] for t in meta["tensors"]]
+
+        for name in names:
+            t = specs[name]
+            precision = t.get("precision")
+            if precision == "int8":
+                arr = dequantize_int8(npzfile[f"{name}.q"], npzfile[f"{name}.scale"], npzfile[f"{name}.zero_point"])
+            elif precision == "fp16":
+                arr = npzfile[name].astype(np.float32)
+            else:
+                arr = npzfile[name]
+            yield arr.reshape(t["shape"]) if "shape" in t else arr
+
+def load_npz_weights(path: Path, order: list = None) -> list:
+    """List bobot client (lihat iter_npz_weights)."""
+    return list(iter_npz_weights(path, order))
+
+def load_npz_flat(path: Path, flat_layout, order: list = None, out: np.ndarray = None) -> np.ndarray:
+    """
+    Bobot client langsung ke satu vektor float32 kontigu sesuai FlatLayout:
+    setiap tensor ditulis ke slot-nya begitu dibaca, tanpa concatenate.
+    """
+    return flat_layout.pack(iter_npz_weights(path, order), out=out)